@@ -0,0 +1,214 @@
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlparse
+
+from api.task_api import TaskAPI, error_response
+
+# Сколько держим простаивающее keep-alive соединение
+IDLE_TIMEOUT = 60
+# Ограничение на размер строки запроса и заголовков
+MAX_LINE = 64 * 1024
+# Потоки, которые кодируют куски больших потоковых ответов GET /tasks
+STREAM_WORKERS = 8
+# Потоки для запросов, которые пишут в хранилище или ждут фоновую загрузку задач
+DISPATCH_WORKERS = 16
+
+
+# HTTP/1.1 сервер на asyncio: одно соединение - одна корутина, без потоков на клиента
+class AsyncTaskServer:
+    def __init__(self, task_manager, host="127.0.0.1", port=8000, metrics=None, profiler=None):
+        self._task_manager = task_manager
+        # Изменения выполняются в пуле, там же и сохраняются: ответ уходит после сохранения,
+        # как у многопоточного сервера, а склеивание записей - дело WriteBehindStorage
+        self._api = TaskAPI(task_manager, metrics=metrics, profiler=profiler, wait_changes=self._wait_changes)
+        self._host = host
+        self._port = port
+        self._server = None
+        self._connections = set()
+        # GET /tasks/changes ждет изменений на цикле событий: лента будит его через
+        # call_soon_threadsafe, а событие заменяется новым после каждого пробуждения
+        self._loop = None
+        self._changed = None
+        self._wake_scheduled = False
+        # Куски больших списков кодируются в своем пуле, а не в пуле изменений
+        self._streams = ThreadPoolExecutor(max_workers=STREAM_WORKERS)
+        self._calls = ThreadPoolExecutor(max_workers=DISPATCH_WORKERS)
+
+    @property
+    def server_address(self):
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._task_manager.subscribe_changes(self._on_change)
+        self._server = await asyncio.start_server(self._handle_connection, self._host, self._port,
+                                                  limit=MAX_LINE, backlog=1024)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        # Закрываем сокет сервера и обрываем открытые соединения
+        if self._server is not None:
+            self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        self.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        if self._loop is not None:
+            self._task_manager.unsubscribe_changes(self._on_change)
+        self._streams.shutdown(wait=False, cancel_futures=True)
+        # Начатые изменения должны успеть сохраниться
+        self._calls.shutdown(wait=True)
+
+    def _on_change(self):
+        # Вызывается потоком, который изменил задачи. Пока пробуждение не выполнено,
+        # следующие изменения не планируют новое: ждущие все равно перечитают ленту
+        if not self._wake_scheduled:
+            self._wake_scheduled = True
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        self._wake_scheduled = False
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _wait_changes(self, seq, timeout):
+        # Ждем, пока номер изменения уйдет дальше seq, но не дольше timeout секунд
+        deadline = self._loop.time() + timeout
+        while self._task_manager.changes_seq == seq:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+
+    async def _read_request(self, reader):
+        request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+        if not request_line:
+            return None
+
+        method, target, version = request_line.decode("latin-1").split()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0))
+        body = await reader.readexactly(length) if length > 0 else b""
+        return method, target, version, headers, body
+
+    def _encode(self, response, keep_alive, chunked=False):
+        lines = [f"HTTP/1.1 {response.status} {HTTPStatus(response.status).phrase}",
+                 f"Content-Type: {response.content_type}"]
+        if isinstance(response.payload, bytes):
+            lines.append(f"Content-Length: {len(response.payload)}")
+        elif chunked:
+            lines.append("Transfer-Encoding: chunked")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        lines += [f"{name}: {value}" for name, value in response.headers.items()]
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        if not isinstance(response.payload, bytes):
+            return head
+        return head + response.payload
+
+    async def _chunks(self, payload):
+        # Асинхронный генератор читаем прямо в цикле событий, обычный - по куску в пуле потоков
+        if inspect.isasyncgen(payload):
+            async for chunk in payload:
+                yield chunk
+            return
+        loop = asyncio.get_running_loop()
+        while (chunk := await loop.run_in_executor(self._streams, next, payload, None)) is not None:
+            yield chunk
+
+    async def _stream(self, writer, response, chunked):
+        # Тело-генератор отправляем по кускам. С chunked-кодированием соединение
+        # после ответа остается открытым, без него конец тела - закрытие соединения
+        writer.write(self._encode(response, chunked, chunked))
+        await writer.drain()
+        chunks = self._chunks(response.payload)
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk) if chunked else chunk)
+                await writer.drain()
+            if chunked:
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+        finally:
+            await chunks.aclose()
+            if inspect.isasyncgen(response.payload):
+                await response.payload.aclose()
+            else:
+                try:
+                    response.payload.close()
+                except ValueError:
+                    # Генератор еще кодирует кусок в пуле, закроется сам после отключения
+                    pass
+
+    def _blocks(self, method, path):
+        # Изменения пишутся в хранилище (log, sqlite) прямо при обработке, а пока задачи
+        # загружаются в фоне, чтения по id, поиск и курсоры ждут загрузки - такие запросы
+        # выполняем в пуле, чтобы цикл событий продолжал обслуживать остальные соединения
+        return method == "POST" or (path != "/metrics" and not self._task_manager.wait_restored(0))
+
+    async def _handle_connection(self, reader, writer):
+        self._connections.add(asyncio.current_task())
+        try:
+            # Запросы из одного соединения обрабатываем по порядку,
+            # поэтому конвейерные (pipelined) запросы отвечаются в том же порядке
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ValueError as e:
+                    print(f"bad request: {e}")
+                    writer.write(self._encode(error_response(400, "Bad request"), False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                method, target, version, headers, body = request
+                connection = headers.get("connection", "").lower()
+                if version == "HTTP/1.0":
+                    keep_alive = connection == "keep-alive"
+                else:
+                    keep_alive = connection != "close"
+
+                if self._blocks(method, urlparse(target).path):
+                    response = await asyncio.get_running_loop().run_in_executor(
+                        self._calls, self._api.dispatch, method, target, headers, body)
+                else:
+                    response = self._api.dispatch(method, target, headers, body)
+                if not isinstance(response.payload, bytes):
+                    chunked = keep_alive and version == "HTTP/1.1"
+                    await self._stream(writer, response, chunked)
+                    if not chunked:
+                        break
+                    continue
+                writer.write(self._encode(response, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.discard(asyncio.current_task())
+            writer.close()
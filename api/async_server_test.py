@@ -0,0 +1,328 @@
+import asyncio
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+import requests
+
+from api import task_api
+from api.async_server import AsyncTaskServer
+from models.priority import Priority
+from models.task import Task
+from services.task_manager import TaskManager
+from storage.file_storage import FileStorage
+
+
+@pytest.fixture
+def task_manager(tmp_path):
+    file_path = tmp_path / "test.txt"
+    storage = FileStorage(file_path)
+    task_manager = TaskManager(storage)
+    yield task_manager
+
+
+@contextmanager
+def serve(task_manager):
+    # Сервер с циклом событий в отдельном потоке, возвращает (host, port)
+    tasks_server = AsyncTaskServer(task_manager, "127.0.0.1", 0)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(tasks_server.start())
+
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    try:
+        yield tasks_server.server_address
+    finally:
+        asyncio.run_coroutine_threadsafe(tasks_server.stop(), loop).result(timeout=1)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=1)
+        loop.close()
+
+
+@pytest.fixture
+def server(task_manager):
+    with serve(task_manager) as address:
+        yield address
+
+
+def read_responses(sock, count):
+    # Читаем count ответов с Content-Length из одного соединения
+    data = b""
+    responses = []
+    while len(responses) < count:
+        chunk = sock.recv(65536)
+        assert chunk
+        data += chunk
+        while b"\r\n\r\n" in data:
+            head, rest = data.split(b"\r\n\r\n", 1)
+            length = int(head.lower().split(b"content-length: ")[1].split(b"\r\n")[0])
+            if len(rest) < length:
+                break
+            responses.append((head, rest[:length]))
+            data = rest[length:]
+    return responses
+
+
+def test_create_and_get_task(server):
+    # Arrange
+    host, port = server
+    url = f"http://{host}:{port}"
+
+    # Act
+    created = requests.post(f"{url}/tasks", json={"title": "test1", "priority": "high"}, timeout=1.0)
+    completed = requests.post(f"{url}/tasks/1/complete", timeout=1.0)
+    got = requests.get(f"{url}/tasks/1", timeout=1.0)
+
+    # Assert
+    assert created.status_code == 201
+    assert created.json()["id"] == 1
+    assert completed.status_code == 200
+    assert got.json()["isDone"] == True
+
+
+def test_not_found(server):
+    # Arrange
+    host, port = server
+
+    # Act
+    resp = requests.get(f"http://{host}:{port}/users", timeout=1.0)
+
+    # Assert
+    assert resp.status_code == 404
+    assert "error" in resp.json()
+
+
+def test_pipelined_requests_keep_alive(server):
+    # Arrange
+    body = b'{"title": "test1", "priority": "low"}'
+    request = (b"POST /tasks HTTP/1.1\r\nHost: test\r\nContent-Length: "
+               + str(len(body)).encode() + b"\r\n\r\n" + body)
+
+    # Act
+    # Три запроса одним пакетом в одном соединении
+    with socket.create_connection(server, timeout=1.0) as sock:
+        sock.sendall(request + request + b"GET /tasks HTTP/1.1\r\nHost: test\r\n\r\n")
+        responses = read_responses(sock, 3)
+
+    # Assert
+    assert responses[0][0].startswith(b"HTTP/1.1 201")
+    assert b"Connection: keep-alive" in responses[0][0]
+    assert b'"id": 1' in responses[0][1]
+    assert b'"id": 2' in responses[1][1]
+    assert responses[2][0].startswith(b"HTTP/1.1 200")
+    assert responses[2][1].count(b'"id"') == 2
+
+
+def test_bad_request(server):
+    # Arrange
+
+    # Act
+    with socket.create_connection(server, timeout=1.0) as sock:
+        sock.sendall(b"garbage\r\n\r\n")
+        response = sock.recv(4096)
+
+    # Assert
+    assert response.startswith(b"HTTP/1.1 400")
+
+
+def test_idle_connections_without_threads(server):
+    # Arrange
+    host, port = server
+    threads_before = threading.active_count()
+
+    # Act
+    # Много простаивающих соединений не создают потоков
+    sockets = [socket.create_connection(server, timeout=1.0) for _ in range(500)]
+    try:
+        resp = requests.get(f"http://{host}:{port}/tasks", timeout=1.0)
+        threads_during = threading.active_count()
+    finally:
+        for sock in sockets:
+            sock.close()
+
+    # Assert
+    assert resp.status_code == 200
+    assert threads_during == threads_before
+
+
+def test_post_is_answered_after_save(tmp_path):
+    # Arrange
+    storage = SlowSaveStorage(tmp_path / "test.txt")
+    task_manager = TaskManager(storage)
+
+    # Act
+    with serve(task_manager) as (host, port):
+        created = requests.post(f"http://{host}:{port}/tasks", json={"title": "test1", "priority": "low"}, timeout=5)
+        saved = [task.title for task in FileStorage(tmp_path / "test.txt").restore_tasks()]
+
+    # Assert
+    assert created.status_code == 201
+    assert saved == ["test1"]
+
+
+def test_changes_event_stream(server, task_manager):
+    # Arrange
+    host, port = server
+    task_manager.add_task("test1", Priority.low)
+    sock = socket.create_connection((host, port), timeout=2)
+
+    # Act
+    sock.sendall(b"GET /tasks/changes HTTP/1.1\r\nHost: x\r\nAccept: text/event-stream\r\n"
+                 b"Last-Event-ID: " + f"{task_manager.changes_epoch}-0".encode("ascii") + b"\r\n\r\n")
+    data = b""
+    while b"event: created" not in data:
+        data += sock.recv(65536)
+    task_manager.complete_task(1)
+    while b"event: completed" not in data:
+        data += sock.recv(65536)
+    sock.close()
+
+    # Assert
+    head = data.split(b"\r\n\r\n", 1)[0].lower()
+    assert b"content-type: text/event-stream" in head
+    assert b"content-length" not in head
+    assert f"id: {task_manager.changes_epoch}-2\nevent: completed\n".encode("ascii") in data
+
+
+def test_event_streams_wait_without_threads(server, task_manager):
+    # Arrange
+    host, port = server
+    threads_before = threading.active_count()
+    sockets = [socket.create_connection((host, port), timeout=2) for _ in range(100)]
+
+    # Act
+    try:
+        for sock in sockets:
+            sock.sendall(b"GET /tasks/changes HTTP/1.1\r\nHost: x\r\nAccept: text/event-stream\r\n\r\n")
+        heads = [sock.recv(65536) for sock in sockets]
+        threads_during = threading.active_count()
+        task_manager.add_task("test1", Priority.low)
+        events = []
+        for sock in sockets:
+            data = b""
+            while b"event: created" not in data:
+                data += sock.recv(65536)
+            events.append(data)
+    finally:
+        for sock in sockets:
+            sock.close()
+
+    # Assert
+    assert all(head.startswith(b"HTTP/1.1 200") for head in heads)
+    assert threads_during == threads_before
+    assert all(b"event: created" in data for data in events)
+
+
+def test_long_poll_wakes_on_change(server, task_manager):
+    # Arrange
+    host, port = server
+    since = f"{task_manager.changes_epoch}-0"
+    timer = threading.Timer(0.1, task_manager.add_task, args=("test1", Priority.high))
+
+    # Act
+    started = time.perf_counter()
+    timer.start()
+    response = requests.get(f"http://{host}:{port}/tasks/changes?since={since}&timeout=5", timeout=5)
+    elapsed = time.perf_counter() - started
+    timed_out = requests.get(f"http://{host}:{port}/tasks/changes?since={response.json()['seq']}&timeout=0.1",
+                             timeout=5)
+
+    # Assert
+    assert response.status_code == 200
+    assert [e["task"]["title"] for e in response.json()["changes"]] == ["test1"]
+    assert elapsed < 2
+    assert timed_out.json() == {"changes": [], "seq": f"{task_manager.changes_epoch}-1"}
+
+
+def test_stream_next_to_event_stream(task_manager, monkeypatch):
+    # Arrange
+    monkeypatch.setattr(task_api, "STREAM_MIN_TASKS", 10)
+    task_manager.add_tasks([(f"test{i}", Priority.low) for i in range(20)])
+
+    # Act
+    with serve(task_manager) as (host, port):
+        sock = socket.create_connection((host, port), timeout=2)
+        try:
+            sock.sendall(b"GET /tasks/changes HTTP/1.1\r\nHost: x\r\nAccept: text/event-stream\r\n\r\n")
+            sock.recv(65536)
+            listing = requests.get(f"http://{host}:{port}/tasks", timeout=5)
+        finally:
+            sock.close()
+
+    # Assert
+    assert listing.status_code == 200
+    assert len(listing.json()) == 20
+
+
+# Медленное сохранение: ответ на изменение не должен уйти раньше, чем оно закончится
+class SlowSaveStorage(FileStorage):
+    def save_tasks(self, tasks):
+        time.sleep(0.2)
+        super().save_tasks(tasks)
+
+
+# Хранилище, запись в которое ждет разрешения теста
+class BlockingStorage(FileStorage):
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def insert_task(self, task):
+        self.entered.set()
+        self.release.wait(5)
+
+    def restore_meta(self):
+        return {"maxId": 1, "count": 1}
+
+    def iter_tasks(self):
+        self.entered.set()
+        self.release.wait(5)
+        yield Task("restored", Priority.low, False, 1)
+
+
+def test_storage_writes_do_not_block_event_loop(tmp_path):
+    # Arrange
+    storage = BlockingStorage(tmp_path / "test.txt")
+    task_manager = TaskManager(storage)
+    created = []
+
+    # Act
+    with serve(task_manager) as (host, port):
+        writer = threading.Thread(target=lambda: created.append(
+            requests.post(f"http://{host}:{port}/tasks", json={"title": "test1", "priority": "low"}, timeout=5)))
+        writer.start()
+        storage.entered.wait(5)
+        listing = requests.get(f"http://{host}:{port}/tasks", timeout=1)
+        storage.release.set()
+        writer.join()
+
+    # Assert
+    assert listing.status_code == 200
+    assert created[0].status_code == 201
+
+
+def test_background_restore_waits_do_not_block_event_loop(tmp_path):
+    # Arrange
+    storage = BlockingStorage(tmp_path / "test.txt")
+    task_manager = TaskManager(storage)
+    task_manager.restore_tasks(background=True)
+    storage.entered.wait(5)
+    found = []
+
+    # Act
+    with serve(task_manager) as (host, port):
+        reader = threading.Thread(target=lambda: found.append(requests.get(f"http://{host}:{port}/tasks/1", timeout=5)))
+        reader.start()
+        # Даем запросу дойти до ожидания загрузки
+        time.sleep(0.2)
+        metrics = requests.get(f"http://{host}:{port}/metrics", timeout=1)
+        storage.release.set()
+        reader.join()
+
+    # Assert
+    assert metrics.status_code == 404
+    assert found[0].json()["title"] == "restored"
@@ -0,0 +1,229 @@
+import os
+import signal
+import socket
+import struct
+import threading
+import time
+from functools import partial
+from http.server import ThreadingHTTPServer
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+from api.response_cache import TaskListCache, gzip_etag
+from api.task_api import Response, TaskAPI, error_response
+from api.task_handler import TaskRESTHandler
+
+# Размер общей памяти под снимок GET /tasks, больший список воркеры берут у писателя
+SNAPSHOT_SIZE = 64 * 1024 * 1024
+# Заголовок снимка: счетчик seqlock, длина ETag, длина тела, версия списка в снимке
+SNAPSHOT_HEADER = struct.Struct("<QIIQ")
+SEQ = struct.Struct("<Q")
+# После заголовка - последняя версия списка у писателя, вне seqlock: пишется после каждого изменения
+LATEST = struct.Struct("<Q")
+DATA_OFFSET = SNAPSHOT_HEADER.size + LATEST.size
+# Длина тела, которое не поместилось в общую память
+OVERFLOW = 0xFFFFFFFF
+
+
+# Снимок ответа GET /tasks в общей памяти. Пишет один процесс, читают воркеры без блокировок:
+# писатель делает счетчик нечетным на время записи, а читатель повторяет чтение,
+# если застал нечетный счетчик или счетчик поменялся, пока он копировал данные.
+# Снимок пересобирается лениво: после изменения писатель только записывает новую версию,
+# а снимок старше нее читатель не отдает, и тогда GET /tasks идет к писателю, который его обновит.
+# Воркеры создаются через fork и наследуют отображение памяти, так что повторно не подключаются
+class SharedSnapshot:
+    def __init__(self, size=SNAPSHOT_SIZE):
+        self._shm = SharedMemory(create=True, size=size)
+        self._buf = self._shm.buf
+        self._seq = 0
+        SNAPSHOT_HEADER.pack_into(self._buf, 0, 0, 0, 0, 0)
+        LATEST.pack_into(self._buf, SNAPSHOT_HEADER.size, 0)
+
+    def set_latest(self, version):
+        # O(1) после каждого изменения вместо пересборки тела
+        LATEST.pack_into(self._buf, SNAPSHOT_HEADER.size, version)
+
+    def publish(self, etag, body, version=0):
+        etag = etag.encode("ascii")
+        start = DATA_OFFSET
+        end = start + len(etag) + len(body)
+
+        self._seq += 1
+        SEQ.pack_into(self._buf, 0, self._seq)
+        if end > len(self._buf):
+            SNAPSHOT_HEADER.pack_into(self._buf, 0, self._seq, 0, OVERFLOW, version)
+        else:
+            SNAPSHOT_HEADER.pack_into(self._buf, 0, self._seq, len(etag), len(body), version)
+            self._buf[start:start + len(etag)] = etag
+            self._buf[start + len(etag):end] = body
+        self._seq += 1
+        SEQ.pack_into(self._buf, 0, self._seq)
+
+    def read(self):
+        # (etag, тело) или None, если снимка еще нет, он не поместился или отстал от писателя
+        while True:
+            seq, etag_len, body_len, version = SNAPSHOT_HEADER.unpack_from(self._buf, 0)
+            if seq % 2:
+                time.sleep(0)
+                continue
+            if seq == 0 or body_len == OVERFLOW or version != LATEST.unpack_from(self._buf, SNAPSHOT_HEADER.size)[0]:
+                return None
+
+            start = DATA_OFFSET
+            etag = bytes(self._buf[start:start + etag_len])
+            body = bytes(self._buf[start + etag_len:start + etag_len + body_len])
+            if SEQ.unpack_from(self._buf, 0)[0] == seq:
+                return etag.decode("ascii"), body
+
+    def close(self):
+        self._buf.release()
+        self._shm.close()
+        self._shm.unlink()
+
+
+# API в процессе-воркере: GET /tasks отдается из снимка, остальное пересылается писателю
+class WorkerAPI:
+    def __init__(self, conn, snapshot):
+        self._conn = conn
+        # Через одно соединение с писателем идет один запрос за раз
+        self._conn_lock = threading.Lock()
+        self._snapshot = snapshot
+
+    def _read_snapshot(self, headers):
+        snapshot = self._snapshot.read()
+        if snapshot is None:
+            return None
+
+        etag, body = snapshot
+        if_none_match = headers.get("if-none-match")
+        # Клиент мог получить сжатое тело той же версии от писателя
+        tags = [tag.strip() for tag in if_none_match.split(",")] if if_none_match else []
+        for tag in tags:
+            if tag in (etag, "*", gzip_etag(etag)):
+                return Response(304, headers={"ETag": etag if tag == "*" else tag})
+        return Response(200, body, headers={"ETag": etag})
+
+    def dispatch(self, method, target, headers, body):
+        if method == "GET" and target == "/tasks":
+            response = self._read_snapshot(headers)
+            if response is not None:
+                return response
+        # Ожидание изменений заняло бы канал к писателю, а поток событий через него не передать
+        if method == "GET" and target.startswith("/tasks/changes"):
+            return error_response(501, "Change feed is not available in prefork mode")
+
+        with self._conn_lock:
+            self._conn.send((method, target, headers, body))
+            status, payload, content_type, response_headers = self._conn.recv()
+        return Response(status, payload, content_type, response_headers)
+
+
+def _run_worker(listen_socket, conn, snapshot):
+    # Ctrl+C получает вся группа процессов, а воркеров останавливает писатель.
+    # Обработчик SIGTERM писателя (см. main.run) воркерам не нужен: писатель завершает их через terminate
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    handler = partial(TaskRESTHandler, WorkerAPI(conn, snapshot))
+    # Сокет уже слушает в родителе, свой не создаем
+    server = ThreadingHTTPServer(listen_socket.getsockname(), handler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = listen_socket
+    server.server_name, server.server_port = listen_socket.getsockname()[:2]
+    server.serve_forever()
+
+
+# Pre-fork сервер: N процессов-воркеров принимают соединения с общего сокета,
+# а единственный писатель (этот процесс) владеет TaskManager и хранилищем.
+# Изменения воркеры пересылают писателю по каналу, а снимок списка в общей памяти писатель
+# обновляет при первом чтении после изменений, поэтому чтение GET /tasks масштабируется по ядрам,
+# а серия записей не пересобирает тело после каждой
+class PreforkTaskServer:
+    def __init__(self, task_manager, host="127.0.0.1", port=8000, workers=None, snapshot_size=SNAPSHOT_SIZE):
+        self._task_manager = task_manager
+        self._list_cache = TaskListCache(task_manager)
+        self._api = TaskAPI(task_manager, list_cache=self._list_cache)
+        self._socket = socket.create_server((host, port), backlog=128)
+        self._snapshot = SharedSnapshot(snapshot_size)
+        self._workers = workers or os.cpu_count()
+        self._publish_lock = threading.Lock()
+        self._published = None
+        self._latest_lock = threading.Lock()
+        self._latest = 0
+        self._processes = []
+
+    @property
+    def server_address(self):
+        return self._socket.getsockname()[:2]
+
+    def publish(self):
+        # Обновляем снимок, только если список изменился с прошлой публикации.
+        # Версию берем из кэша вместе с телом: тело может быть только новее версии снимка
+        with self._publish_lock:
+            version = self._task_manager.version
+            if version == self._published:
+                return
+            etag, body = self._list_cache.body()
+            self._snapshot.publish(etag, body, version)
+            self._published = version
+
+    def _mark_changed(self):
+        # Последняя версия только растет: поток, который прочитал версию раньше, не откатит ее
+        with self._latest_lock:
+            self._latest = max(self._latest, self._task_manager.version)
+            self._snapshot.set_latest(self._latest)
+
+    def _serve_worker(self, conn):
+        while True:
+            try:
+                method, target, headers, body = conn.recv()
+            except (EOFError, OSError):
+                return
+            # Ошибка сборки тела или публикации не должна останавливать поток: воркер ждет ответа, держа канал
+            try:
+                if method == "GET" and target == "/tasks":
+                    # Воркер застал снимок старше изменений: обновляем его для следующих чтений
+                    self.publish()
+                response = self._api.dispatch(method, target, headers, body)
+                if not isinstance(response.payload, bytes):
+                    # Генератор через канал не передать, собираем тело целиком
+                    response.payload = b"".join(response.payload)
+            except Exception as e:
+                print(f"prefork dispatch error: {e} {method} {target}")
+                response = error_response(500, "Internal server error")
+            # Отмечаем версию до ответа, чтобы клиент не получил снимок без своего изменения
+            self._mark_changed()
+            conn.send((response.status, response.payload, response.content_type, response.headers))
+
+    def start(self):
+        # Снимок должен содержать все задачи еще до первого чтения
+        self._task_manager.wait_restored()
+        self._mark_changed()
+        self.publish()
+
+        context = get_context("fork")
+        connections = []
+        for _ in range(self._workers):
+            conn, worker_conn = context.Pipe()
+            process = context.Process(target=_run_worker, args=(self._socket, worker_conn, self._snapshot),
+                                      daemon=True)
+            process.start()
+            worker_conn.close()
+            self._processes.append(process)
+            connections.append(conn)
+
+        # Потоки писателя запускаем после fork, чтобы воркеры их не унаследовали
+        for conn in connections:
+            threading.Thread(target=self._serve_worker, args=(conn,), daemon=True).start()
+
+    def serve_forever(self):
+        self.start()
+        for process in self._processes:
+            process.join()
+
+    def close(self):
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join()
+        self._socket.close()
+        self._snapshot.close()
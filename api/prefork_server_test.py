@@ -0,0 +1,167 @@
+import pytest
+import requests
+
+from api.prefork_server import PreforkTaskServer, SharedSnapshot
+from models.priority import Priority
+from services.task_manager import TaskManager
+from storage.file_storage import FileStorage
+
+
+@pytest.fixture
+def task_manager(tmp_path):
+    file_path = tmp_path / "test.txt"
+    storage = FileStorage(file_path)
+    task_manager = TaskManager(storage)
+    yield task_manager
+
+
+@pytest.fixture
+def server(task_manager):
+    prefork_server = PreforkTaskServer(task_manager, "127.0.0.1", 0, workers=2)
+    prefork_server.start()
+    try:
+        yield prefork_server
+    finally:
+        prefork_server.close()
+
+
+def url(server, path):
+    host, port = server.server_address
+    return f"http://{host}:{port}{path}"
+
+
+def test_snapshot_publish_and_read():
+    # Arrange
+    snapshot = SharedSnapshot(1024)
+
+    # Act
+    empty = snapshot.read()
+    snapshot.publish('"a-1"', b"[]", 1)
+    snapshot.publish('"a-2"', b'[{"id": 1}]', 2)
+    snapshot.set_latest(2)
+    published = snapshot.read()
+    snapshot.set_latest(3)
+    stale = snapshot.read()
+    snapshot.close()
+
+    # Assert
+    assert empty is None
+    assert published == ('"a-2"', b'[{"id": 1}]')
+    assert stale is None
+
+
+def test_snapshot_overflow():
+    # Arrange
+    snapshot = SharedSnapshot(64)
+
+    # Act
+    snapshot.publish('"a-1"', b"x" * 100)
+    published = snapshot.read()
+    snapshot.close()
+
+    # Assert
+    assert published is None
+
+
+def test_writes_are_visible_to_all_workers(server, task_manager):
+    # Arrange
+    session = requests.Session()
+
+    # Act
+    created = [session.post(url(server, "/tasks"), json={"title": f"Task {i}", "priority": "high"})
+               for i in range(5)]
+    completed = session.post(url(server, "/tasks/2/complete"))
+    # Разные соединения попадают на разных воркеров
+    listings = [requests.get(url(server, "/tasks")).json() for _ in range(6)]
+
+    # Assert
+    assert [r.status_code for r in created] == [201] * 5
+    assert [r.json()["id"] for r in created] == [1, 2, 3, 4, 5]
+    assert completed.status_code == 200
+    assert task_manager.get_task(2).is_done
+    expected = [{"title": f"Task {i}", "priority": Priority.high.name, "isDone": i == 1, "id": i + 1}
+                for i in range(5)]
+    assert all(listing == expected for listing in listings)
+
+
+def test_writes_do_not_rebuild_snapshot(server, task_manager, monkeypatch):
+    # Arrange
+    session = requests.Session()
+    builds = []
+    body = server._list_cache.body
+
+    def counted_body():
+        builds.append(task_manager.version)
+        return body()
+
+    monkeypatch.setattr(server._list_cache, "body", counted_body)
+
+    # Act
+    for i in range(10):
+        session.post(url(server, "/tasks"), json={"title": f"Task {i}", "priority": "low"})
+    builds_after_writes = len(builds)
+    listings = [requests.get(url(server, "/tasks")).json() for _ in range(4)]
+
+    # Assert
+    assert builds_after_writes == 0
+    assert all(len(listing) == 10 for listing in listings)
+    assert len(builds) <= 2
+
+
+def test_get_tasks_not_modified_from_snapshot(server):
+    # Arrange
+    requests.post(url(server, "/tasks"), json={"title": "Task", "priority": "low"})
+    etag = requests.get(url(server, "/tasks")).headers["ETag"]
+
+    # Act
+    not_modified = requests.get(url(server, "/tasks"), headers={"If-None-Match": etag})
+    requests.post(url(server, "/tasks/1/complete"))
+    modified = requests.get(url(server, "/tasks"), headers={"If-None-Match": etag})
+
+    # Assert
+    assert not_modified.status_code == 304
+    assert modified.status_code == 200
+    assert modified.json()[0]["isDone"]
+
+
+def test_queries_are_forwarded_to_writer(server):
+    # Arrange
+    requests.post(url(server, "/tasks:batch"), json=[{"title": "A", "priority": "low"},
+                                                    {"title": "B", "priority": "high"}])
+
+    # Act
+    filtered = requests.get(url(server, "/tasks?priority=high"))
+    single = requests.get(url(server, "/tasks/1"))
+    missing = requests.get(url(server, "/tasks/9"))
+
+    # Assert
+    assert [task["title"] for task in filtered.json()] == ["B"]
+    assert single.json()["title"] == "A"
+    assert missing.status_code == 404
+
+
+def test_failed_request_does_not_block_worker(server, task_manager, monkeypatch):
+    # Arrange
+    # Одно keep-alive соединение - один и тот же воркер
+    session = requests.Session()
+    add_task = task_manager.add_task
+    calls = []
+
+    def fail_once(title, priority):
+        calls.append(title)
+        if len(calls) == 1:
+            raise RuntimeError("broken")
+        return add_task(title, priority)
+
+    monkeypatch.setattr(task_manager, "add_task", fail_once)
+
+    # Act
+    failed = session.post(url(server, "/tasks"), json={"title": "Task", "priority": "low"}, timeout=5)
+    invalid = session.post(url(server, "/tasks"), json={"title": "", "priority": "low"}, timeout=5)
+    created = session.post(url(server, "/tasks"), json={"title": "Task", "priority": "low"}, timeout=5)
+
+    # Assert
+    assert failed.status_code == 500
+    assert invalid.status_code == 400
+    assert created.status_code == 201
+    assert created.json()["title"] == "Task"
@@ -0,0 +1,81 @@
+import gzip
+import uuid
+
+from models import codec
+
+
+# Уровень сжатия gzip: ответы сжимаются на лету, максимальный уровень слишком медленный
+GZIP_LEVEL = 6
+# Суффикс ETag сжатого тела: сильный ETag у разных Content-Encoding одного ответа должен отличаться
+GZIP_ETAG_SUFFIX = "-gz"
+
+
+def gzip_etag(etag):
+    # "abc-1" -> "abc-1-gz"
+    return f'{etag[:-1]}{GZIP_ETAG_SUFFIX}"'
+
+
+# Кэш сериализованного ответа GET /tasks.
+# Тело целиком пересобирается только когда менеджер задач изменился (по его версии),
+# а уже закодированные задачи берутся из кэша фрагментов, так что выполнение одной задачи
+# перекодирует только ее, а не весь список
+class TaskListCache:
+    def __init__(self, task_manager):
+        self._task_manager = task_manager
+        # Префикс ETag, чтобы версии разных запусков сервера не совпадали
+        self._instance = uuid.uuid4().hex[:8]
+        # id -> (задача, выполнена ли на момент кодирования, json задачи)
+        self._fragments = {}
+        # (версия, тело) одним кортежем, чтобы потоки не перепутали тело и версию
+        self._cached = (None, None)
+        # (тело, сжатое тело): сжимаем заново, только когда тело пересобрано
+        self._gzipped = (None, None)
+
+    def etag(self, version=None):
+        if version is None:
+            version = self._task_manager.version
+        return f'"{self._instance}-{version}"'
+
+    def _fragment(self, task):
+        # Название и приоритет у задачи не меняются, поэтому достаточно сверить is_done
+        cached = self._fragments.get(task.id)
+        if cached is not None and cached[0] is task and cached[1] == task.is_done:
+            return cached[2]
+
+        fragment = codec.encode_task(task).encode("ascii")
+        self._fragments[task.id] = (task, task.is_done, fragment)
+        return fragment
+
+    def body(self):
+        # Версию читаем до задач: тело не может оказаться старше своего ETag
+        version = self._task_manager.version
+        cached_version, body = self._cached
+        if cached_version == version:
+            return self.etag(version), body
+
+        body = b"[" + b", ".join(self._fragment(task) for task in self._task_manager.tasks) + b"]"
+        self._cached = (version, body)
+        return self.etag(version), body
+
+    def gzip_body(self):
+        etag, body = self.body()
+        cached_body, compressed = self._gzipped
+        if cached_body is not body:
+            # mtime=0: одинаковое тело всегда сжимается в одинаковые байты
+            compressed = gzip.compress(body, GZIP_LEVEL, mtime=0)
+            self._gzipped = (body, compressed)
+        return gzip_etag(etag), compressed
+
+    def matching_etag(self, if_none_match):
+        # Текущий ETag (несжатого или сжатого тела), который есть у клиента, или None.
+        # Заголовок If-None-Match может содержать несколько ETag через запятую или *
+        if not if_none_match:
+            return None
+        etag = self.etag()
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag in (etag, "*"):
+                return etag
+            if tag == gzip_etag(etag):
+                return tag
+        return None
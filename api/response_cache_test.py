@@ -0,0 +1,105 @@
+import gzip
+import json
+
+import pytest
+
+from api.response_cache import TaskListCache
+from models.priority import Priority
+from models.task import Task
+from services.task_manager import TaskManager
+from storage.file_storage import FileStorage
+
+
+@pytest.fixture
+def task_manager(tmp_path):
+    file_path = tmp_path / "test.txt"
+    storage = FileStorage(file_path)
+    task_manager = TaskManager(storage)
+    yield task_manager
+
+
+@pytest.fixture
+def encoded(monkeypatch):
+    # Считаем, сколько задач было закодировано
+    calls = []
+    to_json = Task.to_json
+
+    def counting_to_json(task):
+        calls.append(task.id)
+        return to_json(task)
+
+    monkeypatch.setattr(Task, "to_json", counting_to_json)
+    yield calls
+
+
+def test_cache_body_matches_json(task_manager):
+    # Arrange
+    task_manager.add_task("test1", Priority.low)
+    task_manager.add_task("test2", Priority.high)
+    cache = TaskListCache(task_manager)
+
+    # Act
+    etag, body = cache.body()
+
+    # Assert
+    assert body == json.dumps([task.to_dict() for task in task_manager.tasks]).encode("utf-8")
+    assert etag == cache.etag()
+
+
+def test_cache_reencodes_only_changed_task(task_manager, encoded):
+    # Arrange
+    for i in range(5):
+        task_manager.add_task(f"test{i}", Priority.low)
+    cache = TaskListCache(task_manager)
+    first_etag, _ = cache.body()
+    encoded.clear()
+
+    # Act
+    cache.body()
+    unchanged_calls = list(encoded)
+    task_manager.complete_task(3)
+    second_etag, body = cache.body()
+
+    # Assert
+    assert unchanged_calls == []
+    assert encoded == [3]
+    assert second_etag != first_etag
+    assert json.loads(body)[2]["isDone"] == True
+
+
+def test_cache_matches_if_none_match(task_manager):
+    # Arrange
+    task_manager.add_task("test1", Priority.low)
+    cache = TaskListCache(task_manager)
+    etag, _ = cache.body()
+
+    # Act
+    before_change = cache.matching_etag(f'"other", {etag}')
+    task_manager.add_task("test2", Priority.low)
+    after_change = cache.matching_etag(etag)
+
+    # Assert
+    assert before_change == etag
+    assert after_change is None
+    assert cache.matching_etag(None) is None
+
+
+def test_cache_gzip_body_reused_until_change(task_manager):
+    # Arrange
+    for i in range(50):
+        task_manager.add_task(f"test{i}", Priority.low)
+    cache = TaskListCache(task_manager)
+
+    # Act
+    etag, first = cache.gzip_body()
+    _, second = cache.gzip_body()
+    task_manager.complete_task(1)
+    changed_etag, changed = cache.gzip_body()
+
+    # Assert
+    assert second is first
+    assert gzip.decompress(first) == cache.body()[1].replace(b'"isDone": true, "id": 1}', b'"isDone": false, "id": 1}', 1)
+    assert changed_etag != etag
+    assert etag.endswith('-gz"')
+    assert cache.matching_etag(changed_etag) == changed_etag
+    assert json.loads(gzip.decompress(changed))[0]["isDone"] == True
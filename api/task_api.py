@@ -0,0 +1,475 @@
+import gzip
+import inspect
+import time
+import zlib
+from functools import partial
+from urllib.parse import parse_qs, urlparse
+
+from api.response_cache import GZIP_LEVEL, TaskListCache, gzip_etag
+from models import codec
+from models.priority import Priority
+from services.title_index import tokenize
+
+# Максимальный размер страницы в GET /tasks?limit=
+MAX_PAGE_SIZE = 1000
+# Максимальное ожидание в GET /tasks/changes?timeout=, секунды
+MAX_POLL_TIMEOUT = 60
+# Как часто поток Server-Sent Events шлет комментарий, чтобы заметить отключение клиента
+SSE_HEARTBEAT = 15
+# Ответы меньше этого размера не сжимаем: выигрыш меньше заголовков и затрат на сжатие
+GZIP_MIN_SIZE = 1024
+# С такого числа задач GET /tasks кодируется потоком, а не собирается в памяти целиком
+STREAM_MIN_TASKS = 10000
+# Задач в одном куске потокового ответа
+STREAM_BATCH = 1000
+
+
+# Ответ API, не зависящий от того, какой сервер его отправляет
+class Response:
+    def __init__(self, status, payload=b"", content_type="application/json", headers=None):
+        self.status = status
+        self.payload = payload
+        self.content_type = content_type
+        self.headers = headers or {}
+
+
+def json_response(data, status=200):
+    return Response(status, codec.dumps(data).encode("utf-8"))
+
+
+# Задачи кодируются по схеме, без словарей to_dict
+def task_response(task, status=200):
+    return Response(status, codec.encode_task(task).encode("ascii"))
+
+
+def tasks_response(tasks, status=200):
+    return Response(status, codec.encode_tasks(tasks).encode("ascii"))
+
+
+def error_response(status, msg):
+    return json_response({"error": msg}, status)
+
+
+def accepts_gzip(headers):
+    # Accept-Encoding: gzip, deflate;q=0.5 - gzip подходит, если он (или *) указан без q=0
+    for part in headers.get("accept-encoding", "").split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        params = params.replace(" ", "")
+        try:
+            if params.startswith("q=") and float(params[2:]) == 0:
+                continue
+        except ValueError:
+            continue
+        return True
+    return False
+
+
+def gzip_stream(chunks):
+    # Сжатие потока кусков без сборки тела целиком, wbits=31 - формат gzip
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    try:
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+    finally:
+        chunks.close()
+
+
+def compress(response, headers):
+    # Сжимаем готовое тело ответа, если клиент принимает gzip и тело достаточно большое
+    if (not isinstance(response.payload, bytes) or len(response.payload) < GZIP_MIN_SIZE
+            or "Content-Encoding" in response.headers or not accepts_gzip(headers)):
+        return response
+    response.payload = gzip.compress(response.payload, GZIP_LEVEL, mtime=0)
+    response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    if "ETag" in response.headers:
+        response.headers["ETag"] = gzip_etag(response.headers["ETag"])
+    return response
+
+
+# Маршрутизация и логика запросов к задачам, общая для всех серверов
+class TaskAPI:
+    def __init__(self, task_manager, metrics=None, profiler=None, list_cache=None, waits=True, wait_changes=None):
+        # Добавляем объект для управления списком задач
+        self._task_manager = task_manager
+        self._save = task_manager.save_tasks
+        # Кэш тела GET /tasks, pre-fork сервер передает свой, чтобы ETag совпадали со снимком
+        self._list_cache = list_cache or TaskListCache(task_manager)
+        # Счетчики и задержки запросов для GET /metrics, если переданы
+        self._metrics = metrics
+        # Профилировщик медленных запросов, если включен
+        self._profiler = profiler
+        # Можно ли ждать изменений в GET /tasks/changes: однопоточный сервер на время ожидания
+        # не принял бы и того изменения, которого ждет клиент
+        self._waits = waits
+        # Корутина (seq, timeout), которая ждет изменения после seq на цикле событий (см. AsyncTaskServer).
+        # С ней ожидающие ответы GET /tasks/changes - асинхронные генераторы и не занимают потоки
+        self._wait_changes = wait_changes
+
+    def _parse_json(self, raw):
+        if not raw:
+            return None
+        try:
+            return codec.loads(raw)
+        except Exception as e:
+            print(f"read body error: {e} {raw}")
+            return None
+
+    def create_task(self, raw_body):
+        body = self._parse_json(raw_body)
+        if not isinstance(body, dict) or "title" not in body or "priority" not in body:
+            return error_response(400, "Title and Priority must be specified")
+        if not body["title"] or not isinstance(body["title"], str):
+            return error_response(400, "Title must be a non-empty string")
+
+        # Проверка на соответствие приоритета элементу из заданного Enum
+        try:
+            priority = Priority[body["priority"]]
+        except Exception as e:
+            print(f"create task error: priority must be 'low', 'medium' or 'high', but got {body["priority"]}")
+            return error_response(400,
+                                  f"create task error: priority must be 'low', 'medium' or 'high', but got '{body["priority"]}'")
+
+        # Добавляем задачу и сохраняем файл
+        task = self._task_manager.add_task(body["title"], priority)
+        self._save()
+        # Отправляем в ответ созданную задачу
+        return task_response(task, 201)
+
+    def create_tasks(self, raw_body):
+        body = self._parse_json(raw_body)
+        if not isinstance(body, list) or not body:
+            return error_response(400, "Body must be a non-empty array of tasks")
+
+        # Проверяем всю пачку до добавления
+        items = []
+        for i, item in enumerate(body):
+            if not isinstance(item, dict) or not item.get("title") or not isinstance(item["title"], str):
+                return error_response(400, f"Task {i}: title must be a non-empty string")
+            try:
+                priority = Priority[item.get("priority")]
+            except Exception as e:
+                print(f"create tasks error: {i} priority {item.get('priority')}")
+                return error_response(400,
+                                      f"Task {i}: priority must be 'low', 'medium' or 'high', but got '{item.get('priority')}'")
+            items.append((item["title"], priority))
+
+        # Добавляем пачку и сохраняем файл один раз
+        tasks = self._task_manager.add_tasks(items)
+        self._save()
+        return tasks_response(tasks, 201)
+
+    def complete_tasks(self, raw_body):
+        body = self._parse_json(raw_body)
+        if not isinstance(body, list) or not body or not all(type(task_id) is int for task_id in body):
+            return error_response(400, "Body must be a non-empty array of integer task ids")
+
+        missing = self._task_manager.complete_tasks(body)
+        if missing:
+            return json_response({"error": "Tasks not found", "missing": missing}, 404)
+
+        self._save()
+        return json_response({}, 200)
+
+    def complete_task(self, task_oid):
+        # Проверка на тип id
+        try:
+            task_id = int(task_oid)
+        except Exception as e:
+            print(f"complete task error: {e} {task_oid}")
+            return error_response(400, "Task id must be integer")
+
+        # Если не нашли задачу, то возвращаем 404
+        if not self._task_manager.complete_task(task_id):
+            return error_response(404, "Task not found")
+
+        # Иначе сохраняем задачи и пустое тело ответа
+        self._save()
+        return json_response({}, 200)
+
+    def claim_next_task(self):
+        # Забираем самую важную открытую задачу, она сразу становится выполненной
+        task = self._task_manager.claim_next_task()
+        if task is None:
+            return error_response(404, "No open tasks")
+
+        self._save()
+        return task_response(task, 200)
+
+    def get_task(self, task_oid):
+        # Проверка на тип id
+        try:
+            task_id = int(task_oid)
+        except Exception as e:
+            print(f"get task error: {e} {task_oid}")
+            return error_response(400, "Task id must be integer")
+
+        task = self._task_manager.get_task(task_id)
+        if task is None:
+            return error_response(404, "Task not found")
+        return task_response(task, 200)
+
+    def get_tasks(self, query, headers):
+        # Номер изменения читаем до списка: список может быть только новее,
+        # а повторно примененные события ленты ничего не портят
+        seq = self._changes_token(self._task_manager.changes_seq)
+
+        # Список не менялся с прошлого ответа клиенту - отвечаем 304 без тела
+        etag = self._list_cache.matching_etag(headers.get("if-none-match"))
+        if etag is not None:
+            return Response(304, headers={"ETag": etag, "X-Changes-Seq": seq})
+
+        if not query:
+            if self._task_manager.count_tasks() >= STREAM_MIN_TASKS:
+                return self._stream_tasks(seq, headers)
+            etag, payload = self._list_cache.body()
+            if len(payload) >= GZIP_MIN_SIZE and accepts_gzip(headers):
+                # Сжатый список тоже кэшируется, пока список не изменился
+                etag, payload = self._list_cache.gzip_body()
+                return Response(200, payload, headers={"ETag": etag, "X-Changes-Seq": seq,
+                                                       "Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+            return Response(200, payload, headers={"ETag": etag, "X-Changes-Seq": seq})
+
+        # Поиск, фильтры, сортировка и постраничная выдача: ?q=&priority=&is_done=&sort=&limit=&cursor=
+        etag = self._list_cache.etag()
+        params = {name: values[-1] for name, values in parse_qs(query).items()}
+        try:
+            priority = Priority[params["priority"]] if "priority" in params else None
+            is_done = None
+            if "is_done" in params:
+                if params["is_done"] not in ("true", "false"):
+                    raise ValueError("is_done must be 'true' or 'false'")
+                is_done = params["is_done"] == "true"
+            sort = params.get("sort", "id")
+            limit = int(params["limit"]) if "limit" in params else None
+            if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+                raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+            cursor = int(params["cursor"]) if "cursor" in params else None
+
+            if "q" in params:
+                # Поиск по началам слов названия, результаты всегда по возрастанию id
+                if not tokenize(params["q"]):
+                    raise ValueError("q must contain letters or digits")
+                if sort != "id":
+                    raise ValueError("search results are sorted by id only")
+                tasks, next_cursor = self._task_manager.search_tasks(params["q"], priority, is_done, limit, cursor)
+            else:
+                tasks, next_cursor = self._task_manager.query_tasks(priority, is_done, sort, limit, cursor)
+        except KeyError as e:
+            print(f"get tasks error: {e} {query}")
+            return error_response(400, f"priority must be 'low', 'medium' or 'high', but got {e}")
+        except ValueError as e:
+            print(f"get tasks error: {e} {query}")
+            return error_response(400, f"Invalid query: {e}")
+
+        if limit is None:
+            response = tasks_response(tasks, 200)
+        else:
+            # Со страницами отдаем объект с курсором на следующую страницу
+            body = f'{{"items": {codec.encode_tasks(tasks)}, "nextCursor": {codec.dumps(next_cursor)}}}'
+            response = Response(200, body.encode("ascii"))
+        response.headers["ETag"] = etag
+        response.headers["X-Changes-Seq"] = seq
+        return response
+
+    def _stream_tasks(self, seq, headers):
+        # Большой список не кэшируем и не собираем: задачи кодируются кусками прямо при отправке.
+        # Версию читаем до длины списка, поэтому тело может быть только новее своего ETag
+        etag = self._list_cache.etag()
+        tasks = self._task_manager.tasks
+        chunks = (chunk.encode("ascii") for chunk in codec.iter_encode_tasks(tasks, len(tasks), STREAM_BATCH))
+        response_headers = {"ETag": etag, "X-Changes-Seq": seq}
+        if accepts_gzip(headers):
+            chunks = gzip_stream(chunks)
+            response_headers.update({"ETag": gzip_etag(etag), "Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+        return Response(200, chunks, headers=response_headers)
+
+    def _changes_token(self, seq):
+        # Номер изменения, как его видят клиенты: эпоха запуска и номер
+        return f"{self._task_manager.changes_epoch}-{seq}"
+
+    def _parse_changes_token(self, token):
+        # Номер изменения из токена клиента или None, если токен выдан другим запуском сервера
+        epoch, _, seq = token.rpartition("-")
+        if not epoch or not seq.isdigit():
+            raise ValueError("since must be a seq token from X-Changes-Seq")
+        if epoch != self._task_manager.changes_epoch:
+            return None
+        return int(seq)
+
+    def _stream_changes(self, since):
+        # Server-Sent Events: по событию на изменение, пока клиент не отключится
+        seq = since
+        while True:
+            events = self._task_manager.changes(seq, SSE_HEARTBEAT)
+            if events is None:
+                yield b"event: reset\ndata: {}\n\n"
+                return
+            if not events:
+                yield b": keepalive\n\n"
+                continue
+            for event in events:
+                yield self._sse_event(event)
+            seq = events[-1]["seq"]
+
+    async def _stream_changes_async(self, since):
+        # То же, что _stream_changes, но изменения ждем на цикле событий
+        seq = since
+        while True:
+            events = self._task_manager.changes(seq)
+            if events == []:
+                await self._wait_changes(seq, SSE_HEARTBEAT)
+                events = self._task_manager.changes(seq)
+            if events is None:
+                yield b"event: reset\ndata: {}\n\n"
+                return
+            if not events:
+                yield b": keepalive\n\n"
+                continue
+            yield b"".join(self._sse_event(event) for event in events)
+            seq = events[-1]["seq"]
+
+    def _sse_event(self, event):
+        return (f"id: {self._changes_token(event['seq'])}\nevent: {event['type']}\n"
+                f"data: {codec.dumps(event['task'])}\n\n").encode("utf-8")
+
+    async def _poll_changes(self, since, timeout):
+        # Долгий опрос на цикле событий. Статус 200 уже отправлен, поэтому если за время ожидания
+        # лента ушла дальше своего размера, отдаем пустой список: 410 клиент получит следующим запросом
+        await self._wait_changes(since, timeout)
+        yield self._changes_response(since, self._task_manager.changes(since) or []).payload
+
+    def get_changes(self, query, headers):
+        # Изменения после ?since=<токен из X-Changes-Seq> (или Last-Event-ID): сразу, с ожиданием
+        # до ?timeout= секунд или потоком Server-Sent Events при Accept: text/event-stream
+        params = {name: values[-1] for name, values in parse_qs(query).items()}
+        stream = "text/event-stream" in headers.get("accept", "")
+        try:
+            since = params.get("since", headers.get("last-event-id"))
+            if since is None:
+                if not stream:
+                    raise ValueError("since must be specified")
+                since = self._task_manager.changes_seq
+            else:
+                since = self._parse_changes_token(since)
+            timeout = float(params.get("timeout", 0))
+            if not 0 <= timeout <= MAX_POLL_TIMEOUT:
+                raise ValueError(f"timeout must be between 0 and {MAX_POLL_TIMEOUT}")
+        except ValueError as e:
+            print(f"get changes error: {e} {query}")
+            return error_response(400, f"Invalid query: {e}")
+
+        if (stream or timeout > 0) and not self._waits:
+            return error_response(501, "Waiting for changes is not available in single-threaded mode")
+        if since is None:
+            # Номер из прошлого запуска сервера: изменения между запусками в ленте не найти
+            return self._changes_gone()
+        if stream:
+            chunks = self._stream_changes(since) if self._wait_changes is None else self._stream_changes_async(since)
+            return Response(200, chunks, "text/event-stream", headers={"Cache-Control": "no-cache"})
+
+        if self._wait_changes is None:
+            events = self._task_manager.changes(since, timeout)
+        else:
+            events = self._task_manager.changes(since)
+            if events == [] and timeout > 0:
+                return Response(200, self._poll_changes(since, timeout))
+        if events is None:
+            return self._changes_gone()
+        return self._changes_response(since, events)
+
+    def _changes_response(self, since, events):
+        seq = events[-1]["seq"] if events else since
+        changes = [{**event, "seq": self._changes_token(event["seq"])} for event in events]
+        return json_response({"changes": changes, "seq": self._changes_token(seq)}, 200)
+
+    def _changes_gone(self):
+        # Клиент отстал больше, чем хранит лента: пусть заново загрузит GET /tasks
+        return json_response({"error": "Changes are no longer available, reload /tasks",
+                              "seq": self._changes_token(self._task_manager.changes_seq)}, 410)
+
+    def get_metrics(self):
+        if self._metrics is None:
+            return error_response(404, "Not found")
+        return Response(200, self._metrics.render().encode("utf-8"), "text/plain; version=0.0.4")
+
+    # Маршрут (шаблон пути для метрик) и ответ на запрос
+    def _route(self, method, parsed, headers, body):
+        parts = [p for p in parsed.path.split("/") if p]
+
+        if method == "POST":
+            if parsed.path == "/tasks":
+                return "/tasks", self.create_task(body)
+            if parsed.path == "/tasks:batch":
+                return "/tasks:batch", self.create_tasks(body)
+            if parsed.path == "/tasks/complete":
+                return "/tasks/complete", self.complete_tasks(body)
+            if parsed.path == "/tasks/next":
+                return "/tasks/next", self.claim_next_task()
+            if len(parts) == 3 and parts[0] == "tasks" and parts[2] == "complete":
+                return "/tasks/{id}/complete", self.complete_task(parts[1])
+        elif method == "GET":
+            if parsed.path == "/tasks":
+                return "/tasks", self.get_tasks(parsed.query, headers)
+            if parsed.path == "/tasks/changes":
+                return "/tasks/changes", self.get_changes(parsed.query, headers)
+            if parsed.path == "/metrics":
+                return "/metrics", self.get_metrics()
+            if len(parts) == 2 and parts[0] == "tasks":
+                return "/tasks/{id}", self.get_task(parts[1])
+
+        return "other", error_response(404, "Not found")
+
+    def _observe(self, token, started, method, route, status):
+        if token is not None:
+            self._profiler.finish(token, method, route, status, self._task_manager.count_tasks())
+        if self._metrics is not None:
+            self._metrics.observe_request(method, route, status, time.perf_counter() - started)
+
+    def _observed_stream(self, chunks, token, observe):
+        # Потоковое тело кодируется при отправке, поэтому время запроса считаем до конца потока.
+        # Куски могут кодироваться в разных потоках, профилировщик снимает тот, что кодирует сейчас
+        try:
+            while True:
+                if token is not None:
+                    self._profiler.attach(token)
+                try:
+                    chunk = next(chunks, None)
+                finally:
+                    if token is not None:
+                        self._profiler.detach()
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            chunks.close()
+            observe()
+
+    # Заголовки передаются словарем с именами в нижнем регистре
+    def dispatch(self, method, target, headers, body):
+        started = time.perf_counter()
+        token = self._profiler.start() if self._profiler is not None else None
+        # Непредвиденная ошибка - ответ 500 от любого сервера, а не оборванное соединение
+        try:
+            route, response = self._route(method, urlparse(target), headers, body)
+        except Exception as e:
+            print(f"dispatch error: {e} {method} {target}")
+            route, response = "other", error_response(500, "Internal server error")
+        response = compress(response, headers)
+        # Поток событий длится, пока клиент подключен, а асинхронные тела ждут изменений:
+        # их время ничего не говорит о скорости ответа
+        if (isinstance(response.payload, bytes) or response.content_type == "text/event-stream"
+                or inspect.isasyncgen(response.payload)):
+            self._observe(token, started, method, route, response.status)
+            return response
+
+        if token is not None:
+            self._profiler.detach()
+        response.payload = self._observed_stream(
+            response.payload, token, partial(self._observe, token, started, method, route, response.status))
+        return response
@@ -1,96 +1,71 @@
-import json
 from http.server import BaseHTTPRequestHandler
-from urllib.parse import urlparse
+from socketserver import ThreadingMixIn
 
-from models.priority import Priority
+# Сколько держим простаивающее keep-alive соединение
+IDLE_TIMEOUT = 60
 
 
-# Класс обработчик запросов
+# Класс обработчик запросов, вся логика маршрутов в TaskAPI
 class TaskRESTHandler(BaseHTTPRequestHandler):
-    def __init__(self, task_manager, *args, **kwargs):
-        # Добавляем объект для управления списком задач
-        self._task_manager = task_manager
+    # HTTP/1.1: соединение остается открытым между запросами клиента
+    protocol_version = "HTTP/1.1"
+    # Простаивающее соединение закрываем, иначе оно занимает поток сервера
+    timeout = IDLE_TIMEOUT
+
+    def __init__(self, api, *args, **kwargs):
+        # Добавляем API для работы со списком задач
+        self._api = api
         super().__init__(*args, **kwargs)
 
-    def _read_json_body(self):
+    def _read_body(self):
         length = int(self.headers.get('content-length', 0))
-        raw = self.rfile.read(length) if length > 0 else b""
-        if not raw:
-            return None
-        try:
-            return json.loads(raw)
-        except Exception as e:
-            print(f"read body error: {e} {raw}")
-            return None
-
-    def _send_json(self, data, status=200):
-        payload = json.dumps(data).encode("utf-8")
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(payload)))
-        self.end_headers()
-        self.wfile.write(payload)
-
-    def _error(self, status, msg):
-        self._send_json({"error": msg}, status)
-
-    def create_task(self):
-        body = self._read_json_body()
-        if not body or "title" not in body or "priority" not in body:
-            self._error(400, "Title and Priority must be specified")
+        return self.rfile.read(length) if length > 0 else b""
+
+    def _send(self, response):
+        self.send_response(response.status)
+        self.send_header("Content-Type", response.content_type)
+        for name, value in response.headers.items():
+            self.send_header(name, value)
+        # Однопоточный сервер, пока держит соединение, не принимает других клиентов
+        if not isinstance(self.server, ThreadingMixIn):
+            self.send_header("Connection", "close")
+        if isinstance(response.payload, bytes):
+            self.send_header("Content-Length", str(len(response.payload)))
+            self.end_headers()
+            self.wfile.write(response.payload)
             return
 
-        # Проверка на соответствие приоритета элементу из заданного Enum
-        try:
-            priority = Priority[body["priority"]]
-        except Exception as e:
-            print(f"create task error: priority must be 'low', 'medium' or 'high', but got {body["priority"]}")
-            self._error(400,
-                        f"create task error: priority must be 'low', 'medium' or 'high', but got '{body["priority"]}'")
-            return
-
-        # Добавляем задачу и сохраняем файл
-        task = self._task_manager.add_task(body["title"], priority)
-        self._task_manager.save_tasks()
-        # Отправляем в ответ созданную задачу
-        self._send_json(task.to_dict(), 201)
-
-    def complete_task(self, task_oid):
-        # Проверка на тип id
-        try:
-            task_id = int(task_oid)
-        except Exception as e:
-            print(f"complete task error: {e} {task_oid}")
-            self._error(400, "Task id must be integer")
-            return
-
-        # Если не нашли задачу, то возвращаем 404
-        if not self._task_manager.complete_task(task_id):
-            self._error(404, "Task not found")
+        # Тело-генератор пишем кусками по мере появления: для HTTP/1.1 с chunked-кодированием,
+        # и соединение остается открытым, для HTTP/1.0 - до закрытия соединения
+        chunked = self.request_version == "HTTP/1.1"
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
         else:
-            # Иначе пустое тело ответа и сохраняем задачи
-            self._send_json({}, 200)
-            self._task_manager.save_tasks()
-
-    def get_tasks(self):
-        tasks = [task.to_dict() for task in self._task_manager.tasks]
-        self._send_json(tasks, 200)
+            self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            for chunk in response.payload:
+                if not chunk:
+                    continue
+                if chunked:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                else:
+                    self.wfile.write(chunk)
+                self.wfile.flush()
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        except ConnectionError:
+            self.close_connection = True
+        finally:
+            response.payload.close()
+
+    def _handle(self, method):
+        headers = {name.lower(): value for name, value in self.headers.items()}
+        response = self._api.dispatch(method, self.path, headers, self._read_body())
+        self._send(response)
 
     def do_POST(self):
-        parsed = urlparse(self.path)
-        parts = [p for p in parsed.path.split("/") if p]
-
-        if parsed.path == "/tasks":
-            self.create_task()
-        elif len(parts) == 3 and parts[0] == "tasks" and parts[2] == "complete":
-            self.complete_task(parts[1])
-        else:
-            self._error(404, "Not found")
+        self._handle("POST")
 
     def do_GET(self):
-        parsed = urlparse(self.path)
-
-        if parsed.path == "/tasks":
-            self.get_tasks()
-        else:
-            self._error(404, "Not found")
+        self._handle("GET")
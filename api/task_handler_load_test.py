@@ -0,0 +1,119 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import pytest
+import requests
+
+from api.task_api import TaskAPI
+from api.task_handler import TaskRESTHandler
+from main import create_server
+from models.priority import Priority
+from services.task_manager import TaskManager
+from storage.file_storage import FileStorage
+
+CLIENTS = 4
+REQUESTS_PER_CLIENT = 5
+# Сколько медленный клиент держит соединение, не досылая запрос
+SLOW_CLIENT_DELAY = 1.0
+
+
+@pytest.fixture
+def task_manager(tmp_path):
+    file_path = tmp_path / "test.txt"
+    storage = FileStorage(file_path)
+    task_manager = TaskManager(storage)
+    yield task_manager
+
+
+def start_server(task_manager, mode):
+    task_handler = partial(TaskRESTHandler, TaskAPI(task_manager))
+    httpd = create_server("127.0.0.1", 0, task_handler, mode)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    return httpd, thread
+
+
+def stop_server(httpd, thread):
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join(timeout=1)
+
+
+def hold_slow_client(address, connected):
+    # Клиент с медленной сетью: начал запрос и долго не досылает заголовки
+    with socket.create_connection(address, timeout=10) as sock:
+        sock.sendall(b"GET /tasks HTTP/1.0\r\n")
+        connected.set()
+        time.sleep(SLOW_CLIENT_DELAY)
+        sock.sendall(b"\r\n")
+        sock.recv(4096)
+
+
+def measure_throughput(address):
+    # Запросов в секунду от нескольких клиентов, пока висит медленный клиент
+    host, port = address
+    url = f"http://{host}:{port}/tasks"
+    connected = threading.Event()
+    slow_client = threading.Thread(target=hold_slow_client, args=(address, connected))
+    slow_client.start()
+    connected.wait()
+    time.sleep(0.05)
+
+    def client(i):
+        for _ in range(REQUESTS_PER_CLIENT):
+            requests.get(url, timeout=10).raise_for_status()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(CLIENTS) as pool:
+        list(pool.map(client, range(CLIENTS)))
+    elapsed = time.perf_counter() - started
+    slow_client.join()
+    return CLIENTS * REQUESTS_PER_CLIENT / elapsed
+
+
+def test_concurrent_creates_unique_ids(task_manager):
+    # Arrange
+    httpd, thread = start_server(task_manager, "threaded")
+    host, port = httpd.server_address
+    url = f"http://{host}:{port}/tasks"
+
+    def create(i):
+        return requests.post(url, json={"title": f"task{i}", "priority": "high"}, timeout=5).json()["id"]
+
+    # Act
+    try:
+        with ThreadPoolExecutor(16) as pool:
+            ids = list(pool.map(create, range(200)))
+    finally:
+        stop_server(httpd, thread)
+
+    # Assert
+    assert sorted(ids) == list(range(1, 201))
+    assert len(task_manager.tasks) == 200
+    restored_manager = TaskManager(FileStorage(task_manager._storage._file_path))
+    restored_manager.restore_tasks()
+    assert len(restored_manager.tasks) == 200
+
+
+def test_throughput_scales_with_concurrency(task_manager):
+    # Arrange
+    task_manager.add_task("test1", Priority.low)
+    single, single_thread = start_server(task_manager, "single")
+    threaded, threaded_thread = start_server(task_manager, "threaded")
+
+    # Act
+    try:
+        single_rps = measure_throughput(single.server_address)
+        threaded_rps = measure_throughput(threaded.server_address)
+    finally:
+        stop_server(single, single_thread)
+        stop_server(threaded, threaded_thread)
+
+    # Assert
+    # Однопоточный сервер ждет медленного клиента и никого больше не обслуживает,
+    # многопоточный продолжает отвечать остальным
+    assert single_rps < CLIENTS * REQUESTS_PER_CLIENT / SLOW_CLIENT_DELAY * 1.1
+    assert threaded_rps > single_rps * 5
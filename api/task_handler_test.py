@@ -1,12 +1,22 @@
+import gzip
+import json
+import socket
 import threading
 import time
+import tracemalloc
 from functools import partial
-from http.server import HTTPServer
+from http.server import HTTPServer, ThreadingHTTPServer
 
 import pytest
 import requests
 
+from api.response_cache import gzip_etag
+from api.task_api import STREAM_MIN_TASKS, Response, TaskAPI, accepts_gzip
 from api.task_handler import TaskRESTHandler
+from models.priority import Priority
+from models.task import Task
+from services.metrics import Metrics
+from services.profiling import RequestProfiler
 from services.task_manager import TaskManager
 from storage.file_storage import FileStorage
 
@@ -19,7 +29,7 @@ def task_manager(tmp_path):
 
 @pytest.fixture
 def server(task_manager):
-    task_handler = partial(TaskRESTHandler, task_manager)
+    task_handler = partial(TaskRESTHandler, TaskAPI(task_manager))
 
     httpd = HTTPServer(("127.0.0.1", 0), task_handler)
     host, port = httpd.server_address
@@ -173,3 +183,534 @@ def test_complete_task_not_found(server, task_manager):
     assert "error" in body
 
 
+def test_get_task(server):
+    # Arrange
+    create_body = {
+        "title": "test3",
+        "priority": "medium"
+    }
+    request_json(
+        server,
+        "POST",
+        "/tasks",
+        create_body
+    )
+
+    # Act
+    status, body = request_json(
+        server,
+        "GET",
+        "/tasks/1",
+    )
+
+    # Assert
+    assert status == 200
+    assert body["id"] == 1
+    assert body["title"] == "test3"
+    assert body["priority"] == "medium"
+
+def test_get_task_not_found(server):
+    # Arrange
+
+    # Act
+    status, body = request_json(
+        server,
+        "GET",
+        "/tasks/7",
+    )
+
+    # Assert
+    assert status == 404
+    assert "error" in body
+
+def test_get_tasks_filtered_page(server):
+    # Arrange
+    for title, priority in [("a", "low"), ("b", "high"), ("c", "high"), ("d", "high")]:
+        request_json(server, "POST", "/tasks", {"title": title, "priority": priority})
+    request_json(server, "POST", "/tasks/2/complete")
+
+    # Act
+    status, first = request_json(server, "GET", "/tasks?priority=high&is_done=false&limit=1")
+    _, second = request_json(server, "GET", f"/tasks?priority=high&is_done=false&limit=1&cursor={first['nextCursor']}")
+    _, done = request_json(server, "GET", "/tasks?is_done=true")
+
+    # Assert
+    assert status == 200
+    assert [task["id"] for task in first["items"]] == [3]
+    assert [task["id"] for task in second["items"]] == [4]
+    assert second["nextCursor"] is None
+    assert [task["id"] for task in done] == [2]
+
+def test_get_tasks_invalid_query(server):
+    # Arrange
+
+    # Act
+    status_priority, _ = request_json(server, "GET", "/tasks?priority=urgent")
+    status_limit, _ = request_json(server, "GET", "/tasks?limit=0")
+    status_sort, body = request_json(server, "GET", "/tasks?sort=title")
+
+    # Assert
+    assert status_priority == 400
+    assert status_limit == 400
+    assert status_sort == 400
+    assert "error" in body
+
+def test_get_tasks_not_modified(server):
+    # Arrange
+    host, port = server
+    url = f"http://{host}:{port}/tasks"
+    request_json(server, "POST", "/tasks", {"title": "test3", "priority": "low"})
+    first = requests.get(url, timeout=1.0)
+
+    # Act
+    cached = requests.get(url, headers={"If-None-Match": first.headers["ETag"]}, timeout=1.0)
+    request_json(server, "POST", "/tasks/1/complete")
+    changed = requests.get(url, headers={"If-None-Match": first.headers["ETag"]}, timeout=1.0)
+
+    # Assert
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert changed.status_code == 200
+    assert changed.json()[0]["isDone"] == True
+    assert changed.headers["ETag"] != first.headers["ETag"]
+
+def test_create_task_invalid_title(server, task_manager):
+    # Act
+    statuses = [request_json(server, "POST", "/tasks", {"title": title, "priority": "low"})[0]
+                for title in (123, "", ["test1"], None)]
+    array_status, _ = request_json(server, "POST", "/tasks", ["title", "priority"])
+
+    # Assert
+    assert statuses == [400, 400, 400, 400]
+    assert array_status == 400
+    assert task_manager.count_tasks() == 0
+
+def test_dispatch_error_returns_500(task_manager, monkeypatch):
+    # Arrange
+    api = TaskAPI(task_manager)
+
+    def broken_get_task(task_id):
+        raise RuntimeError("broken")
+
+    monkeypatch.setattr(task_manager, "get_task", broken_get_task)
+
+    # Act
+    response = api.dispatch("GET", "/tasks/1", {}, b"")
+
+    # Assert
+    assert response.status == 500
+    assert json.loads(response.payload) == {"error": "Internal server error"}
+
+def test_create_tasks_batch(server, task_manager):
+    # Arrange
+    batch = [{"title": "test1", "priority": "low"}, {"title": "test2", "priority": "high"}]
+
+    # Act
+    status, body = request_json(server, "POST", "/tasks:batch", batch)
+
+    # Assert
+    assert status == 201
+    assert [task["id"] for task in body] == [1, 2]
+    assert body[1]["priority"] == "high"
+    assert len(task_manager.tasks) == 2
+
+def test_create_tasks_batch_invalid_item(server, task_manager):
+    # Arrange
+    batch = [{"title": "test1", "priority": "low"}, {"title": "test2", "priority": "urgent"}]
+
+    # Act
+    status, body = request_json(server, "POST", "/tasks:batch", batch)
+
+    # Assert
+    assert status == 400
+    assert "Task 1" in body["error"]
+    assert len(task_manager.tasks) == 0
+
+def test_complete_tasks_batch(server, task_manager):
+    # Arrange
+    request_json(server, "POST", "/tasks:batch", [{"title": f"test{i}", "priority": "low"} for i in range(3)])
+
+    # Act
+    missing_status, missing_body = request_json(server, "POST", "/tasks/complete", [1, 9])
+    status, _ = request_json(server, "POST", "/tasks/complete", [1, 3])
+
+    # Assert
+    assert missing_status == 404
+    assert missing_body["missing"] == [9]
+    assert status == 200
+    assert [task.is_done for task in task_manager.tasks] == [True, False, True]
+
+def test_get_metrics(task_manager):
+    # Arrange
+    metrics = Metrics()
+    api = TaskAPI(TaskManager(FileStorage(task_manager._storage._file_path), metrics), metrics=metrics)
+    api.dispatch("POST", "/tasks", {}, b'{"title": "test1", "priority": "low"}')
+    api.dispatch("GET", "/tasks/1", {}, b"")
+    api.dispatch("GET", "/tasks/abc", {}, b"")
+
+    # Act
+    response = api.dispatch("GET", "/metrics", {}, b"")
+
+    # Assert
+    text = response.payload.decode("utf-8")
+    assert response.status == 200
+    assert response.content_type.startswith("text/plain")
+    assert 'tasks_http_requests_total{method="POST",route="/tasks",status="201"} 1' in text
+    assert 'tasks_http_requests_total{method="GET",route="/tasks/{id}",status="200"} 1' in text
+    assert 'tasks_http_requests_total{method="GET",route="/tasks/{id}",status="400"} 1' in text
+    assert 'tasks_storage_duration_seconds_count{operation="save_tasks"} 1' in text
+    assert 'tasks_count{state="open"} 1' in text
+
+def test_get_metrics_disabled(server):
+    # Arrange
+
+    # Act
+    status, _ = request_json(server, "GET", "/metrics")
+
+    # Assert
+    assert status == 404
+
+
+def test_claim_next_task(server, task_manager):
+    # Arrange
+    request_json(server, "POST", "/tasks:batch", [{"title": "low", "priority": "low"},
+                                                  {"title": "high", "priority": "high"}])
+
+    # Act
+    first_status, first = request_json(server, "POST", "/tasks/next")
+    second_status, second = request_json(server, "POST", "/tasks/next")
+    empty_status, empty = request_json(server, "POST", "/tasks/next")
+
+    # Assert
+    assert first_status == 200
+    assert first == {"title": "high", "priority": "high", "isDone": True, "id": 2}
+    assert second_status == 200
+    assert second["title"] == "low"
+    assert empty_status == 404
+    assert empty["error"] == "No open tasks"
+
+def test_get_changes(server):
+    # Arrange
+    host, port = server
+    seq = requests.get(f"http://{host}:{port}/tasks").headers["X-Changes-Seq"]
+    epoch = seq.split("-")[0]
+    request_json(server, "POST", "/tasks", {"title": "test1", "priority": "low"})
+    request_json(server, "POST", "/tasks/1/complete")
+
+    # Act
+    status, body = request_json(server, "GET", f"/tasks/changes?since={seq}")
+    _, empty = request_json(server, "GET", f"/tasks/changes?since={body['seq']}")
+
+    # Assert
+    assert status == 200
+    assert [(e["type"], e["task"]["id"], e["task"]["isDone"]) for e in body["changes"]] == [
+        ("created", 1, False), ("completed", 1, True)]
+    assert [e["seq"] for e in body["changes"]] == [f"{epoch}-1", f"{epoch}-2"]
+    assert body["seq"] == f"{epoch}-2"
+    assert empty == {"changes": [], "seq": f"{epoch}-2"}
+
+def test_get_changes_invalid(server, task_manager):
+    # Arrange
+    epoch = task_manager.changes_epoch
+
+    # Act
+    missing_status, _ = request_json(server, "GET", "/tasks/changes")
+    invalid_status, _ = request_json(server, "GET", "/tasks/changes?since=abc")
+    bare_status, _ = request_json(server, "GET", "/tasks/changes?since=0")
+    timeout_status, _ = request_json(server, "GET", f"/tasks/changes?since={epoch}-0&timeout=1000")
+    gone_status, gone = request_json(server, "GET", f"/tasks/changes?since={epoch}-5")
+    restarted_status, restarted = request_json(server, "GET", "/tasks/changes?since=0badf00d-0")
+
+    # Assert
+    assert missing_status == 400
+    assert invalid_status == 400
+    assert bare_status == 400
+    assert timeout_status == 400
+    assert gone_status == 410
+    assert gone["seq"] == f"{epoch}-0"
+    assert restarted_status == 410
+    assert restarted["seq"] == f"{epoch}-0"
+
+def test_get_changes_long_poll(task_manager):
+    # Arrange
+    api = TaskAPI(task_manager)
+    timer = threading.Timer(0.1, task_manager.add_task, args=("test1", Priority.high))
+
+    # Act
+    started = time.perf_counter()
+    timer.start()
+    response = api.dispatch("GET", f"/tasks/changes?since={task_manager.changes_epoch}-0&timeout=5", {}, b"")
+    elapsed = time.perf_counter() - started
+
+    # Assert
+    assert response.status == 200
+    assert json.loads(response.payload)["changes"][0]["task"]["title"] == "test1"
+    assert elapsed < 2
+
+def test_get_changes_waits_disabled(task_manager):
+    # Arrange
+    api = TaskAPI(task_manager, waits=False)
+    since = f"{task_manager.changes_epoch}-0"
+
+    # Act
+    immediate = api.dispatch("GET", f"/tasks/changes?since={since}", {}, b"")
+    long_poll = api.dispatch("GET", f"/tasks/changes?since={since}&timeout=5", {}, b"")
+    stream = api.dispatch("GET", "/tasks/changes", {"accept": "text/event-stream"}, b"")
+
+    # Assert
+    assert immediate.status == 200
+    assert long_poll.status == 501
+    assert stream.status == 501
+
+def test_get_changes_event_stream(task_manager):
+    # Arrange
+    api = TaskAPI(task_manager)
+    task_manager.add_task("test1", Priority.low)
+    task_manager.complete_task(1)
+
+    # Act
+    epoch = task_manager.changes_epoch
+    response = api.dispatch("GET", "/tasks/changes", {"accept": "text/event-stream", "last-event-id": f"{epoch}-0"},
+                            b"")
+    chunks = [next(response.payload), next(response.payload)]
+    response.payload.close()
+
+    # Assert
+    assert response.content_type == "text/event-stream"
+    assert chunks[0].startswith(f"id: {epoch}-1\nevent: created\ndata: {{".encode("ascii"))
+    assert chunks[1].startswith(f"id: {epoch}-2\nevent: completed\n".encode("ascii"))
+    assert chunks[1].endswith(b"\n\n")
+
+@pytest.fixture
+def threaded_server(task_manager):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(TaskRESTHandler, TaskAPI(task_manager)))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        yield httpd.server_address
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join(timeout=1)
+
+
+def read_response(sock_file):
+    # Ответ с Content-Length или chunked-телом из файла сокета
+    status = sock_file.readline()
+    headers = {}
+    while (line := sock_file.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding") == "chunked":
+        body = b""
+        while (size := int(sock_file.readline(), 16)) > 0:
+            body += sock_file.read(size)
+            sock_file.readline()
+        sock_file.readline()
+    else:
+        body = sock_file.read(int(headers["content-length"]))
+    return status, headers, body
+
+def test_threaded_server_keeps_connection_alive(threaded_server):
+    # Arrange
+    sock = socket.create_connection(threaded_server, timeout=2)
+    sock_file = sock.makefile("rb")
+
+    # Act
+    sock.sendall(b'POST /tasks HTTP/1.1\r\nHost: x\r\nContent-Length: 37\r\n\r\n{"title": "test1", "priority": "low"}')
+    created = read_response(sock_file)
+    sock.sendall(b"GET /tasks HTTP/1.1\r\nHost: x\r\n\r\n")
+    listed = read_response(sock_file)
+    sock.close()
+
+    # Assert
+    assert created[0].startswith(b"HTTP/1.1 201")
+    assert created[1].get("connection") != "close"
+    assert json.loads(listed[2])[0]["title"] == "test1"
+
+def test_single_server_closes_connection(server):
+    # Act
+    response = requests.get(f"http://{server[0]}:{server[1]}/tasks")
+
+    # Assert
+    assert response.headers["Connection"] == "close"
+
+def test_get_tasks_gzip(server, task_manager):
+    # Arrange
+    host, port = server
+    for i in range(100):
+        task_manager.add_task(f"test{i}", Priority.low)
+
+    # Act
+    plain = requests.get(f"http://{host}:{port}/tasks", headers={"Accept-Encoding": "identity"})
+    compressed = requests.get(f"http://{host}:{port}/tasks", headers={"Accept-Encoding": "gzip"}, stream=True)
+    raw = compressed.raw.read()
+    not_modified = requests.get(f"http://{host}:{port}/tasks", headers={"Accept-Encoding": "gzip",
+                                                                        "If-None-Match": compressed.headers["ETag"]})
+    filtered = requests.get(f"http://{host}:{port}/tasks?priority=low", headers={"Accept-Encoding": "gzip"})
+    small = requests.get(f"http://{host}:{port}/tasks/1", headers={"Accept-Encoding": "gzip"})
+
+    # Assert
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    # У сжатого тела свой сильный ETag, и по нему тоже отвечается 304
+    assert compressed.headers["ETag"] == gzip_etag(plain.headers["ETag"])
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == compressed.headers["ETag"]
+    assert len(raw) < len(plain.content)
+    assert gzip.decompress(raw) == plain.content
+    assert filtered.headers["Content-Encoding"] == "gzip"
+    assert filtered.headers["ETag"] == compressed.headers["ETag"]
+    assert filtered.json() == plain.json()
+    assert "Content-Encoding" not in small.headers
+
+def test_accepts_gzip():
+    # Assert
+    assert accepts_gzip({"accept-encoding": "gzip, deflate"})
+    assert accepts_gzip({"accept-encoding": "br;q=1.0, *;q=0.5"})
+    assert not accepts_gzip({"accept-encoding": "gzip;q=0"})
+    assert not accepts_gzip({"accept-encoding": "deflate"})
+    assert not accepts_gzip({})
+
+
+class StreamingAPI:
+    def dispatch(self, method, target, headers, body):
+        return Response(200, (f"part{i};".encode("utf-8") for i in range(3)))
+
+
+@pytest.mark.parametrize("version", ["HTTP/1.1", "HTTP/1.0"])
+def test_handler_streams_generator_body(version):
+    # Arrange
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(TaskRESTHandler, StreamingAPI()))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    sock = socket.create_connection(httpd.server_address, timeout=2)
+    sock_file = sock.makefile("rb")
+
+    # Act
+    sock.sendall(f"GET /stream {version}\r\nHost: x\r\n\r\n".encode("latin-1"))
+    if version == "HTTP/1.1":
+        _, headers, body = read_response(sock_file)
+        sock.sendall(b"GET /stream HTTP/1.1\r\nHost: x\r\n\r\n")
+        _, _, second_body = read_response(sock_file)
+    else:
+        data = sock_file.read()
+        headers = {"connection": "close"} if b"Connection: close" in data else {}
+        body = data.split(b"\r\n\r\n", 1)[1]
+        second_body = body
+    sock.close()
+    httpd.shutdown()
+    httpd.server_close()
+
+    # Assert
+    assert body == second_body == b"part0;part1;part2;"
+    if version == "HTTP/1.1":
+        assert headers["transfer-encoding"] == "chunked"
+    else:
+        assert headers["connection"] == "close"
+
+def consume_peak_memory(api):
+    # Пиковая память на отдачу потокового GET /tasks
+    tracemalloc.start()
+    response = api.dispatch("GET", "/tasks", {}, b"")
+    size = sum(len(chunk) for chunk in response.payload)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, peak
+
+def test_get_tasks_streams_large_list(task_manager):
+    # Arrange
+    api = TaskAPI(task_manager)
+    task_manager.add_tasks([(f"test{i}", Priority.low) for i in range(STREAM_MIN_TASKS)])
+
+    # Act
+    response = api.dispatch("GET", "/tasks", {}, b"")
+    body = b"".join(response.payload)
+    compressed = api.dispatch("GET", "/tasks", {"accept-encoding": "gzip"}, b"")
+    not_modified = api.dispatch("GET", "/tasks", {"if-none-match": response.headers["ETag"]}, b"")
+
+    # Assert
+    assert body == json.dumps([task.to_dict() for task in task_manager.tasks]).encode("utf-8")
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] == gzip_etag(response.headers["ETag"])
+    assert gzip.decompress(b"".join(compressed.payload)) == body
+    assert not_modified.status == 304
+
+def test_get_tasks_stream_is_timed_to_the_end(task_manager, tmp_path, monkeypatch):
+    # Arrange
+    metrics = Metrics()
+    api = TaskAPI(task_manager, metrics=metrics, profiler=RequestProfiler(0, tmp_path))
+    task_manager.add_tasks([(f"test{i}", Priority.low) for i in range(STREAM_MIN_TASKS)])
+    to_json = Task.to_json
+
+    def slow_to_json(task):
+        if task.id % 1000 == 0:
+            time.sleep(0.005)
+        return to_json(task)
+
+    monkeypatch.setattr(Task, "to_json", slow_to_json)
+
+    # Act
+    response = api.dispatch("GET", "/tasks", {}, b"")
+    observed_before = metrics.render()
+    b"".join(response.payload)
+    observed_after = metrics.render()
+
+    # Assert
+    request_count = 'tasks_http_requests_total{method="GET",route="/tasks",status="200"} 1'
+    assert request_count not in observed_before
+    assert request_count in observed_after
+    traces = [json.loads(line) for line in (tmp_path / "slow_requests.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert len(traces) == 1
+    assert traces[0]["ms"] >= 50
+    assert "slow_to_json" in (tmp_path / traces[0]["stacks"]).read_text(encoding="utf-8")
+
+def test_get_tasks_stream_memory_is_constant(task_manager):
+    # Arrange
+    api = TaskAPI(task_manager)
+    task_manager.add_tasks([(f"test{i}", Priority.low) for i in range(STREAM_MIN_TASKS)])
+    small_size, small_peak = consume_peak_memory(api)
+    task_manager.add_tasks([(f"test{i}", Priority.low) for i in range(4 * STREAM_MIN_TASKS)])
+
+    # Act
+    large_size, large_peak = consume_peak_memory(api)
+
+    # Assert
+    assert large_size > 4 * small_size
+    assert large_peak < 2 * small_peak
+    assert large_peak < large_size / 4
+
+def test_get_tasks_stream_over_http(server, task_manager):
+    # Arrange
+    host, port = server
+    task_manager.add_tasks([(f"test{i}", Priority.high) for i in range(STREAM_MIN_TASKS)])
+
+    # Act
+    response = requests.get(f"http://{host}:{port}/tasks")
+
+    # Assert
+    assert response.headers["Transfer-Encoding"] == "chunked"
+    assert len(response.json()) == STREAM_MIN_TASKS
+    assert response.json()[-1]["id"] == STREAM_MIN_TASKS
+
+def test_get_tasks_search(server):
+    # Arrange
+    request_json(server, "POST", "/tasks:batch", [{"title": "Deploy backend", "priority": "high"},
+                                                  {"title": "Review backend", "priority": "low"},
+                                                  {"title": "Deploy frontend", "priority": "low"}])
+
+    # Act
+    status, found = request_json(server, "GET", "/tasks?q=dep")
+    _, filtered = request_json(server, "GET", "/tasks?q=back&priority=low")
+    _, page = request_json(server, "GET", "/tasks?q=deploy&limit=1")
+    empty_status, _ = request_json(server, "GET", "/tasks?q=%20")
+    sort_status, _ = request_json(server, "GET", "/tasks?q=dep&sort=-id")
+
+    # Assert
+    assert status == 200
+    assert [task["id"] for task in found] == [1, 3]
+    assert [task["title"] for task in filtered] == ["Review backend"]
+    assert page == {"items": [found[0]], "nextCursor": 1}
+    assert empty_status == 400
+    assert sort_status == 400
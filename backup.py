@@ -0,0 +1,348 @@
+import argparse
+import heapq
+import json
+import os
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from models.priority import Priority
+from models.task import Task
+from storage.atomic_file import atomic_write, fsync_dir
+from storage.file_storage import CRC_PREFIX, CRC_SUFFIX_LENGTH, decode_record, encode_record, parse_with_crc
+
+# Список резервных копий, по строке json на копию. Строка дописывается последней,
+# поэтому копия без строки в списке считается незаконченной
+INDEX_NAME = "backups.jsonl"
+# Сколько раз пробуем открыть снимок и журнал, если между ними хранилище успело свернуть журнал
+SNAPSHOT_RETRIES = 10
+
+
+# Снимок записан не по возрастанию id (например, после фоновой загрузки), нужна сортировка в памяти
+class UnsortedSnapshot(Exception):
+    pass
+
+
+def record_key(line):
+    # (id, crc, запись) без полного разбора json: crc и id стоят в конце записи на известных местах.
+    # Записи старого формата без crc перекодируем
+    if line[-CRC_SUFFIX_LENGTH:-10] == CRC_PREFIX and line.endswith('"}'):
+        body = line[:-CRC_SUFFIX_LENGTH] + "}"
+        crc = line[-10:-2]
+        if f"{zlib.crc32(body.encode('utf-8')):08x}" != crc:
+            raise ValueError("checksum mismatch")
+        return int(body[body.rindex('"id": ') + 6:-1]), crc, line
+    return record_key(encode_record(decode_record(line)))
+
+
+def open_consistent(file_path):
+    # Открываем снимок и журнал LogStorage (если он есть) так, чтобы они относились к одному состоянию.
+    # Снимок и журнал подменяются целиком (atomic_write), поэтому открытые файлы уже не изменятся,
+    # журнал только дописывается. Если снимок подменили, пока открывали журнал - пробуем заново
+    file_path = Path(file_path)
+    log_path = Path(str(file_path) + ".log")
+    for _ in range(SNAPSHOT_RETRIES):
+        snapshot = file_path.open('r', encoding="utf-8", errors="replace") if file_path.exists() else None
+        log = log_path.open('r', encoding="utf-8", errors="replace") if log_path.exists() else None
+        if log is None or snapshot is None:
+            return snapshot, log
+
+        try:
+            current = os.stat(file_path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current == os.fstat(snapshot.fileno()).st_ino:
+            return snapshot, log
+        snapshot.close()
+        log.close()
+    raise RuntimeError(f"{file_path} kept changing, could not open a consistent snapshot")
+
+
+def read_records(lines, errors):
+    # (id, crc, запись) из строк файла задач, поврежденные записи пропускаем и считаем
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield record_key(line)
+        except Exception as e:
+            errors.append(str(e))
+
+
+def read_log(log, errors):
+    # Последнее состояние каждой задачи из журнала LogStorage. Оборванная последняя строка
+    # (журнал дописывается прямо сейчас) не пройдет проверку crc и будет пропущена
+    records = {}
+    if log is None:
+        return records
+    for line in log:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            task = Task.from_dict(parse_with_crc(line)["task"])
+            records[task.id] = record_key(encode_record(task))
+        except Exception as e:
+            errors.append(str(e))
+    return records
+
+
+def check_sorted(records):
+    last_id = None
+    for record in records:
+        if last_id is not None and record[0] <= last_id:
+            raise UnsortedSnapshot()
+        last_id = record[0]
+        yield record
+
+
+def keyed(source, rank):
+    return ((record[0], rank, record) for record in source)
+
+
+def merge_latest(sources):
+    # Слияние источников, отсортированных по id; при совпадении id побеждает более поздний источник
+    keyed_sources = [keyed(source, -i) for i, source in enumerate(sources)]
+    last_id = None
+    for task_id, _, record in heapq.merge(*keyed_sources):
+        if task_id != last_id:
+            yield record
+            last_id = task_id
+
+
+def state_records(snapshot, log_records, errors, in_memory=False):
+    # Текущее состояние хранилища по возрастанию id: снимок, поверх него журнал
+    records = read_records(snapshot, errors) if snapshot is not None else iter(())
+    records = sorted(records) if in_memory else check_sorted(records)
+    return merge_latest([records, sorted(log_records.values())])
+
+
+def read_manifest(path):
+    # Манифест прошлой копии: "id crc" по возрастанию id
+    if path is None:
+        return
+    with path.open('r', encoding="utf-8") as f_read:
+        for line in f_read:
+            task_id, crc = line.split()
+            yield int(task_id), crc
+
+
+def diff(records, manifest):
+    # (id, crc, запись, изменилась ли) - записи и манифест идут по возрастанию id одновременно
+    old = next(manifest, None)
+    for task_id, crc, line in records:
+        while old is not None and old[0] < task_id:
+            old = next(manifest, None)
+        yield task_id, crc, line, old is None or old != (task_id, crc)
+
+
+def load_index(backup_dir):
+    index_path = Path(backup_dir) / INDEX_NAME
+    if not index_path.exists():
+        return []
+    with index_path.open('r', encoding="utf-8") as f_read:
+        return [json.loads(line) for line in f_read if line.strip()]
+
+
+def write_backup(backup_dir, entry, snapshot, log_records, previous, errors, in_memory):
+    manifest = read_manifest(backup_dir / previous["manifest"] if previous else None)
+    with atomic_write(backup_dir / entry["file"]) as f_data, atomic_write(backup_dir / entry["manifest"]) as f_manifest:
+        for task_id, crc, line, changed in diff(state_records(snapshot, log_records, errors, in_memory), manifest):
+            f_manifest.write(f"{task_id} {crc}\n")
+            entry["tasks"] += 1
+            if changed:
+                f_data.write(line + '\n')
+                entry["records"] += 1
+                entry["bytes"] += len(line) + 1
+
+
+# Резервная копия хранилища задач без остановки сервера. Первая копия (или full=True) содержит
+# все записи, следующие - только новые и изменившиеся с прошлой копии записи
+def backup(file_path, backup_dir, full=False):
+    backup_dir = Path(backup_dir)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    index = load_index(backup_dir)
+    previous = index[-1] if index and not full else None
+    seq = index[-1]["seq"] + 1 if index else 1
+    kind = "incremental" if previous else "full"
+
+    started = time.perf_counter()
+    entry = {"seq": seq, "time": datetime.now().isoformat(timespec="microseconds"), "kind": kind,
+             "file": f"{seq:06d}-{kind}.txt", "manifest": f"manifest-{seq:06d}.txt",
+             "tasks": 0, "records": 0, "bytes": 0, "read_bytes": 0, "errors": 0}
+    errors = []
+    snapshot, log = open_consistent(file_path)
+    try:
+        for handle in (snapshot, log):
+            if handle is not None:
+                entry["read_bytes"] += os.fstat(handle.fileno()).st_size
+        log_records = read_log(log, errors)
+        try:
+            write_backup(backup_dir, entry, snapshot, log_records, previous, errors, False)
+        except UnsortedSnapshot:
+            snapshot.seek(0)
+            entry.update(tasks=0, records=0, bytes=0)
+            errors.clear()
+            write_backup(backup_dir, entry, snapshot, log_records, previous, errors, True)
+    finally:
+        for handle in (snapshot, log):
+            if handle is not None:
+                handle.close()
+
+    entry["errors"] = len(errors)
+    entry["seconds"] = round(time.perf_counter() - started, 6)
+    with (backup_dir / INDEX_NAME).open('a', encoding="utf-8") as f_index:
+        f_index.write(json.dumps(entry) + '\n')
+        f_index.flush()
+        os.fsync(f_index.fileno())
+    # Следующей копии нужен только последний манифест
+    for old in index:
+        (backup_dir / old["manifest"]).unlink(missing_ok=True)
+    return entry
+
+
+def select_chain(index, at=None, seq=None):
+    # Копии, которые нужно применить: последняя полная до нужного момента и инкрементальные после нее
+    entries = [entry for entry in index
+               if (seq is None or entry["seq"] <= seq)
+               and (at is None or datetime.fromisoformat(entry["time"]) <= at)]
+    if not entries:
+        raise ValueError("No backups at or before the requested point")
+    start = max(i for i, entry in enumerate(entries) if entry["kind"] == "full")
+    return entries[start:]
+
+
+# Восстановление файла задач на момент копии: по времени at, номеру seq или последней
+def restore(backup_dir, target, at=None, seq=None, force=False):
+    backup_dir = Path(backup_dir)
+    target = Path(target)
+    log_path = Path(str(target) + ".log")
+    if (target.exists() or log_path.exists()) and not force:
+        raise FileExistsError(f"{target} already exists, use --force to overwrite")
+    chain = select_chain(load_index(backup_dir), at, seq)
+
+    started = time.perf_counter()
+    result = {"seq": chain[-1]["seq"], "time": chain[-1]["time"], "backups": len(chain),
+              "tasks": 0, "bytes": 0, "errors": 0}
+    errors = []
+    # Журнал LogStorage новее копии и при запуске проигрался бы поверх восстановленного снимка.
+    # Откладываем его одним переименованием до записи снимка: если восстановление прервется,
+    # журнал останется рядом, а не применится к чужому снимку
+    if log_path.exists():
+        os.replace(log_path, Path(str(target) + ".log.before-restore"))
+        fsync_dir(target.parent)
+    # Старые сведения могли бы занизить максимальный id, без них хранилище просто прочитает файл
+    meta_path = Path(str(target) + ".meta")
+    meta_path.unlink(missing_ok=True)
+    files = [(backup_dir / entry["file"]).open('r', encoding="utf-8") for entry in chain]
+    max_id = 0
+    try:
+        with atomic_write(target) as f_write:
+            for task_id, _, line in merge_latest([read_records(f_read, errors) for f_read in files]):
+                f_write.write(line + '\n')
+                result["tasks"] += 1
+                result["bytes"] += len(line) + 1
+                max_id = task_id
+    finally:
+        for f_read in files:
+            f_read.close()
+    with atomic_write(meta_path) as f_write:
+        f_write.write(json.dumps({"maxId": max_id, "count": result["tasks"]}))
+
+    result["errors"] = len(errors)
+    result["seconds"] = round(time.perf_counter() - started, 6)
+    return result
+
+
+def throughput(entry, size_key):
+    seconds = max(entry["seconds"], 1e-9)
+    return f"{entry[size_key] / 1e6 / seconds:.1f} MB/s"
+
+
+def write_store(file_path, count, done_every=0):
+    # Файл задач без списка в памяти, чтобы бенчмарк мог создать хранилище на несколько гигабайт
+    priorities = list(Priority)
+    with atomic_write(file_path) as f_write:
+        for i in range(1, count + 1):
+            task = Task(f"benchmark task number {i}", priorities[i % 3], done_every > 0 and i % done_every == 0, i)
+            f_write.write(encode_record(task) + '\n')
+
+
+def bench(count, changed, workdir):
+    # Полная копия, копия после изменения доли задач и восстановление, со скоростью каждого шага
+    workdir = Path(workdir)
+    file_path = workdir / "tasks.txt"
+    backup_dir = workdir / "backups"
+    write_store(file_path, count)
+    size = file_path.stat().st_size
+
+    full = backup(file_path, backup_dir)
+    write_store(file_path, count, round(1 / changed) if changed else 0)
+    incremental = backup(file_path, backup_dir)
+    restored = restore(backup_dir, workdir / "restored.txt")
+
+    print(f"store: {count} tasks, {size / 1e6:.1f} MB")
+    print(f"full backup: {full['seconds']:.2f} s, {throughput(full, 'read_bytes')}, {full['records']} records")
+    print(f"incremental backup: {incremental['seconds']:.2f} s, {throughput(incremental, 'read_bytes')}, "
+          f"{incremental['records']} records, {incremental['bytes'] / 1e6:.1f} MB shipped")
+    print(f"restore: {restored['seconds']:.2f} s, {throughput(restored, 'bytes')}, {restored['tasks']} tasks")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online backups of the task file storage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backup_parser = commands.add_parser("backup", help="back up new and changed records since the last backup")
+    backup_parser.add_argument("backup_dir")
+    backup_parser.add_argument("--file", default="tasks.txt")
+    backup_parser.add_argument("--full", action="store_true", help="copy all records, not only changed ones")
+
+    restore_parser = commands.add_parser("restore", help="restore the task file as of a backup")
+    restore_parser.add_argument("backup_dir")
+    restore_parser.add_argument("target")
+    restore_parser.add_argument("--at", type=datetime.fromisoformat,
+                                help="latest state backed up at or before this time, e.g. 2024-05-01T12:00:00")
+    restore_parser.add_argument("--seq", type=int, help="state as of this backup number")
+    restore_parser.add_argument("--force", action="store_true", help="overwrite an existing target")
+
+    list_parser = commands.add_parser("list", help="list backups")
+    list_parser.add_argument("backup_dir")
+
+    bench_parser = commands.add_parser("bench", help="measure backup and restore throughput")
+    bench_parser.add_argument("--tasks", type=int, default=1_000_000,
+                              help="tasks in the generated store, about 13M per GB")
+    bench_parser.add_argument("--changed", type=float, default=0.01, help="share of tasks changed before the incremental backup")
+    bench_parser.add_argument("--dir", help="working directory, a temporary one by default")
+    args = parser.parse_args()
+
+    if args.command == "backup":
+        entry = backup(args.file, args.backup_dir, args.full)
+        print(f"backup {entry['seq']} ({entry['kind']}): {entry['records']} of {entry['tasks']} records, "
+              f"{entry['bytes']} bytes in {entry['seconds']:.2f} s ({throughput(entry, 'read_bytes')})")
+        if entry["errors"]:
+            print(f"skipped {entry['errors']} corrupt records", file=sys.stderr)
+    elif args.command == "restore":
+        try:
+            result = restore(args.backup_dir, args.target, args.at, args.seq, args.force)
+        except (FileExistsError, ValueError) as e:
+            parser.exit(1, f"restore error: {e}\n")
+        print(f"restored {result['tasks']} tasks as of backup {result['seq']} ({result['time']}) "
+              f"from {result['backups']} backups in {result['seconds']:.2f} s ({throughput(result, 'bytes')})")
+    elif args.command == "list":
+        for entry in load_index(args.backup_dir):
+            print(f"{entry['seq']:>6} {entry['time']} {entry['kind']:<11} {entry['records']:>10} records "
+                  f"{entry['tasks']:>10} tasks")
+    else:
+        if args.dir:
+            bench(args.tasks, args.changed, args.dir)
+        else:
+            with tempfile.TemporaryDirectory() as workdir:
+                bench(args.tasks, args.changed, workdir)
+
+
+if __name__ == "__main__":
+    main()
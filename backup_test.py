@@ -0,0 +1,178 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+import backup
+from models.priority import Priority
+from models.task import Task
+from services.task_manager import TaskManager
+from storage.file_storage import FileStorage
+from storage.log_storage import LogStorage
+
+
+def state(tasks):
+    return [(task.id, task.title, task.is_done) for task in tasks]
+
+
+def restored_state(backup_dir, target, **kwargs):
+    backup.restore(backup_dir, target, force=True, **kwargs)
+    return state(FileStorage(target).restore_tasks())
+
+
+def test_incremental_backup_ships_only_changed_records(tmp_path):
+    # Arrange
+    file_path = tmp_path / "tasks.txt"
+    backup_dir = tmp_path / "backups"
+    task_manager = TaskManager(FileStorage(file_path))
+    task_manager.add_tasks([(f"test{i}", Priority.low) for i in range(10)])
+    task_manager.save_tasks()
+
+    # Act
+    full = backup.backup(file_path, backup_dir)
+    task_manager.complete_task(3)
+    task_manager.add_task("new", Priority.high)
+    task_manager.save_tasks()
+    incremental = backup.backup(file_path, backup_dir)
+    unchanged = backup.backup(file_path, backup_dir)
+
+    # Assert
+    assert (full["kind"], full["records"], full["tasks"]) == ("full", 10, 10)
+    assert (incremental["kind"], incremental["records"], incremental["tasks"]) == ("incremental", 2, 11)
+    assert unchanged["records"] == 0
+    assert restored_state(backup_dir, tmp_path / "restored.txt") == state(task_manager.tasks)
+    assert FileStorage(tmp_path / "restored.txt").restore_meta() == {"maxId": 11, "count": 11}
+    assert sorted(path.name for path in backup_dir.glob("manifest-*")) == ["manifest-000003.txt"]
+
+
+def test_restore_point_in_time(tmp_path):
+    # Arrange
+    file_path = tmp_path / "tasks.txt"
+    backup_dir = tmp_path / "backups"
+    task_manager = TaskManager(FileStorage(file_path))
+    task_manager.add_tasks([(f"test{i}", Priority.low) for i in range(3)])
+    task_manager.save_tasks()
+    first = backup.backup(file_path, backup_dir)
+    first_state = state(task_manager.tasks)
+    task_manager.complete_task(1)
+    task_manager.save_tasks()
+    backup.backup(file_path, backup_dir)
+    backup.backup(file_path, backup_dir, full=True)
+    task_manager.add_task("latest", Priority.high)
+    task_manager.save_tasks()
+    backup.backup(file_path, backup_dir)
+
+    # Act
+    by_seq = restored_state(backup_dir, tmp_path / "seq.txt", seq=1)
+    by_time = restored_state(backup_dir, tmp_path / "at.txt", at=datetime.fromisoformat(first["time"]))
+    latest = restored_state(backup_dir, tmp_path / "latest.txt")
+    chain = backup.select_chain(backup.load_index(backup_dir))
+
+    # Assert
+    assert by_seq == by_time == first_state
+    assert latest == state(task_manager.tasks)
+    assert [entry["seq"] for entry in chain] == [3, 4]
+    with pytest.raises(ValueError):
+        backup.restore(backup_dir, tmp_path / "early.txt", at=datetime(2000, 1, 1))
+
+
+def test_restore_refuses_to_overwrite(tmp_path):
+    # Arrange
+    file_path = tmp_path / "tasks.txt"
+    FileStorage(file_path).save_tasks([Task("test1", Priority.low, False, 1)])
+    backup.backup(file_path, tmp_path / "backups")
+
+    # Act / Assert
+    with pytest.raises(FileExistsError):
+        backup.restore(tmp_path / "backups", file_path)
+
+
+def test_backup_includes_log_storage_journal(tmp_path):
+    # Arrange
+    file_path = tmp_path / "tasks.txt"
+    task_manager = TaskManager(LogStorage(file_path, compact_every=1000))
+    task_manager.add_tasks([(f"test{i}", Priority.medium) for i in range(5)])
+    task_manager.save_tasks()
+    task_manager.complete_task(2)
+    task_manager.add_task("logged", Priority.low)
+
+    # Act
+    entry = backup.backup(file_path, tmp_path / "backups")
+
+    # Assert
+    assert entry["tasks"] == 6
+    assert restored_state(tmp_path / "backups", tmp_path / "restored.txt") == state(task_manager.tasks)
+    task_manager.close()
+
+
+def test_restore_over_log_storage_discards_newer_journal(tmp_path):
+    # Arrange
+    file_path = tmp_path / "tasks.txt"
+    task_manager = TaskManager(LogStorage(file_path, compact_every=1000))
+    task_manager.add_tasks([(f"test{i}", Priority.medium) for i in range(3)])
+    task_manager.save_tasks()
+    backup.backup(file_path, tmp_path / "backups")
+    first_state = state(task_manager.tasks)
+    task_manager.add_task("after backup", Priority.low)
+    task_manager.complete_task(1)
+    backup.backup(file_path, tmp_path / "backups")
+    task_manager.close()
+
+    # Act
+    backup.restore(tmp_path / "backups", file_path, seq=1, force=True)
+    restored = TaskManager(LogStorage(file_path))
+    restored.restore_tasks()
+
+    # Assert
+    assert state(restored.tasks) == first_state
+    assert not (tmp_path / "tasks.txt.log").exists()
+    assert (tmp_path / "tasks.txt.log.before-restore").exists()
+    restored.close()
+
+
+def test_backup_of_unsorted_snapshot(tmp_path):
+    # Arrange
+    file_path = tmp_path / "tasks.txt"
+    tasks = [Task(f"test{i}", Priority.low, False, i) for i in (3, 1, 2)]
+    FileStorage(file_path).save_tasks(tasks)
+
+    # Act
+    entry = backup.backup(file_path, tmp_path / "backups")
+
+    # Assert
+    assert entry["tasks"] == 3
+    assert [task_id for task_id, _, _ in restored_state(tmp_path / "backups", tmp_path / "restored.txt")] == [1, 2, 3]
+
+
+def test_backup_while_server_saves(tmp_path):
+    # Arrange
+    file_path = tmp_path / "tasks.txt"
+    task_manager = TaskManager(LogStorage(file_path, compact_every=20))
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            task = task_manager.add_task(f"test{i}", Priority.low)
+            if i % 3 == 0:
+                task_manager.complete_task(task.id)
+            task_manager.save_tasks()
+            i += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+
+    # Act
+    try:
+        entries = [backup.backup(file_path, tmp_path / "backups", full=i % 2 == 0) for i in range(20)]
+    finally:
+        stop.set()
+        thread.join()
+
+    # Assert
+    # В каждой копии целое состояние: задачи подряд с первой, без потерянных записей
+    for entry in entries:
+        restored = restored_state(tmp_path / "backups", tmp_path / "restored.txt", seq=entry["seq"])
+        assert [task_id for task_id, _, _ in restored] == list(range(1, entry["tasks"] + 1))
+        assert entry["errors"] == 0
+    task_manager.close()
@@ -0,0 +1,46 @@
+import argparse
+import json
+import time
+
+from benchmarks.run import best_time, make_tasks
+from models import codec
+from models.task import Task
+
+
+def encode_with_dicts(tasks):
+    # Прежнее кодирование: словарь на каждую задачу и json.dumps
+    return json.dumps([task.to_dict() for task in tasks])
+
+
+def decode_with_json(raw):
+    return [Task.from_dict(data) for data in json.loads(raw)]
+
+
+def timed(func, arg):
+    def run():
+        started = time.perf_counter()
+        func(arg)
+        return time.perf_counter() - started
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task list encode/decode speed: stdlib json vs models.codec")
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.count)
+    raw = codec.encode_tasks(tasks)
+    assert raw == encode_with_dicts(tasks)
+
+    print(f"tasks: {args.count}, codec backend: {codec.BACKEND}")
+    for name, old, new, arg in (("encode", encode_with_dicts, codec.encode_tasks, tasks),
+                                ("decode", decode_with_json, codec.decode_tasks, raw)):
+        old_time = best_time(timed(old, arg), args.repeat)
+        new_time = best_time(timed(new, arg), args.repeat)
+        print(f"{name}: json {old_time * 1000:.1f} ms, codec {new_time * 1000:.1f} ms ({old_time / new_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import argparse
+import http.client
+import json
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from models.priority import Priority
+from models.task import Task
+from services.task_manager import TaskManager
+from storage.binary_storage import BinaryStorage
+from storage.file_storage import FileStorage
+from storage.log_storage import LogStorage
+from storage.sqlite_storage import SQLiteStorage
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Хранилища, которые умеет мерить бенчмарк save/restore
+STORAGES = {
+    "file": lambda path: FileStorage(path / "tasks.txt"),
+    "log": lambda path: LogStorage(path / "tasks.txt"),
+    "sqlite": lambda path: SQLiteStorage(path / "tasks.db"),
+    "binary": lambda path: BinaryStorage(path / "tasks.bin"),
+}
+
+
+def make_tasks(count):
+    priorities = list(Priority)
+    return [Task(f"task {i}", priorities[i % 3], i % 2 == 0, i) for i in range(1, count + 1)]
+
+
+def best_time(func, repeat):
+    # Лучшее время из нескольких повторов, func сама готовит данные и возвращает замеренное время
+    return min(func() for _ in range(repeat))
+
+
+def bench_manager(count, repeat):
+    def add():
+        task_manager = TaskManager(FileStorage("unused.txt"))
+        started = time.perf_counter()
+        for i in range(count):
+            task_manager.add_task(f"task {i}", Priority.medium)
+        return time.perf_counter() - started
+
+    def complete():
+        task_manager = TaskManager(FileStorage("unused.txt"))
+        task_manager.add_tasks((f"task {i}", Priority.medium) for i in range(count))
+        started = time.perf_counter()
+        for task_id in range(1, count + 1):
+            task_manager.complete_task(task_id)
+        return time.perf_counter() - started
+
+    return {
+        f"manager.add_task[{count}]": {"ops_per_sec": count / best_time(add, repeat)},
+        f"manager.complete_task[{count}]": {"ops_per_sec": count / best_time(complete, repeat)},
+    }
+
+
+def bench_storage(kind, count, repeat):
+    tasks = make_tasks(count)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp)
+
+        def save():
+            storage = STORAGES[kind](path)
+            started = time.perf_counter()
+            storage.save_tasks(tasks)
+            elapsed = time.perf_counter() - started
+            storage.close()
+            return elapsed
+
+        def restore():
+            storage = STORAGES[kind](path)
+            started = time.perf_counter()
+            restored = storage.restore_tasks()
+            elapsed = time.perf_counter() - started
+            storage.close()
+            assert len(restored) == count
+            return elapsed
+
+        save_time = best_time(save, repeat)
+        restore_time = best_time(restore, repeat)
+        size = sum(file.stat().st_size for file in path.iterdir())
+
+    return {
+        f"storage.{kind}.save_tasks[{count}]": {"ops_per_sec": count / save_time,
+                                                "mb_per_sec": size / save_time / 1e6},
+        f"storage.{kind}.restore_tasks[{count}]": {"ops_per_sec": count / restore_time,
+                                                   "mb_per_sec": size / restore_time / 1e6},
+    }
+
+
+def bench_serialization(count, repeat):
+    tasks = make_tasks(count)
+    dicts = [task.to_dict() for task in tasks]
+
+    def to_dict():
+        started = time.perf_counter()
+        for task in tasks:
+            task.to_dict()
+        return time.perf_counter() - started
+
+    def from_dict():
+        started = time.perf_counter()
+        for data in dicts:
+            Task.from_dict(data)
+        return time.perf_counter() - started
+
+    return {
+        f"task.to_dict[{count}]": {"ops_per_sec": count / best_time(to_dict, repeat)},
+        f"task.from_dict[{count}]": {"ops_per_sec": count / best_time(from_dict, repeat)},
+    }
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir, port, server):
+    # Сервер из main.py в отдельном процессе, чтобы генератор нагрузки не делил с ним GIL
+    process = subprocess.Popen([sys.executable, str(ROOT / "main.py"), "--port", str(port), "--server", server],
+                               cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+def load(port, method, path, body, requests_count, concurrency):
+    # Генератор нагрузки: concurrency потоков, каждый шлет запросы по очереди
+    latencies = []
+    errors = []
+    per_client = requests_count // concurrency
+    headers = {"Content-Type": "application/json"}
+
+    def client():
+        for _ in range(per_client):
+            started = time.perf_counter()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    errors.append(response.status)
+            except OSError as e:
+                errors.append(str(e))
+            finally:
+                conn.close()
+            latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p90_ms": percentile(latencies, 0.9) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": len(errors),
+    }
+
+
+def bench_http(requests_count, concurrency, server):
+    port = free_port()
+    body = json.dumps({"title": "bench", "priority": "high"}).encode("utf-8")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        process = start_server(tmp, port, server)
+        try:
+            create = load(port, "POST", "/tasks", body, requests_count, concurrency)
+            get = load(port, "GET", "/tasks?limit=50", None, requests_count, concurrency)
+        finally:
+            process.terminate()
+            process.wait()
+
+    return {
+        f"http.{server}.post_tasks[c={concurrency}]": create,
+        f"http.{server}.get_tasks[c={concurrency}]": get,
+    }
+
+
+# Направление метрики: для *_per_sec больше - лучше, для *_ms меньше - лучше
+def is_regression(metric, base, new, threshold):
+    if metric.endswith("_per_sec"):
+        return new < base * (1 - threshold)
+    if metric.endswith("_ms"):
+        return new > base * (1 + threshold)
+    return False
+
+
+def compare(base, new, threshold):
+    # Возвращаем строки сравнения и список регрессий (имя, метрика, было, стало)
+    lines = []
+    regressions = []
+    for name, metrics in new["results"].items():
+        base_metrics = base["results"].get(name)
+        if base_metrics is None:
+            continue
+        for metric, value in metrics.items():
+            if metric not in base_metrics or not base_metrics[metric]:
+                continue
+            old = base_metrics[metric]
+            change = (value - old) / old * 100
+            mark = ""
+            if is_regression(metric, old, value, threshold):
+                mark = "  REGRESSION"
+                regressions.append((name, metric, old, value))
+            lines.append(f"{name:45} {metric:16} {old:14.2f} {value:14.2f} {change:+7.1f}%{mark}")
+    return lines, regressions
+
+
+def run(sizes, repeat, storages, http_requests, concurrency, server):
+    results = {}
+    for count in sizes:
+        results.update(bench_manager(count, repeat))
+        results.update(bench_serialization(count, repeat))
+        for kind in storages:
+            results.update(bench_storage(kind, count, repeat))
+    if http_requests:
+        for clients in concurrency:
+            results.update(bench_http(http_requests, clients, server))
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "sizes": sizes,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task service benchmarks")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma separated task counts, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--storages", default=",".join(STORAGES))
+    parser.add_argument("--http-requests", type=int, default=2000, help="0 to skip the HTTP benchmark")
+    parser.add_argument("--concurrency", default="1,8")
+    parser.add_argument("--server", default="threaded", choices=["single", "threaded", "async"])
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown for --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f_base, open(args.compare[1], encoding="utf-8") as f_new:
+            lines, regressions = compare(json.load(f_base), json.load(f_new), args.threshold)
+        print("\n".join(lines))
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+
+    report = run([int(size) for size in args.sizes.split(",")], args.repeat, args.storages.split(","),
+                 args.http_requests, [int(c) for c in args.concurrency.split(",")], args.server)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding="utf-8") as f_write:
+            f_write.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+from benchmarks.run import bench_manager, bench_storage, compare
+
+
+def test_bench_storage_reports_throughput():
+    # Arrange
+    count = 100
+
+    # Act
+    results = bench_storage("file", count, 1)
+
+    # Assert
+    assert set(results) == {"storage.file.save_tasks[100]", "storage.file.restore_tasks[100]"}
+    assert all(metrics["ops_per_sec"] > 0 for metrics in results.values())
+
+
+def test_bench_manager_reports_throughput():
+    # Arrange
+    count = 100
+
+    # Act
+    results = bench_manager(count, 1)
+
+    # Assert
+    assert results["manager.add_task[100]"]["ops_per_sec"] > 0
+    assert results["manager.complete_task[100]"]["ops_per_sec"] > 0
+
+
+def test_compare_finds_regressions():
+    # Arrange
+    base = {"results": {"a": {"ops_per_sec": 100.0, "p99_ms": 10.0}, "b": {"ops_per_sec": 100.0}}}
+    new = {"results": {"a": {"ops_per_sec": 95.0, "p99_ms": 20.0}, "b": {"ops_per_sec": 50.0}, "c": {"ops_per_sec": 1.0}}}
+
+    # Act
+    lines, regressions = compare(base, new, 0.1)
+
+    # Assert
+    assert len(lines) == 3
+    assert [(name, metric) for name, metric, old, value in regressions] == [("a", "p99_ms"), ("b", "ops_per_sec")]
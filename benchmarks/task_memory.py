@@ -0,0 +1,62 @@
+import argparse
+import gc
+import tracemalloc
+
+from models.priority import Priority
+from models.task import Task
+from services.task_manager import TaskManager
+from storage.file_storage import FileStorage
+
+
+# Прежнее устройство задачи с __dict__ у каждого экземпляра, для сравнения
+class DictTask:
+    def __init__(self, title, priority, is_done, id):
+        self._title = title
+        self._priority = priority
+        self._is_done = is_done
+        self._id = id
+
+
+def bytes_per_task(task_cls, count):
+    # Названия создаем заранее, чтобы мерить только сами задачи
+    titles = [f"task {i}" for i in range(count)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [task_cls(titles[i], Priority.low, False, i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tasks
+    return (after - before) / count
+
+
+def bytes_per_tasks_access(count):
+    # Сколько памяти выделяет одно обращение к TaskManager.tasks
+    task_manager = TaskManager(FileStorage("unused.txt"))
+    for i in range(count):
+        task_manager.add_task(f"task {i}", Priority.low)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    view = task_manager.tasks
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del view
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory used per task")
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    dict_bytes = bytes_per_task(DictTask, args.count)
+    slots_bytes = bytes_per_task(Task, args.count)
+    print(f"tasks: {args.count}")
+    print(f"__dict__ task: {dict_bytes:.1f} bytes/task")
+    print(f"__slots__ task: {slots_bytes:.1f} bytes/task ({dict_bytes / slots_bytes:.2f}x less)")
+    print(f"list copy of tasks: {8 * args.count} bytes, TaskManager.tasks view: {bytes_per_tasks_access(args.count)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,217 @@
+import argparse
+import asyncio
+import json
+import re
+import signal
 from functools import partial
-from http.server import HTTPServer
+from http.server import HTTPServer, ThreadingHTTPServer
+from pathlib import Path
 
+from api.async_server import AsyncTaskServer
+from api.prefork_server import PreforkTaskServer
+from api.task_api import TaskAPI
 from api.task_handler import TaskRESTHandler
+from services.metrics import Metrics
+from services.profiling import RequestProfiler
+from services.sharded_task_manager import ShardedTaskManager
 from services.task_manager import TaskManager
+from storage.atomic_file import atomic_write
+from storage.binary_storage import BinaryStorage
 from storage.file_storage import FileStorage
+from storage.log_storage import LogStorage
+from storage.sqlite_storage import SQLiteStorage
+from storage.write_behind_storage import WriteBehindStorage
 
 # Константа для пути к файлу с задачами, по заданию именно .txt
 FILE_PATH = "tasks.txt"
+# Файл базы для --storage sqlite
+DB_PATH = "tasks.db"
+# Бинарный снимок для --storage binary
+BINARY_PATH = "tasks.bin"
+# Задач подряд в одном шарде при --shards, см. ShardedTaskManager
+SHARD_ID_BLOCK = 1
 
 
-def run(host="127.0.0.1", port=8000):
-    # Создаем хранилище и менеджер задач
-    storage = FileStorage(FILE_PATH)
-    task_manager = TaskManager(storage)
+def storage_path(kind):
+    if kind == "sqlite":
+        return DB_PATH
+    if kind == "binary":
+        return BINARY_PATH
+    return FILE_PATH
 
-    # Получаем ранее созданные задачи
-    task_manager.restore_tasks()
 
-    # Добавлем менеджер задач к обработчику
-    handler = partial(TaskRESTHandler, task_manager)
+def shard_path(path, shard):
+    # tasks.txt -> tasks.0.txt, у каждого шарда свой файл
+    if shard is None:
+        return path
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}.{shard}{path.suffix}"))
 
-    print(f"Serving on http://{host}:{port}")
-    server = HTTPServer((host, port), handler)
+
+def existing_shards(path):
+    # Номера шардов, файлы которых уже есть рядом с path
+    path = Path(path)
+    pattern = re.compile(rf"{re.escape(path.stem)}\.(\d+){re.escape(path.suffix)}")
+    matches = (pattern.fullmatch(p.name) for p in path.parent.iterdir())
+    return sorted(int(match.group(1)) for match in matches if match)
+
+
+def has_tasks(path):
+    # Хранилище без шардов уже что-то записало: снимок или журнал LogStorage
+    return any(Path(p).exists() and Path(p).stat().st_size > 0 for p in (path, f"{path}.log"))
+
+
+def check_shard_layout(path, shards, id_block=SHARD_ID_BLOCK):
+    # Шард задачи и следующий id вычисляются из числа шардов и размера блока, поэтому
+    # с другой раскладкой задачи искались бы не в своих шардах, а новые шарды выдали бы занятые id.
+    # Раскладка хранится рядом с файлами задач, запуск с другой раскладкой - ошибка
+    layout_path = Path(f"{path}.shards")
+    layout = {"shards": shards, "idBlock": id_block}
+    if layout_path.exists():
+        with layout_path.open('r', encoding="utf-8") as f_read:
+            saved = json.load(f_read)
+        if saved != layout:
+            raise ValueError(f"{path} is split into {saved['shards']} shards with id block {saved['idBlock']}, "
+                             f"but {shards} shards with id block {id_block} were requested")
+        return
+
+    shard_files = existing_shards(path)
+    if shards == 1:
+        if shard_files:
+            raise ValueError(f"{path} has shard files {shard_files}, start with the same --shards")
+        return
+    if has_tasks(path):
+        raise ValueError(f"{path} holds tasks of an unsharded store, they would be ignored with --shards {shards}")
+    # Шарды без файла раскладки принимаем, только если их файлы точно совпадают с запрошенными
+    if shard_files and (shard_files != list(range(shards)) or id_block != SHARD_ID_BLOCK):
+        raise ValueError(f"{path} has shard files {shard_files} but no layout, cannot start {shards} shards")
+    with atomic_write(layout_path) as f_write:
+        f_write.write(json.dumps(layout))
+
+
+def create_storage(kind, durability="sync", shard=None):
+    # file - перезапись всего файла, log - журнал изменений со снимком, sqlite - строки в базе,
+    # binary - бинарный снимок с чтением через mmap
+    path = shard_path(storage_path(kind), shard)
+    if kind == "log":
+        storage = LogStorage(path)
+    elif kind == "sqlite":
+        storage = SQLiteStorage(path)
+    elif kind == "binary":
+        storage = BinaryStorage(path)
+    else:
+        storage = FileStorage(path)
+    # sync, batched[:<мс>] или on-shutdown, см. WriteBehindStorage
+    return WriteBehindStorage.from_spec(storage, durability)
+
+
+# Многопоточный сервер с очередью подключений побольше стандартных 5,
+# иначе при всплеске клиентов соединения сбрасываются еще до accept
+class ThreadedTaskServer(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+def create_server(host, port, handler, mode):
+    # single - один запрос за раз, threaded - отдельный поток на каждое соединение,
+    # async (см. run_async) - все соединения в одном цикле событий,
+    # prefork (см. run_prefork) - несколько процессов с одним писателем
+    if mode == "threaded":
+        return ThreadedTaskServer((host, port), handler)
+    return HTTPServer((host, port), handler)
+
+
+def stop_on_sigterm(signum, frame):
+    # SIGTERM (docker stop, systemd, kill) завершает сервер тем же путем, что и Ctrl+C,
+    # чтобы task_manager.close() дописал отложенные изменения
+    raise KeyboardInterrupt
+
+
+def run_async(task_manager, host, port, metrics, profiler):
+    async_server = AsyncTaskServer(task_manager, host, port, metrics, profiler)
+    try:
+        asyncio.run(async_server.serve_forever())
+    except KeyboardInterrupt:
+        print("Shutting down...")
+    finally:
+        # Дожидаемся фоновых сохранений
+        async_server.close()
+        task_manager.close()
+
+
+def run_prefork(task_manager, host, port, workers):
+    prefork_server = PreforkTaskServer(task_manager, host, port, workers)
+    try:
+        prefork_server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down...")
+    finally:
+        prefork_server.close()
+        task_manager.close()
+
+
+def run(host="127.0.0.1", port=8000, storage="file", server="single", durability="sync",
+        background_restore=False, profile_ms=None, profile_dir="profiles", workers=None, shards=1):
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
+    # Метрики для GET /metrics
+    metrics = Metrics()
+    # Создаем хранилище и менеджер задач, при shards > 1 - по хранилищу на шард
+    check_shard_layout(storage_path(storage), shards)
+    if shards > 1:
+        task_manager = ShardedTaskManager([create_storage(storage, durability, shard) for shard in range(shards)],
+                                          metrics, SHARD_ID_BLOCK)
+    else:
+        task_manager = TaskManager(create_storage(storage, durability), metrics)
+    # Профилирование запросов дольше profile_ms, флагом или переменной TASKS_PROFILE_MS
+    if profile_ms is not None:
+        profiler = RequestProfiler(profile_ms, profile_dir)
+    else:
+        profiler = RequestProfiler.from_env()
+
+    # Получаем ранее созданные задачи, при background_restore дочитываем их уже во время работы сервера
+    task_manager.restore_tasks(background=background_restore)
+
+    print(f"Serving on http://{host}:{port} ({server})")
+    if server == "async":
+        run_async(task_manager, host, port, metrics, profiler)
+        return
+    if server == "prefork":
+        # Метрики и профилирование относятся к одному процессу, в pre-fork режиме их нет
+        run_prefork(task_manager, host, port, workers)
+        return
+
+    # Добавлем API над менеджером задач к обработчику
+    handler = partial(TaskRESTHandler, TaskAPI(task_manager, metrics=metrics, profiler=profiler,
+                                               waits=server != "single"))
+
+    server = create_server(host, port, handler, server)
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("Shutting down...")
+    finally:
         server.server_close()
+        # Записываем изменения, которые еще не успели попасть на диск
+        task_manager.close()
 
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--storage", choices=["file", "log", "sqlite", "binary"], default="file")
+    parser.add_argument("--server", choices=["single", "threaded", "async", "prefork"], default="single")
+    parser.add_argument("--durability", default="sync",
+                        help="sync, batched, batched:<ms> or on-shutdown")
+    parser.add_argument("--background-restore", action="store_true",
+                        help="start serving while tasks are still being loaded")
+    parser.add_argument("--profile-ms", type=float,
+                        help="dump sampled stacks of requests slower than this many milliseconds")
+    parser.add_argument("--profile-dir", default="profiles")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes for --server prefork, CPU count by default")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="split tasks across this many managers, each with its own storage file")
+    args = parser.parse_args()
+
+    run(args.host, args.port, args.storage, args.server, args.durability, args.background_restore,
+        args.profile_ms, args.profile_dir, args.workers, args.shards)
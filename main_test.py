@@ -0,0 +1,112 @@
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+from main import check_shard_layout, shard_path
+from models.priority import Priority
+from services.sharded_task_manager import ShardedTaskManager
+from storage.file_storage import FileStorage
+
+
+def make_manager(path, shards):
+    return ShardedTaskManager([FileStorage(shard_path(path, shard)) for shard in range(shards)])
+
+
+def test_shard_layout_is_recorded_and_checked(tmp_path):
+    # Arrange
+    path = str(tmp_path / "tasks.txt")
+    check_shard_layout(path, 2)
+    task_manager = make_manager(path, 2)
+    task_manager.add_tasks([("test", Priority.low)])
+    task_manager.add_task("test", Priority.low)
+    task_manager.save_tasks()
+
+    # Act
+    check_shard_layout(path, 2)
+    with pytest.raises(ValueError, match="2 shards"):
+        check_shard_layout(path, 3)
+    with pytest.raises(ValueError, match="2 shards"):
+        check_shard_layout(path, 1)
+
+    # Assert
+    assert (tmp_path / "tasks.txt.shards").exists()
+
+
+def test_shards_refuse_unsharded_store(tmp_path):
+    # Arrange
+    path = str(tmp_path / "tasks.txt")
+    storage = FileStorage(path)
+    storage.save_tasks(make_manager(str(tmp_path / "other.txt"), 1).add_tasks([("test", Priority.low)]))
+
+    # Act
+    check_shard_layout(path, 1)
+
+    # Assert
+    with pytest.raises(ValueError, match="unsharded"):
+        check_shard_layout(path, 2)
+    assert not (tmp_path / "tasks.txt.shards").exists()
+
+
+def test_shard_files_without_layout_must_match(tmp_path):
+    # Arrange
+    path = str(tmp_path / "tasks.txt")
+    task_manager = make_manager(path, 2)
+    task_manager.add_task("test", Priority.low)
+    task_manager.add_task("test", Priority.low)
+    task_manager.save_tasks()
+
+    # Act
+    with pytest.raises(ValueError, match=r"\[0, 1\]"):
+        check_shard_layout(path, 3)
+    with pytest.raises(ValueError, match=r"\[0, 1\]"):
+        check_shard_layout(path, 1)
+    check_shard_layout(path, 2)
+
+    # Assert
+    assert (tmp_path / "tasks.txt.shards").exists()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.parametrize("server", ["threaded", "async", "prefork"])
+def test_sigterm_saves_pending_changes(tmp_path, server):
+    # Arrange
+    port = free_port()
+    main_path = Path(__file__).parent / "main.py"
+    process = subprocess.Popen([sys.executable, "-u", str(main_path), "--port", str(port), "--server", server,
+                                "--workers", "1", "--durability", "on-shutdown"],
+                               cwd=tmp_path, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                created = requests.post(f"http://127.0.0.1:{port}/tasks", json={"title": "test1", "priority": "low"},
+                                        timeout=5)
+                break
+            except requests.ConnectionError:
+                assert time.monotonic() < deadline and process.poll() is None
+                time.sleep(0.05)
+        saved_before = (tmp_path / "tasks.txt").exists()
+
+        # Act
+        process.send_signal(signal.SIGTERM)
+        output, _ = process.communicate(timeout=10)
+    finally:
+        process.kill()
+
+    # Assert
+    assert created.status_code == 201
+    assert not saved_before
+    assert process.returncode == 0
+    assert b"Shutting down..." in output
+    assert [task.title for task in FileStorage(tmp_path / "tasks.txt").restore_tasks()] == ["test1"]
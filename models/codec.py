@@ -0,0 +1,57 @@
+import json
+from itertools import islice
+
+from models.task import Task
+
+# Разбор json через orjson или msgspec, если они установлены, иначе стандартный json.
+# Кодирование задач от библиотеки не зависит (Task.to_json), поэтому записи в файлах
+# и ответы сервера побайтно одинаковы при любой установленной библиотеке
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = "orjson"
+    loads = orjson.loads
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    loads = msgspec.json.decode
+else:
+    BACKEND = "json"
+    loads = json.loads
+
+
+def dumps(data):
+    # Прочие ответы небольшие, для них оставляем формат json.dumps
+    return json.dumps(data)
+
+
+def encode_task(task):
+    return task.to_json()
+
+
+def encode_tasks(tasks):
+    return "[" + ", ".join([task.to_json() for task in tasks]) + "]"
+
+
+def iter_encode_tasks(tasks, count=None, batch=1000):
+    # Тот же json, что encode_tasks, но кусками по batch задач: память не зависит от длины списка.
+    # count - сколько первых задач кодировать, задачи добавленные позже не попадут в ответ.
+    # tasks обходится один раз, поэтому подходит и ленивое слияние списков шардов
+    count = len(tasks) if count is None else count
+    tasks = iter(tasks)
+    yield "["
+    for start in range(0, count, batch):
+        chunk = ", ".join([task.to_json() for task in islice(tasks, min(batch, count - start))])
+        yield chunk if start == 0 else ", " + chunk
+    yield "]"
+
+
+def decode_tasks(raw):
+    return [Task.from_dict(data) for data in loads(raw)]
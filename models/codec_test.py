@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from models import codec
+from models.priority import Priority
+from models.task import Task
+
+
+@pytest.mark.parametrize("title", ["test1", 'quote " and \\ slash', "line\nbreak\ttab", "задача 🚀", "\x00\x1f"])
+def test_encode_task_matches_json_dumps(title):
+    # Arrange
+    task = Task(title, Priority.medium, True, 7)
+
+    # Act
+    encoded = codec.encode_task(task)
+
+    # Assert
+    assert encoded == json.dumps(task.to_dict())
+
+
+def test_encode_decode_tasks_round_trip():
+    # Arrange
+    tasks = [Task(f"test{i}", priority, i % 2 == 0, i) for i, priority in enumerate(Priority, 1)]
+
+    # Act
+    encoded = codec.encode_tasks(tasks)
+    decoded = codec.decode_tasks(encoded)
+
+    # Assert
+    assert encoded == json.dumps([task.to_dict() for task in tasks])
+    assert [task.to_dict() for task in decoded] == [task.to_dict() for task in tasks]
+    assert codec.loads(codec.encode_task(tasks[0])) == tasks[0].to_dict()
+    assert codec.encode_tasks([]) == "[]"
+
+
+def test_loads_accepts_str_and_bytes():
+    # Act
+    from_str = codec.loads('{"a": [1, 2]}')
+    from_bytes = codec.loads(b'{"a": [1, 2]}')
+
+    # Assert
+    assert from_str == from_bytes == {"a": [1, 2]}
+    assert codec.BACKEND in ("orjson", "msgspec", "json")
+
+
+@pytest.mark.parametrize("count", [0, 1, 5, 6, 7])
+def test_iter_encode_tasks_matches_encode_tasks(count):
+    # Arrange
+    tasks = [Task(f"test{i}", Priority.low, False, i) for i in range(1, 8)]
+
+    # Act
+    chunks = list(codec.iter_encode_tasks(tasks, count, batch=3))
+
+    # Assert
+    assert "".join(chunks) == codec.encode_tasks(tasks[:count])
+    assert len(chunks) == 2 + (count + 2) // 3
@@ -1,8 +1,16 @@
+from json.encoder import encode_basestring_ascii
+
 from models.priority import Priority
 
+# Закодированные названия приоритетов, чтобы не экранировать их для каждой задачи
+PRIORITY_JSON = {priority: encode_basestring_ascii(priority.name) for priority in Priority}
+
 
 #Класс задания
 class Task:
+    # Без __dict__ у каждого экземпляра: задач могут быть миллионы
+    __slots__ = ("_title", "_priority", "_is_done", "_id")
+
     def __init__(self, title, priority, is_done, id):
         #Проверка на тип приоритета
         if not isinstance(priority, Priority):
@@ -42,6 +50,12 @@ class Task:
             "id": self._id,
         }
 
+    #Кодирование в json по известной схеме, без промежуточного словаря.
+    #Результат совпадает с json.dumps(self.to_dict())
+    def to_json(self):
+        return (f'{{"title": {encode_basestring_ascii(self._title)}, "priority": {PRIORITY_JSON[self._priority]}, '
+                f'"isDone": {"true" if self._is_done else "false"}, "id": {self._id}}}')
+
     #Преобразование из словаря (для чтения из записей в формате json из файла)
     @staticmethod
     def from_dict(data):
@@ -40,3 +40,15 @@ def test_task_from_dict_is_valid():
     assert task.priority == test_priority.name
     assert task.is_done == is_done
     assert task.id == test_id
+
+def test_task_has_no_instance_dict():
+    # Arrange
+    task = Task("test", Priority.low, False, 1)
+
+    # Act
+    has_dict = hasattr(task, "__dict__")
+
+    # Assert
+    assert has_dict == False
+    with pytest.raises(AttributeError):
+        task.extra = 1
@@ -0,0 +1,89 @@
+import threading
+import uuid
+from collections import deque
+from itertools import islice
+
+# Сколько последних изменений хранится, клиенты старше получают полный список заново
+CHANGES_LIMIT = 10000
+
+
+# Лента изменений задач: у каждого создания и выполнения свой номер, номера растут подряд.
+# Хранит последние limit событий и будит тех, кто ждет новых.
+# Лента общая для шардов (см. ShardedTaskManager), поэтому запись в нее не берет блокировку:
+# событие кладется в очередь, а номер ему дает читатель, когда разбирает очередь под блокировкой
+class ChangeFeed:
+    def __init__(self, limit=CHANGES_LIMIT):
+        self._limit = limit
+        self._events = deque(maxlen=limit)
+        # События без номера, deque.append и popleft атомарны
+        self._pending = deque()
+        self._seq = 0
+        # Номера начинаются с 0 при каждом запуске, поэтому клиенты видят их вместе с эпохой запуска,
+        # как ETag у TaskListCache: номер прошлого запуска не примут за номер этого
+        self.epoch = uuid.uuid4().hex[:8]
+        self._changed = threading.Condition()
+        # Сколько потоков ждут в since: писатели берут блокировку, только чтобы разбудить их
+        self._waiters = 0
+        # Функции без аргументов, которые зовутся после каждого события (см. AsyncTaskServer).
+        # Кортеж заменяется целиком, поэтому append обходит его без блокировки
+        self._listeners = ()
+
+    def subscribe(self, listener):
+        with self._changed:
+            self._listeners += (listener,)
+
+    def unsubscribe(self, listener):
+        with self._changed:
+            self._listeners = tuple(item for item in self._listeners if item is not listener)
+
+    @property
+    def seq(self):
+        with self._changed:
+            self._drain()
+            return self._seq
+
+    def append(self, kind, task):
+        # Название и приоритет задачи не меняются, поэтому запоминаем только is_done на момент события,
+        # а кодируем задачу при чтении, чтобы не замедлять изменения
+        self._pending.append((kind, task, task.is_done))
+        # Событие добавлено до проверки: ждущий, которого мы не увидели, найдет его сам при проверке
+        if self._waiters or len(self._pending) >= self._limit:
+            # Без читателей очередь не должна расти бесконечно
+            with self._changed:
+                self._drain()
+                self._changed.notify_all()
+        for listener in self._listeners:
+            listener()
+
+    # Вызывается под self._changed
+    def _drain(self):
+        while self._pending:
+            kind, task, is_done = self._pending.popleft()
+            self._seq += 1
+            self._events.append((self._seq, kind, task, is_done))
+
+    # Вызывается под self._changed
+    def _changed_since(self, seq):
+        self._drain()
+        return self._seq != seq
+
+    def since(self, seq, timeout=0):
+        # События после seq, если их нет - ждем до timeout секунд.
+        # None - событий после seq уже нет в ленте или seq из другого запуска сервера
+        with self._changed:
+            if timeout:
+                self._waiters += 1
+                try:
+                    self._changed.wait_for(lambda: self._changed_since(seq), timeout)
+                finally:
+                    self._waiters -= 1
+            else:
+                self._drain()
+            if seq > self._seq:
+                return None
+            first = self._events[0][0] if self._events else self._seq + 1
+            if seq < first - 1:
+                return None
+            events = list(islice(self._events, seq - first + 1, None))
+        return [{"seq": event_seq, "type": kind, "task": {**task.to_dict(), "isDone": is_done}}
+                for event_seq, kind, task, is_done in events]
@@ -0,0 +1,120 @@
+import threading
+import time
+
+from models.priority import Priority
+from models.task import Task
+from services.change_feed import ChangeFeed
+
+
+def test_change_feed_since():
+    # Arrange
+    feed = ChangeFeed()
+    task = Task("test1", Priority.low, False, 1)
+    feed.append("created", task)
+    task.complete()
+    feed.append("completed", task)
+
+    # Act
+    all_events = feed.since(0)
+    last_events = feed.since(1)
+    no_events = feed.since(2)
+
+    # Assert
+    assert [(e["seq"], e["type"], e["task"]["isDone"]) for e in all_events] == [(1, "created", False),
+                                                                                (2, "completed", True)]
+    assert [e["seq"] for e in last_events] == [2]
+    assert no_events == []
+    assert feed.seq == 2
+
+
+def test_change_feed_lost_events():
+    # Arrange
+    feed = ChangeFeed(limit=3)
+    for i in range(1, 6):
+        feed.append("created", Task(f"test{i}", Priority.low, False, i))
+
+    # Act
+    too_old = feed.since(1)
+    oldest_kept = feed.since(2)
+    from_future = feed.since(10)
+
+    # Assert
+    assert too_old is None
+    assert [e["seq"] for e in oldest_kept] == [3, 4, 5]
+    assert from_future is None
+
+
+def test_change_feed_waits_for_event():
+    # Arrange
+    feed = ChangeFeed()
+    timer = threading.Timer(0.1, feed.append, args=("created", Task("test1", Priority.low, False, 1)))
+
+    # Act
+    started = time.perf_counter()
+    timer.start()
+    events = feed.since(0, timeout=5)
+    elapsed = time.perf_counter() - started
+    timed_out = feed.since(1, timeout=0.05)
+
+    # Assert
+    assert [e["seq"] for e in events] == [1]
+    assert elapsed < 2
+    assert timed_out == []
+
+
+def test_change_feed_calls_listeners():
+    # Arrange
+    feed = ChangeFeed()
+    calls = []
+    listener = lambda: calls.append(feed.seq)
+    feed.subscribe(listener)
+
+    # Act
+    feed.append("created", Task("test1", Priority.low, False, 1))
+    feed.unsubscribe(listener)
+    feed.append("created", Task("test2", Priority.low, False, 2))
+
+    # Assert
+    assert calls == [1]
+
+
+def test_change_feed_concurrent_appends_are_not_lost():
+    # Arrange
+    feed = ChangeFeed()
+    received = []
+
+    def reader():
+        seq = 0
+        while len(received) < 2000:
+            events = feed.since(seq, timeout=1)
+            received.extend(events)
+            seq = events[-1]["seq"] if events else seq
+
+    def writer(n):
+        for i in range(500):
+            feed.append("created", Task(f"writer{n} {i}", Priority.low, False, n * 500 + i + 1))
+
+    # Act
+    threads = [threading.Thread(target=reader)] + [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    # Assert
+    assert [e["seq"] for e in received] == list(range(1, 2001))
+    assert sorted(e["task"]["id"] for e in received) == list(range(1, 2001))
+
+
+def test_change_feed_without_readers_keeps_last_events():
+    # Arrange
+    feed = ChangeFeed(limit=3)
+
+    # Act
+    for i in range(1, 11):
+        feed.append("created", Task(f"test{i}", Priority.low, False, i))
+
+    # Assert
+    assert feed.since(6) is None
+    assert [e["task"]["id"] for e in feed.since(7)] == [8, 9, 10]
+    assert feed.seq == 10
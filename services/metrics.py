@@ -0,0 +1,99 @@
+import threading
+from bisect import bisect_left
+
+# Границы корзин гистограмм в секундах
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+# Гистограмма с фиксированными корзинами: наблюдение - один поиск и два сложения, без выделения памяти
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        # Последняя корзина - все, что больше последней границы (+Inf)
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{value}"' for name, value in labels.items())
+
+
+# Счетчики запросов, гистограммы задержек и значения для GET /metrics в текстовом формате Prometheus
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (метод, маршрут, статус) -> число запросов
+        self._requests = {}
+        # маршрут -> гистограмма времени обработки
+        self._latency = {}
+        # операция хранилища -> гистограмма времени
+        self._operations = {}
+        # имя -> (подписи, функция, возвращающая текущее значение)
+        self._gauges = []
+
+    def observe_request(self, method, route, status, seconds):
+        key = (method, route, status)
+        with self._lock:
+            self._requests[key] = self._requests.get(key, 0) + 1
+            histogram = self._latency.get(route)
+            if histogram is None:
+                histogram = self._latency[route] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_operation(self, operation, seconds):
+        with self._lock:
+            histogram = self._operations.get(operation)
+            if histogram is None:
+                histogram = self._operations[operation] = Histogram()
+            histogram.observe(seconds)
+
+    def gauge(self, name, labels, func):
+        # Значение считается только при выдаче метрик
+        self._gauges.append((name, labels, func))
+
+    @staticmethod
+    def _render_histogram(lines, name, labels, histogram):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+    def render(self):
+        with self._lock:
+            requests = sorted(self._requests.items())
+            latency = sorted(self._latency.items())
+            operations = sorted(self._operations.items())
+
+        lines = ["# HELP tasks_http_requests_total HTTP requests by method, route and status.",
+                 "# TYPE tasks_http_requests_total counter"]
+        for (method, route, status), count in requests:
+            lines.append(f"tasks_http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}")
+
+        lines += ["# HELP tasks_http_request_duration_seconds Time to handle a request by route.",
+                  "# TYPE tasks_http_request_duration_seconds histogram"]
+        for route, histogram in latency:
+            self._render_histogram(lines, "tasks_http_request_duration_seconds", _labels(route=route), histogram)
+
+        lines += ["# HELP tasks_storage_duration_seconds Time of task storage operations.",
+                  "# TYPE tasks_storage_duration_seconds histogram"]
+        for operation, histogram in operations:
+            self._render_histogram(lines, "tasks_storage_duration_seconds", _labels(operation=operation), histogram)
+
+        rendered = set()
+        for name, labels, func in self._gauges:
+            if name not in rendered:
+                lines.append(f"# TYPE {name} gauge")
+                rendered.add(name)
+            label_text = f"{{{_labels(**labels)}}}" if labels else ""
+            lines.append(f"{name}{label_text} {func()}")
+
+        return "\n".join(lines) + "\n"
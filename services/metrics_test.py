@@ -0,0 +1,43 @@
+import pytest
+
+from services.metrics import Histogram, Metrics
+
+
+def test_histogram_observe():
+    # Arrange
+    histogram = Histogram()
+
+    # Act
+    histogram.observe(0.0001)
+    histogram.observe(0.003)
+    histogram.observe(100)
+
+    # Assert
+    assert histogram.count == 3
+    assert histogram.counts[0] == 1
+    assert histogram.counts[3] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.total == pytest.approx(100.0031)
+
+
+def test_metrics_render_prometheus_text():
+    # Arrange
+    metrics = Metrics()
+    metrics.observe_request("GET", "/tasks", 200, 0.002)
+    metrics.observe_request("GET", "/tasks", 200, 0.02)
+    metrics.observe_request("POST", "/tasks", 400, 0.001)
+    metrics.observe_operation("save_tasks", 0.01)
+    metrics.gauge("tasks_count", {"state": "open"}, lambda: 7)
+
+    # Act
+    text = metrics.render()
+
+    # Assert
+    lines = text.splitlines()
+    assert 'tasks_http_requests_total{method="GET",route="/tasks",status="200"} 2' in lines
+    assert 'tasks_http_requests_total{method="POST",route="/tasks",status="400"} 1' in lines
+    assert 'tasks_http_request_duration_seconds_bucket{route="/tasks",le="0.0025"} 2' in lines
+    assert 'tasks_http_request_duration_seconds_bucket{route="/tasks",le="+Inf"} 3' in lines
+    assert 'tasks_http_request_duration_seconds_count{route="/tasks"} 3' in lines
+    assert 'tasks_storage_duration_seconds_count{operation="save_tasks"} 1' in lines
+    assert 'tasks_count{state="open"} 7' in lines
@@ -0,0 +1,114 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+# Переменные окружения, которыми включается профилирование без флагов main.py
+PROFILE_MS_ENV = "TASKS_PROFILE_MS"
+PROFILE_DIR_ENV = "TASKS_PROFILE_DIR"
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+# Выборочный профилировщик запросов: пока запрос обрабатывается, отдельный поток раз в interval
+# снимает стек потока обработчика. Если запрос оказался медленнее порога, стеки сохраняются
+# в свернутом формате (flamegraph.pl, speedscope), а сведения о запросе - в slow_requests.jsonl
+class RequestProfiler:
+    def __init__(self, threshold_ms, out_dir="profiles", interval=0.001):
+        self._threshold = threshold_ms / 1000
+        self._out_dir = Path(out_dir)
+        self._interval = interval
+        # id потока -> счетчик стеков текущего запроса в этом потоке
+        self._active = {}
+        self._lock = threading.Lock()
+        self._has_active = threading.Event()
+        self._sampler = None
+
+    @staticmethod
+    def from_env():
+        # Профилировщик, если задан TASKS_PROFILE_MS, иначе None
+        threshold = os.environ.get(PROFILE_MS_ENV)
+        if not threshold:
+            return None
+        return RequestProfiler(float(threshold), os.environ.get(PROFILE_DIR_ENV, "profiles"))
+
+    def start(self):
+        # Начало запроса в текущем потоке, возвращает данные для finish
+        token = time.perf_counter(), Counter()
+        self.attach(token)
+        return token
+
+    def attach(self, token):
+        # Стеки текущего потока относятся к запросу token до detach. Потоковый ответ
+        # кодируется кусками уже после обработчика и, возможно, в других потоках
+        with self._lock:
+            self._active[threading.get_ident()] = token[1]
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._sampler.start()
+        self._has_active.set()
+
+    def detach(self):
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+            if not self._active:
+                self._has_active.clear()
+
+    def finish(self, token, method, route, status, task_count):
+        started, samples = token
+        elapsed = time.perf_counter() - started
+        self.detach()
+
+        if elapsed >= self._threshold:
+            self._dump(method, route, status, task_count, elapsed, samples)
+        return elapsed
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            self._has_active.wait()
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None or thread_id == own_id:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_name(frame.f_code))
+                        frame = frame.f_back
+                    samples[";".join(reversed(stack))] += 1
+            del frames
+            time.sleep(self._interval)
+
+    def _dump(self, method, route, status, task_count, elapsed, samples):
+        self._out_dir.mkdir(parents=True, exist_ok=True)
+        elapsed_ms = elapsed * 1000
+        name = re.sub(r"[^A-Za-z0-9]+", "_", f"{method}{route}").strip("_")
+        stacks_path = self._out_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{elapsed_ms:.0f}ms-{id(samples):x}.folded"
+
+        # Метки запроса - корневые кадры стека, так их видно прямо на флейм-графе
+        tags = f"{method} {route};tasks={task_count}"
+        with stacks_path.open('w', encoding="utf-8") as f_write:
+            for stack, count in samples.most_common():
+                f_write.write(f"{tags};{stack} {count}\n")
+
+        trace = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "method": method,
+            "route": route,
+            "status": status,
+            "ms": round(elapsed_ms, 3),
+            "tasks": task_count,
+            "samples": sum(samples.values()),
+            "stacks": stacks_path.name,
+        }
+        with self._lock, (self._out_dir / "slow_requests.jsonl").open('a', encoding="utf-8") as f_write:
+            f_write.write(json.dumps(trace) + '\n')
+        print(f"slow request {method} {route} {elapsed_ms:.1f}ms, stacks in {stacks_path}")
@@ -0,0 +1,58 @@
+import json
+import time
+
+from services.profiling import RequestProfiler
+
+
+def slow_work(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_profiler_dumps_slow_request(tmp_path):
+    # Arrange
+    profiler = RequestProfiler(10, tmp_path)
+
+    # Act
+    token = profiler.start()
+    slow_work(0.05)
+    profiler.finish(token, "GET", "/tasks", 200, 42)
+
+    # Assert
+    traces = [json.loads(line) for line in (tmp_path / "slow_requests.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert len(traces) == 1
+    assert traces[0]["route"] == "/tasks"
+    assert traces[0]["tasks"] == 42
+    assert traces[0]["ms"] >= 50
+    assert traces[0]["samples"] > 0
+    stacks = (tmp_path / traces[0]["stacks"]).read_text(encoding="utf-8").splitlines()
+    assert all(line.startswith("GET /tasks;tasks=42;") for line in stacks)
+    assert any("slow_work" in line for line in stacks)
+
+
+def test_profiler_skips_fast_request(tmp_path):
+    # Arrange
+    profiler = RequestProfiler(1000, tmp_path)
+
+    # Act
+    token = profiler.start()
+    profiler.finish(token, "GET", "/tasks", 200, 0)
+
+    # Assert
+    assert not (tmp_path / "slow_requests.jsonl").exists()
+
+
+def test_profiler_from_env(monkeypatch, tmp_path):
+    # Arrange
+    monkeypatch.delenv("TASKS_PROFILE_MS", raising=False)
+    disabled = RequestProfiler.from_env()
+    monkeypatch.setenv("TASKS_PROFILE_MS", "25")
+    monkeypatch.setenv("TASKS_PROFILE_DIR", str(tmp_path))
+
+    # Act
+    profiler = RequestProfiler.from_env()
+
+    # Assert
+    assert disabled is None
+    assert profiler._threshold == 0.025
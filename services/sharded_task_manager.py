@@ -0,0 +1,219 @@
+import heapq
+import threading
+import time
+from itertools import islice
+
+from models.priority import Priority
+from services.change_feed import ChangeFeed
+from services.task_manager import SORT_ORDERS, TaskManager
+
+
+# Задачи всех шардов по id без копирования: представления шардов сливаются при каждом обходе.
+# Длины шардов запоминаются при создании, задачи, добавленные позже, в обход не попадут,
+# иначе новая задача одного шарда могла бы встать раньше уже существующих задач другого
+class MergedTasksView:
+    __slots__ = ("_views", "_counts")
+
+    def __init__(self, views):
+        self._views = views
+        self._counts = [len(view) for view in views]
+
+    def __len__(self):
+        return sum(self._counts)
+
+    def __iter__(self):
+        return heapq.merge(*(islice(view, count) for view, count in zip(self._views, self._counts)),
+                           key=lambda task: task.id)
+
+
+# Менеджер задач из K независимых TaskManager, у каждого свое хранилище и своя блокировка.
+# Id новых задач общие на все шарды и идут подряд, шард задачи определяется по ее id,
+# а списки собираются слиянием уже отсортированных списков шардов.
+# Интерфейс тот же, что у TaskManager, поэтому TaskAPI и серверы работают с ним без изменений
+class ShardedTaskManager:
+    def __init__(self, storages, metrics=None, id_block=1):
+        storages = list(storages)
+        if not storages:
+            raise ValueError("At least one storage is required")
+
+        # Блоки по id_block id подряд достаются шардам по кругу
+        self._id_block = id_block
+        # Лента изменений общая, чтобы у клиентов был один номер изменения на все шарды
+        self._changes = ChangeFeed()
+        self._shards = [TaskManager(storage, changes=self._changes) for storage in storages]
+        # Выдача id и запись задачи в шард идут под одной блокировкой, поэтому id растут в порядке
+        # создания, как у одного TaskManager: курсоры по id не пропускают новые задачи,
+        # а claim_next_task отдает задачи одного приоритета по очереди создания
+        self._add_lock = threading.Lock()
+        self._next_task_id = 1
+        # Выбор задачи для claim_next_task смотрит вершины всех шардов сразу
+        self._claim_lock = threading.Lock()
+
+        self._metrics = metrics
+        if metrics is not None:
+            metrics.gauge("tasks_count", {"state": "open"}, lambda: self.count_tasks(False))
+            metrics.gauge("tasks_count", {"state": "done"}, lambda: self.count_tasks(True))
+
+    @property
+    def shards(self):
+        return list(self._shards)
+
+    def _shard_for(self, task_id):
+        return self._shards[((task_id - 1) // self._id_block) % len(self._shards)]
+
+    # Вызывается под self._add_lock
+    def _append_task(self, title, priority):
+        task = self._shard_for(self._next_task_id).add_task(title, priority, self._next_task_id)
+        self._next_task_id += 1
+        return task
+
+    def add_task(self, title, priority):
+        TaskManager._validate(title, priority)
+        with self._add_lock:
+            return self._append_task(title, priority)
+
+    def add_tasks(self, items):
+        # Сначала проверяем всю пачку, чтобы не добавить ее половину.
+        # Задачи пачки расходятся по шардам, поэтому читатели могут увидеть ее частично
+        items = list(items)
+        for title, priority in items:
+            TaskManager._validate(title, priority)
+
+        with self._add_lock:
+            return [self._append_task(title, priority) for title, priority in items]
+
+    def get_task(self, task_id):
+        return self._shard_for(task_id).get_task(task_id)
+
+    def complete_task(self, task_id):
+        return self._shard_for(task_id).complete_task(task_id)
+
+    def complete_tasks(self, task_ids):
+        # Задачи не удаляются, поэтому после проверки всех id выполнение по шардам уже не упадет
+        missing = [task_id for task_id in task_ids if self.get_task(task_id) is None]
+        if missing:
+            return missing
+
+        groups = {}
+        for task_id in task_ids:
+            groups.setdefault(self._shard_for(task_id), []).append(task_id)
+        for shard, group in groups.items():
+            shard.complete_tasks(group)
+        return []
+
+    def claim_next_task(self):
+        # Выбираем шард с самой важной задачей на вершине и забираем задачу из него
+        with self._claim_lock:
+            while True:
+                best = None
+                for shard in self._shards:
+                    key = shard.peek_next_key()
+                    if key is not None and (best is None or key < best[0]):
+                        best = (key, shard)
+                if best is None:
+                    return None
+                task = best[1].claim_next_task()
+                if task is not None:
+                    return task
+
+    def query_tasks(self, priority=None, is_done=None, sort="id", limit=None, cursor=None):
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"sort must be one of {SORT_ORDERS}, but got {sort}")
+
+        # Курсор известен только своему шарду, остальным передаем его приоритет
+        cursor_priority = None
+        if cursor is not None:
+            cursor_task = self.get_task(cursor)
+            if cursor_task is None:
+                raise ValueError(f"unknown cursor {cursor}")
+            cursor_priority = cursor_task.priority
+
+        # У каждого шарда берем на задачу больше страницы: иначе последняя задача страницы
+        # не покажет, остались ли задачи в других шардах
+        shard_limit = None if limit is None else limit + 1
+        results = [shard.query_tasks(priority, is_done, sort, shard_limit, cursor, cursor_priority)[0]
+                   for shard in self._shards]
+
+        if sort == "id":
+            key = lambda task: task.id
+        elif sort == "-id":
+            key = lambda task: -task.id
+        elif sort == "priority":
+            key = lambda task: (Priority[task.priority].value, task.id)
+        else:
+            key = lambda task: (-Priority[task.priority].value, task.id)
+        merged = heapq.merge(*results, key=key)
+        tasks = list(islice(merged, None if limit is None else limit + 1))
+
+        next_cursor = None
+        if limit is not None and len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = tasks[-1].id
+        return tasks, next_cursor
+
+    def search_tasks(self, text, priority=None, is_done=None, limit=None, cursor=None):
+        # Курсор - это id, поэтому каждый шард продолжает с него и без своей задачи-курсора.
+        # Как и в query_tasks, у шарда берем на задачу больше страницы
+        shard_limit = None if limit is None else limit + 1
+        results = [shard.search_tasks(text, priority, is_done, shard_limit, cursor)[0] for shard in self._shards]
+        tasks = list(islice(heapq.merge(*results, key=lambda task: task.id), None if limit is None else limit + 1))
+
+        next_cursor = None
+        if limit is not None and len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = tasks[-1].id
+        return tasks, next_cursor
+
+    def count_tasks(self, is_done=None):
+        return sum(shard.count_tasks(is_done) for shard in self._shards)
+
+    @property
+    def version(self):
+        # Версии шардов только растут, значит и сумма растет при любом изменении
+        return sum(shard.version for shard in self._shards)
+
+    @property
+    def changes_seq(self):
+        return self._changes.seq
+
+    @property
+    def changes_epoch(self):
+        return self._changes.epoch
+
+    def changes(self, since, timeout=0):
+        return self._changes.since(since, timeout)
+
+    def subscribe_changes(self, listener):
+        self._changes.subscribe(listener)
+
+    def unsubscribe_changes(self, listener):
+        self._changes.unsubscribe(listener)
+
+    @property
+    def tasks(self):
+        # Все задачи по id без копирования, шарды сливаются при обходе
+        return MergedTasksView([shard.tasks for shard in self._shards])
+
+    def save_tasks(self):
+        started = time.perf_counter()
+        for shard in self._shards:
+            shard.save_tasks()
+        if self._metrics is not None:
+            self._metrics.observe_operation("save_tasks", time.perf_counter() - started)
+
+    def close(self):
+        for shard in self._shards:
+            shard.close()
+
+    def restore_tasks(self, background=False):
+        started = time.perf_counter()
+        with self._add_lock:
+            for shard in self._shards:
+                shard.restore_tasks(background)
+            # Следующий id после максимального во всех шардах
+            self._next_task_id = max(shard.next_task_id for shard in self._shards)
+        if self._metrics is not None and not background:
+            self._metrics.observe_operation("restore_tasks", time.perf_counter() - started)
+
+    def wait_restored(self, timeout=None):
+        return all(shard.wait_restored(timeout) for shard in self._shards)
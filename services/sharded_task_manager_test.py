@@ -0,0 +1,240 @@
+import json
+import random
+import threading
+
+import pytest
+
+from api import task_api
+from api.task_api import TaskAPI
+from models.priority import Priority
+from services.sharded_task_manager import ShardedTaskManager
+from services.task_manager import TaskManager
+from storage.file_storage import FileStorage
+
+
+def make_manager(tmp_path, shards=3, id_block=1):
+    return ShardedTaskManager([FileStorage(tmp_path / f"test.{i}.txt") for i in range(shards)], id_block=id_block)
+
+
+def test_sharded_add_spreads_tasks_across_shards(tmp_path):
+    # Arrange
+    task_manager = make_manager(tmp_path)
+
+    # Act
+    tasks = [task_manager.add_task(f"test{i}", Priority.low) for i in range(6)]
+
+    # Assert
+    assert sorted(task.id for task in tasks) == [1, 2, 3, 4, 5, 6]
+    assert [shard.count_tasks() for shard in task_manager.shards] == [2, 2, 2]
+    assert [task.id for task in task_manager.tasks] == [1, 2, 3, 4, 5, 6]
+    assert all(task_manager.get_task(task.id) is task for task in tasks)
+
+
+def test_sharded_complete_tasks_is_all_or_nothing(tmp_path):
+    # Arrange
+    task_manager = make_manager(tmp_path)
+    batch = task_manager.add_tasks([(f"test{i}", Priority.low) for i in range(3)])
+    singles = [task_manager.add_task(f"single{i}", Priority.high) for i in range(3)]
+    ids = [batch[0].id, singles[1].id, singles[2].id]
+
+    # Act
+    missing = task_manager.complete_tasks([batch[0].id, 99])
+    nothing_missing = task_manager.complete_tasks(ids)
+
+    # Assert
+    assert [task.id for task in batch] == [1, 2, 3]
+    assert missing == [99]
+    assert nothing_missing == []
+    assert [task.id for task in task_manager.tasks if task.is_done] == sorted(ids)
+    assert task_manager.count_tasks(True) == 3
+
+
+@pytest.mark.parametrize("sort", ["id", "-id", "priority", "-priority"])
+def test_sharded_query_pages_match_single_manager(tmp_path, sort):
+    # Arrange
+    sharded = make_manager(tmp_path, id_block=2)
+    single = TaskManager(FileStorage(tmp_path / "single.txt"))
+    priorities = list(Priority)
+    for i in range(20):
+        task = sharded.add_task(f"test{i}", priorities[i % 3])
+        single.add_task(f"test{i}", priorities[i % 3])
+        if i % 4 == 0:
+            sharded.complete_task(task.id)
+            single.complete_task(task.id)
+
+    def pages(task_manager):
+        ids, cursor = [], None
+        while True:
+            tasks, cursor = task_manager.query_tasks(is_done=False, sort=sort, limit=3, cursor=cursor)
+            ids.append([task.id for task in tasks])
+            if cursor is None:
+                return ids
+
+    # Act
+    sharded_pages = pages(sharded)
+    single_pages = pages(single)
+
+    # Assert
+    assert sharded_pages == single_pages
+    assert sum(len(page) for page in sharded_pages) == 15
+
+
+def test_sharded_query_walks_to_last_page(tmp_path):
+    # Arrange
+    task_manager = make_manager(tmp_path, id_block=4)
+    rng = random.Random(0)
+    for i in range(30):
+        task = task_manager.add_task(f"test{i}", rng.choice(list(Priority)))
+        if rng.random() < 0.3:
+            task_manager.complete_task(task.id)
+    expected = sorted((task for task in task_manager.tasks if task.priority == Priority.high.name and not task.is_done),
+                      key=lambda task: task.id)
+
+    # Act
+    ids, cursor = [], None
+    while True:
+        tasks, cursor = task_manager.query_tasks(Priority.high, False, "-priority", limit=1, cursor=cursor)
+        ids.extend(task.id for task in tasks)
+        if cursor is None:
+            break
+
+    # Assert
+    assert ids == [task.id for task in expected]
+
+
+def test_sharded_ids_grow_in_creation_order(tmp_path):
+    # Arrange
+    task_manager = make_manager(tmp_path, id_block=2)
+    first = [task_manager.add_task(f"test{i}", Priority.high) for i in range(3)]
+    _, cursor = task_manager.query_tasks(limit=3)
+    page, _ = task_manager.query_tasks(limit=3, cursor=first[-1].id)
+
+    # Act
+    later = [task_manager.add_task(f"later{i}", Priority.high) for i in range(3)]
+    next_page, _ = task_manager.query_tasks(limit=3, cursor=first[-1].id)
+    claimed = [task_manager.claim_next_task() for _ in range(6)]
+
+    # Assert
+    assert [task.id for task in first + later] == [1, 2, 3, 4, 5, 6]
+    assert page == [] and cursor is None
+    assert next_page == later
+    assert [task.title for task in claimed] == [task.title for task in first + later]
+
+
+def test_sharded_claim_next_task_is_global(tmp_path):
+    # Arrange
+    task_manager = make_manager(tmp_path)
+    task_manager.add_task("low", Priority.low)
+    task_manager.add_task("medium", Priority.medium)
+    task_manager.add_task("high1", Priority.high)
+    task_manager.add_task("high2", Priority.high)
+
+    # Act
+    claimed = [task_manager.claim_next_task() for _ in range(5)]
+
+    # Assert
+    assert [task.title for task in claimed[:4]] == ["high1", "high2", "medium", "low"]
+    assert claimed[4] is None
+
+
+def test_sharded_save_and_restore(tmp_path):
+    # Arrange
+    task_manager = make_manager(tmp_path)
+    task_manager.add_tasks([(f"test{i}", Priority.medium) for i in range(4)])
+    for i in range(5):
+        task_manager.add_task(f"single{i}", Priority.low)
+    task_manager.complete_task(6)
+    task_manager.save_tasks()
+
+    # Act
+    restored = make_manager(tmp_path)
+    restored.restore_tasks()
+    new_tasks = [restored.add_task(f"new{i}", Priority.high) for i in range(3)]
+
+    # Assert
+    new_ids = {task.id for task in new_tasks}
+    assert [(task.id, task.title, task.is_done) for task in restored.tasks if task.id not in new_ids] == [
+        (task.id, task.title, task.is_done) for task in task_manager.tasks]
+    assert len({task.id for task in restored.tasks}) == 12
+    assert new_ids == {10, 11, 12}
+
+
+def test_sharded_concurrent_writers_get_unique_ids(tmp_path):
+    # Arrange
+    task_manager = make_manager(tmp_path, shards=4)
+    created = []
+
+    def writer(n):
+        for i in range(250):
+            created.append(task_manager.add_task(f"writer{n} {i}", Priority.low).id)
+
+    # Act
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Assert
+    assert len(set(created)) == 1000
+    assert task_manager.count_tasks() == 1000
+    assert task_manager.changes_seq == 1000
+
+
+def test_sharded_search_tasks(tmp_path):
+    # Arrange
+    task_manager = make_manager(tmp_path)
+    for i in range(9):
+        task_manager.add_task(f"{'alpha' if i % 2 else 'beta'} {i}", Priority.low)
+
+    # Act
+    first_page, cursor = task_manager.search_tasks("alp", limit=3)
+    second_page, last_cursor = task_manager.search_tasks("alp", limit=3, cursor=cursor)
+
+    # Assert
+    assert [task.title for task in first_page] == ["alpha 1", "alpha 3", "alpha 5"]
+    assert [task.title for task in second_page] == ["alpha 7"]
+    assert last_cursor is None
+
+
+def test_sharded_search_walks_to_last_page(tmp_path):
+    # Arrange
+    task_manager = make_manager(tmp_path, id_block=2)
+    for i in range(12):
+        task_manager.add_task(f"{'alpha' if i % 3 else 'beta'} {i}", Priority.low)
+    expected = [task.id for task in task_manager.tasks if task.title.startswith("alpha")]
+
+    # Act
+    pages, cursor = [], None
+    while True:
+        tasks, cursor = task_manager.search_tasks("alp", limit=1, cursor=cursor)
+        pages.append([task.id for task in tasks])
+        if cursor is None:
+            break
+
+    # Assert
+    assert [task_id for page in pages for task_id in page] == expected
+    assert all(len(page) == 1 for page in pages[:-1])
+
+
+def test_sharded_tasks_view_streams_without_copy(tmp_path, monkeypatch):
+    # Arrange
+    monkeypatch.setattr(task_api, "STREAM_MIN_TASKS", 5)
+    task_manager = make_manager(tmp_path, id_block=2)
+    task_manager.add_tasks([(f"batch{i}", Priority.low) for i in range(3)])
+    for i in range(4):
+        task_manager.add_task(f"test{i}", Priority.high)
+    view = task_manager.tasks
+
+    # Act
+    task_manager.add_task("later", Priority.low)
+    viewed = [task.id for task in view]
+    response = TaskAPI(task_manager).dispatch("GET", "/tasks", {}, b"")
+    body = b"".join(response.payload)
+
+    # Assert
+    assert len(view) == 7
+    assert viewed == sorted(viewed) and len(viewed) == 7
+    assert not isinstance(response.payload, bytes)
+    assert [task["id"] for task in json.loads(body)] == [task.id for task in task_manager.tasks]
+    assert len(json.loads(body)) == 8
@@ -1,50 +1,401 @@
+import heapq
+import threading
+import time
+from collections.abc import Sequence
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+
 from models.priority import Priority
 from models.task import Task
+from services.change_feed import ChangeFeed
+from services.title_index import TitleIndex
 from storage.abstract_storage import AbstractStorage
 
+# Сколько задач фоновая загрузка добавляет за один захват блокировки
+RESTORE_BATCH = 1000
+
+# Допустимые сортировки в query_tasks, минус - в обратном порядке
+SORT_ORDERS = ("id", "-id", "priority", "-priority")
+
+
+# Номера задач из отсортированного списка после курсора, в нужном направлении
+def _ids_after(ids, cursor, descending):
+    if descending:
+        end = bisect_left(ids, cursor) if cursor is not None else len(ids)
+        return (ids[i] for i in range(end - 1, -1, -1))
+    start = bisect_right(ids, cursor) if cursor is not None else 0
+    return (ids[i] for i in range(start, len(ids)))
+
+
+# Представление списка задач только для чтения, без копирования.
+# Новые задачи видны сразу, изменить сам список через него нельзя
+class TasksView(Sequence):
+    __slots__ = ("_tasks",)
+
+    def __init__(self, tasks):
+        self._tasks = tasks
+
+    def __getitem__(self, index):
+        return self._tasks[index]
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __iter__(self):
+        return iter(self._tasks)
+
 
 # Класс для управления список задач
 class TaskManager:
-    def __init__(self, storage):
+    # changes - общая лента изменений нескольких менеджеров (см. ShardedTaskManager)
+    def __init__(self, storage, metrics=None, changes=None):
         # Проверка на тип хранилища
         if not isinstance(storage, AbstractStorage):
             raise TypeError("storage must be an instance of AbstractStorage")
 
         self._tasks = []
+        # Индекс задач по id, чтобы не искать задачу перебором списка
+        self._tasks_by_id = {}
+        # Вторичный индекс: (приоритет, выполнена ли) -> отсортированный список id
+        self._index = {}
+        # Очередь невыполненных задач: куча (-приоритет, id), сверху самая важная и старая.
+        # Выполненные другим путем задачи не удаляются из кучи, а пропускаются при извлечении
+        self._queue = []
+        # Поиск по словам названий для GET /tasks?q=
+        self._title_index = TitleIndex()
         self._next_task_id = 1
+        # Номер версии списка, растет после каждого изменения (для кэша ответов)
+        self._version = 0
+        # Лента созданий и выполнений для GET /tasks/changes
+        self._changes = changes or ChangeFeed()
         self._storage = storage
+        # Блокировка на изменения, чтобы при многопоточном сервере не выдать один id дважды
+        self._lock = threading.RLock()
+        # Отдельная блокировка на сохранение: запись на диск не держит изменения,
+        # но два сохранения не пишут файл одновременно
+        self._save_lock = threading.Lock()
+        # Сброшено, пока задачи загружаются из хранилища в фоне
+        self._restored = threading.Event()
+        self._restored.set()
+
+        # Время сохранения и восстановления и число задач для GET /metrics
+        self._metrics = metrics
+        if metrics is not None:
+            metrics.gauge("tasks_count", {"state": "open"}, lambda: self.count_tasks(False))
+            metrics.gauge("tasks_count", {"state": "done"}, lambda: self.count_tasks(True))
 
-    # Добавление задачи в список
-    def add_task(self, title, priority):
+    @staticmethod
+    def _validate(title, priority):
         if not title or not isinstance(title, str):
             raise ValueError("Title must be a non-empty string")
         if not isinstance(priority, Priority):
             raise TypeError("Priority must be a Priority enum")
 
-        task = Task(title, priority, False, self._next_task_id)
+    # Вызывается под self._lock
+    def _append_task(self, title, priority, task_id=None):
+        task = Task(title, priority, False, task_id or self._next_task_id)
         self._tasks.append(task)
-        self._next_task_id += 1
+        self._tasks_by_id[task.id] = task
+        self._index_add(task)
+        self._queue_push(task)
+        self._title_index.add(task)
+        self._next_task_id = max(self._next_task_id, task.id + 1)
+        self._storage.insert_task(task)
+        self._version += 1
+        self._changes.append("created", task)
         return task
 
+    # Добавление задачи в список. task_id задает ShardedTaskManager, он больше всех id этого менеджера
+    def add_task(self, title, priority, task_id=None):
+        self._validate(title, priority)
+
+        with self._lock:
+            return self._append_task(title, priority, task_id)
+
+    # Добавление нескольких задач: сначала проверяем все, чтобы не добавить половину пачки
+    def add_tasks(self, items):
+        items = list(items)
+        for title, priority in items:
+            self._validate(title, priority)
+
+        with self._lock:
+            return [self._append_task(title, priority) for title, priority in items]
+
+    def _index_add(self, task):
+        insort(self._index.setdefault((task.priority, task.is_done), []), task.id)
+
+    def _queue_push(self, task):
+        if not task.is_done:
+            heapq.heappush(self._queue, (-Priority[task.priority].value, task.id))
+
+    def _index_remove(self, task):
+        ids = self._index[(task.priority, task.is_done)]
+        del ids[bisect_left(ids, task.id)]
+
+    # Выборка задач с фильтрами и постраничной выдачей по индексу, без прохода по всему списку.
+    # cursor - id последней задачи с прошлой страницы, возвращаем (задачи, курсор следующей страницы).
+    # cursor_priority - приоритет задачи-курсора, если она хранится в другом шарде
+    def query_tasks(self, priority=None, is_done=None, sort="id", limit=None, cursor=None, cursor_priority=None):
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"sort must be one of {SORT_ORDERS}, but got {sort}")
+        if priority is not None and not isinstance(priority, Priority):
+            raise TypeError("Priority must be a Priority enum")
+
+        if self._storage.indexed:
+            # Выборка по индексам хранилища: изменения пишутся в него под self._lock, поэтому
+            # оно не отстает от памяти и отвечает полностью еще до конца фоновой загрузки.
+            # Задачи, которые уже есть в памяти, отдаем теми же объектами
+            tasks, next_cursor = self._storage.query(priority, is_done, sort, limit, cursor, cursor_priority)
+            return [self._tasks_by_id.get(task.id, task) for task in tasks], next_cursor
+
+        states = [False, True] if is_done is None else [is_done]
+        priorities = list(Priority) if priority is None else [priority]
+        descending = sort.startswith("-")
+        if cursor is not None and cursor_priority is None:
+            self._wait_for(cursor)
+
+        with self._lock:
+            if cursor is not None and cursor_priority is None:
+                cursor_task = self._tasks_by_id.get(cursor)
+                if cursor_task is None:
+                    raise ValueError(f"unknown cursor {cursor}")
+                cursor_priority = cursor_task.priority
+
+            if sort.endswith("priority"):
+                # Сначала группы по приоритету, внутри группы по id в порядке создания
+                order = sorted(priorities, key=lambda p: p.value, reverse=descending)
+                if cursor is not None:
+                    # Продолжаем с группы приоритета задачи-курсора
+                    names = [p.name for p in order]
+                    if cursor_priority not in names:
+                        raise ValueError(f"cursor {cursor} does not match priority filter")
+                    order = order[names.index(cursor_priority):]
+                groups = [[p] for p in order]
+                id_descending = False
+            else:
+                groups = [priorities]
+                id_descending = descending
+
+            selected = []
+            for i, group in enumerate(groups):
+                # Курсор действует только в первой группе, следующие читаем с начала
+                group_cursor = cursor if i == 0 else None
+                sources = [_ids_after(self._index.get((p.name, state), []), group_cursor, id_descending)
+                           for p in group for state in states]
+                merged = heapq.merge(*sources, reverse=id_descending)
+                remaining = None if limit is None else limit + 1 - len(selected)
+                selected.extend(islice(merged, remaining))
+                if limit is not None and len(selected) > limit:
+                    break
+
+            tasks = [self._tasks_by_id[task_id] for task_id in selected]
+
+        next_cursor = None
+        if limit is not None and len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = tasks[-1].id
+        return tasks, next_cursor
+
+    # Поиск задач по началам слов названия с фильтрами, по возрастанию id, постранично как query_tasks
+    def search_tasks(self, text, priority=None, is_done=None, limit=None, cursor=None):
+        if priority is not None and not isinstance(priority, Priority):
+            raise TypeError("Priority must be a Priority enum")
+        # Поиск не должен пропустить еще не загруженные задачи
+        self._restored.wait()
+
+        with self._lock:
+            found = (self._tasks_by_id[task_id]
+                     for task_id in self._title_index.search(text, lambda task_id: self._tasks_by_id[task_id].title,
+                                                             cursor))
+            found = (task for task in found
+                     if (priority is None or task.priority == priority.name)
+                     and (is_done is None or task.is_done == is_done))
+            tasks = list(islice(found, None if limit is None else limit + 1))
+
+        next_cursor = None
+        if limit is not None and len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = tasks[-1].id
+        return tasks, next_cursor
+
+    def count_tasks(self, is_done=None):
+        # Число задач по индексу, без прохода по списку
+        if is_done is None:
+            return len(self._tasks)
+        return sum(len(ids) for (priority, done), ids in list(self._index.items()) if done == is_done)
+
+    @property
+    def version(self):
+        # Увеличивается последним шагом изменения: все изменения до этой версии уже видны в задачах
+        return self._version
+
+    @property
+    def changes_seq(self):
+        # Номер последнего изменения, с него клиент может читать ленту после GET /tasks
+        return self._changes.seq
+
+    @property
+    def changes_epoch(self):
+        return self._changes.epoch
+
+    def changes(self, since, timeout=0):
+        # Изменения после номера since (список, возможно пустой) или None, если их уже не восстановить
+        return self._changes.since(since, timeout)
+
+    def subscribe_changes(self, listener):
+        # listener() зовется потоком, который изменил задачи, после каждого события ленты
+        self._changes.subscribe(listener)
+
+    def unsubscribe_changes(self, listener):
+        self._changes.unsubscribe(listener)
+
+    @property
+    def next_task_id(self):
+        # id следующей новой задачи, после загрузки - следующий за максимальным
+        return self._next_task_id
+
     @property
     def tasks(self):
-        # Возвращаем копию, чтобы не могли поменять наш список
-        return self._tasks.copy()
+        # Возвращаем представление без копирования, поменять наш список через него нельзя
+        return TasksView(self._tasks)
 
     def save_tasks(self):
-        self._storage.save_tasks(self._tasks)
+        # Пока задачи не дочитаны, сохранение перезаписало бы файл неполным списком
+        self._restored.wait()
+        # Хранилище само решает, нужно ли перезаписывать весь список
+        with self._save_lock:
+            started = time.perf_counter()
+            self._storage.checkpoint(self._tasks)
+            if self._metrics is not None:
+                self._metrics.observe_operation("save_tasks", time.perf_counter() - started)
+
+    def close(self):
+        # Даем хранилищу дописать отложенные изменения
+        self._restored.wait()
+        with self._save_lock:
+            self._storage.close()
 
-    def restore_tasks(self):
-        self._tasks = self._storage.restore_tasks()
-        if self._tasks:
-            # Присваиваем максимальный id + 1 для уникальности
-            self._next_task_id = max(task.id for task in self._tasks) + 1
+    # Вызывается под self._lock, задача уже есть в хранилище
+    def _load_task(self, task):
+        self._tasks.append(task)
+        self._tasks_by_id[task.id] = task
+        self._index_add(task)
+        self._queue_push(task)
+        self._title_index.add(task)
+        if task.id >= self._next_task_id:
+            # Присваиваем следующий за максимальным id для уникальности
+            self._next_task_id = task.id + 1
+
+    # background=True: если хранилище знает максимальный id, сразу возвращаемся и
+    # дочитываем задачи в отдельном потоке, новые задачи можно добавлять уже во время загрузки
+    def restore_tasks(self, background=False):
+        meta = self._storage.restore_meta() if background else None
+
+        started = time.perf_counter()
+        with self._save_lock, self._lock:
+            self._tasks = []
+            self._tasks_by_id = {}
+            self._index = {}
+            self._queue = []
+            self._title_index = TitleIndex()
+            self._next_task_id = 1
+
+            if meta is None:
+                # Один проход по задачам из хранилища, без отдельного поиска максимального id
+                for task in self._storage.iter_tasks():
+                    self._load_task(task)
+                self._version += 1
+                if self._metrics is not None:
+                    self._metrics.observe_operation("restore_tasks", time.perf_counter() - started)
+                return
+
+            self._next_task_id = meta["maxId"] + 1
+            self._restored.clear()
+
+        threading.Thread(target=self._load_in_background, args=(started,), name="restore", daemon=True).start()
+
+    def _load_in_background(self, started):
+        try:
+            tasks = self._storage.iter_tasks()
+            while True:
+                batch = list(islice(tasks, RESTORE_BATCH))
+                if not batch:
+                    break
+                with self._lock:
+                    for task in batch:
+                        self._load_task(task)
+                    self._version += 1
+            if self._metrics is not None:
+                self._metrics.observe_operation("restore_tasks", time.perf_counter() - started)
+        except Exception as e:
+            print(f"background restore error: {e}")
+        finally:
+            self._restored.set()
+
+    def wait_restored(self, timeout=None):
+        return self._restored.wait(timeout)
+
+    def _wait_for(self, task_id):
+        # При фоновой загрузке задача может быть еще не прочитана
+        if task_id not in self._tasks_by_id and not self._restored.is_set():
+            self._restored.wait()
+
+    def get_task(self, task_id):
+        # Задача по id или None, если такой нет
+        self._wait_for(task_id)
+        return self._tasks_by_id.get(task_id)
+
+    # Вызывается под self._lock
+    def _complete(self, task):
+        if not task.is_done:
+            self._index_remove(task)
+            task.complete()
+            self._index_add(task)
+            self._version += 1
+            self._changes.append("completed", task)
+        self._storage.update_task(task)
 
     def complete_task(self, task_id):
         # Поиск задачи, если нашли и выполнили, то True, иначе False
-        for task in self._tasks:
-            if task.id == task_id:
-                task.complete()
-                return True
+        self._wait_for(task_id)
+        with self._lock:
+            task = self._tasks_by_id.get(task_id)
+            if task is None:
+                return False
+
+            self._complete(task)
+        return True
+
+    def complete_tasks(self, task_ids):
+        # Выполняем все задачи или ни одной: возвращаем id, которых нет (пустой список - успех)
+        for task_id in task_ids:
+            self._wait_for(task_id)
+        with self._lock:
+            missing = [task_id for task_id in task_ids if task_id not in self._tasks_by_id]
+            if missing:
+                return missing
+
+            for task_id in task_ids:
+                self._complete(self._tasks_by_id[task_id])
+        return []
+
+    def peek_next_key(self):
+        # (-приоритет, id) задачи, которую выдаст claim_next_task, или None
+        self._restored.wait()
+        with self._lock:
+            while self._queue and self._tasks_by_id[self._queue[0][1]].is_done:
+                heapq.heappop(self._queue)
+            return self._queue[0] if self._queue else None
 
-        return False
+    def claim_next_task(self):
+        # Выполняем и возвращаем самую важную из самых старых открытых задач, None - открытых нет.
+        # При фоновой загрузке ждем все задачи, иначе можно взять не самую важную
+        self._restored.wait()
+        with self._lock:
+            while self._queue:
+                _, task_id = heapq.heappop(self._queue)
+                task = self._tasks_by_id[task_id]
+                if not task.is_done:
+                    self._complete(task)
+                    return task
+        return None
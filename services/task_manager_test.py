@@ -1,9 +1,13 @@
+import threading
+
 import pytest
 
 from models.priority import Priority
 from models.task import Task
 from services.task_manager import TaskManager
 from storage.file_storage import FileStorage
+from storage.log_storage import LogStorage
+from storage.sqlite_storage import SQLiteStorage
 
 
 def test_task_manager_add_task_is_valid(tmp_path):
@@ -39,3 +43,341 @@ def test_task_manager_complete_task_is_valid(tmp_path):
 
 
 
+def test_task_manager_log_storage_restores_without_save(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(LogStorage(file_path))
+    task_manager.add_task("test1", Priority.low)
+    task_manager.add_task("test2", Priority.high)
+    task_manager.complete_task(2)
+
+    # Act
+    # Изменения попадают в журнал сразу, без полного сохранения
+    restored_manager = TaskManager(LogStorage(file_path))
+    restored_manager.restore_tasks()
+
+    # Assert
+    assert len(restored_manager.tasks) == 2
+    assert restored_manager.tasks[1].is_done == True
+    assert restored_manager.add_task("test3", Priority.medium).id == 3
+
+def test_task_manager_get_task_is_valid(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    storage = FileStorage(file_path)
+    task_manager = TaskManager(storage)
+    task_manager.add_task("test1", Priority.low)
+    task_manager.add_task("test2", Priority.high)
+
+    # Act
+    task = task_manager.get_task(2)
+    missing = task_manager.get_task(3)
+
+    # Assert
+    assert task.title == "test2"
+    assert missing is None
+
+def test_task_manager_get_task_after_restore(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    storage = FileStorage(file_path)
+    task_manager = TaskManager(storage)
+    task_manager.add_task("test1", Priority.low)
+    task_manager.save_tasks()
+    restored_manager = TaskManager(FileStorage(file_path))
+    restored_manager.restore_tasks()
+
+    # Act
+    result = restored_manager.complete_task(1)
+
+    # Assert
+    assert result == True
+    assert restored_manager.get_task(1).is_done == True
+
+def test_task_manager_concurrent_add_task_unique_ids(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(FileStorage(file_path))
+
+    def add_many():
+        for i in range(500):
+            task_manager.add_task(f"test{i}", Priority.medium)
+
+    threads = [threading.Thread(target=add_many) for _ in range(8)]
+
+    # Act
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Assert
+    ids = [task.id for task in task_manager.tasks]
+    assert sorted(ids) == list(range(1, 4001))
+
+def test_task_manager_query_tasks_filters(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(FileStorage(file_path))
+    for i, priority in enumerate([Priority.low, Priority.high, Priority.high, Priority.medium, Priority.high]):
+        task_manager.add_task(f"test{i}", priority)
+    task_manager.complete_task(3)
+
+    # Act
+    high_open, _ = task_manager.query_tasks(priority=Priority.high, is_done=False)
+    done, _ = task_manager.query_tasks(is_done=True)
+    by_priority, _ = task_manager.query_tasks(sort="-priority")
+
+    # Assert
+    assert [task.id for task in high_open] == [2, 5]
+    assert [task.id for task in done] == [3]
+    assert [task.id for task in by_priority] == [2, 3, 5, 4, 1]
+
+def test_task_manager_query_tasks_pages(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(FileStorage(file_path))
+    for i in range(10):
+        task_manager.add_task(f"test{i}", Priority.low if i % 2 else Priority.high)
+
+    # Act
+    pages = []
+    cursor = None
+    while True:
+        tasks, cursor = task_manager.query_tasks(sort="priority", limit=3, cursor=cursor)
+        pages.append([task.id for task in tasks])
+        if cursor is None:
+            break
+    reversed_page, _ = task_manager.query_tasks(sort="-id", limit=4, cursor=8)
+
+    # Assert
+    assert pages == [[2, 4, 6], [8, 10, 1], [3, 5, 7], [9]]
+    assert [task.id for task in reversed_page] == [7, 6, 5, 4]
+
+def test_task_manager_query_tasks_after_restore(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(FileStorage(file_path))
+    task_manager.add_task("test1", Priority.medium)
+    task_manager.add_task("test2", Priority.medium)
+    task_manager.complete_task(1)
+    task_manager.save_tasks()
+    restored_manager = TaskManager(FileStorage(file_path))
+    restored_manager.restore_tasks()
+
+    # Act
+    tasks, _ = restored_manager.query_tasks(priority=Priority.medium, is_done=False)
+
+    # Assert
+    assert [task.id for task in tasks] == [2]
+    with pytest.raises(ValueError):
+        restored_manager.query_tasks(sort="title")
+
+def test_task_manager_tasks_view_is_read_only(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(FileStorage(file_path))
+    task_manager.add_task("test1", Priority.low)
+    view = task_manager.tasks
+
+    # Act
+    task_manager.add_task("test2", Priority.low)
+
+    # Assert
+    # Представление видит новые задачи, но менять список через него нельзя
+    assert len(view) == 2
+    assert [task.id for task in view] == [1, 2]
+    assert view[-1].title == "test2"
+    assert not hasattr(view, "append")
+
+def test_task_manager_add_tasks_is_valid(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(FileStorage(file_path))
+    task_manager.add_task("test1", Priority.low)
+
+    # Act
+    tasks = task_manager.add_tasks([("test2", Priority.high), ("test3", Priority.medium)])
+
+    # Assert
+    assert [task.id for task in tasks] == [2, 3]
+    assert len(task_manager.tasks) == 3
+
+def test_task_manager_add_tasks_invalid_adds_nothing(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(FileStorage(file_path))
+
+    # Act
+    with pytest.raises(ValueError):
+        task_manager.add_tasks([("test1", Priority.high), ("", Priority.low)])
+
+    # Assert
+    assert len(task_manager.tasks) == 0
+
+def test_task_manager_complete_tasks_is_all_or_nothing(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(FileStorage(file_path))
+    task_manager.add_tasks([("test1", Priority.high), ("test2", Priority.low)])
+
+    # Act
+    missing = task_manager.complete_tasks([1, 5])
+    completed = task_manager.complete_tasks([1, 2])
+
+    # Assert
+    assert missing == [5]
+    assert completed == []
+    assert all(task.is_done for task in task_manager.tasks)
+
+# Файловое хранилище, которое отдает задачи только после сигнала
+class GatedStorage(FileStorage):
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self.gate = threading.Event()
+
+    def iter_tasks(self):
+        for task in super().iter_tasks():
+            self.gate.wait()
+            yield task
+
+def test_task_manager_background_restore(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(FileStorage(file_path))
+    task_manager.add_tasks([("test1", Priority.low), ("test2", Priority.high)])
+    task_manager.save_tasks()
+    storage = GatedStorage(file_path)
+    restored_manager = TaskManager(storage)
+
+    # Act
+    # Задачи еще не прочитаны, но новые уже можно добавлять с правильным id
+    restored_manager.restore_tasks(background=True)
+    new_task = restored_manager.add_task("test3", Priority.medium)
+    loaded_early = len(restored_manager.tasks)
+    storage.gate.set()
+    completed = restored_manager.complete_task(2)
+    restored_manager.wait_restored()
+
+    # Assert
+    assert new_task.id == 3
+    assert loaded_early == 1
+    assert completed == True
+    assert sorted(task.id for task in restored_manager.tasks) == [1, 2, 3]
+    assert restored_manager.get_task(2).is_done == True
+
+def test_task_manager_background_restore_without_meta(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    with open(file_path, 'w', encoding='utf-8') as f_write:
+        f_write.write('{"title": "test1", "priority": "low", "isDone": false, "id": 4}\n')
+    task_manager = TaskManager(FileStorage(file_path))
+
+    # Act
+    # Без файла сведений загрузка идет сразу, иначе не узнать следующий id
+    task_manager.restore_tasks(background=True)
+
+    # Assert
+    assert len(task_manager.tasks) == 1
+    assert task_manager.add_task("test2", Priority.low).id == 5
+
+def test_task_manager_sqlite_storage_writes_rows(tmp_path):
+    # Arrange
+    db_path = tmp_path / "test.db"
+    task_manager = TaskManager(SQLiteStorage(db_path))
+
+    # Act
+    # Изменения пишутся построчно, save_tasks ничего не перезаписывает
+    task_manager.add_task("test1", Priority.low)
+    task_manager.add_task("test2", Priority.high)
+    task_manager.complete_task(1)
+    task_manager.save_tasks()
+    task_manager.close()
+    restored_manager = TaskManager(SQLiteStorage(db_path))
+    restored_manager.restore_tasks()
+
+    # Assert
+    assert [task.id for task in restored_manager.tasks] == [1, 2]
+    assert restored_manager.get_task(1).is_done == True
+
+def test_task_manager_claim_next_task_order(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    storage = FileStorage(file_path)
+    task_manager = TaskManager(storage)
+    task_manager.add_tasks([("low", Priority.low), ("high1", Priority.high), ("medium", Priority.medium),
+                            ("high2", Priority.high), ("high3", Priority.high)])
+    task_manager.complete_task(2)
+
+    # Act
+    claimed = [task_manager.claim_next_task() for _ in range(5)]
+
+    # Assert
+    assert [task.title for task in claimed[:4]] == ["high2", "high3", "medium", "low"]
+    assert claimed[4] is None
+    assert all(task.is_done for task in task_manager.tasks)
+
+def test_task_manager_claim_next_task_after_restore(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(FileStorage(file_path))
+    task_manager.add_tasks([("medium", Priority.medium), ("high", Priority.high), ("done", Priority.high)])
+    task_manager.complete_task(3)
+    task_manager.save_tasks()
+    restored = TaskManager(FileStorage(file_path))
+    restored.restore_tasks()
+
+    # Act
+    task = restored.claim_next_task()
+
+    # Assert
+    assert task.title == "high"
+    assert restored.get_task(2).is_done
+
+def test_task_manager_claim_next_task_unique_across_threads(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(FileStorage(file_path))
+    task_manager.add_tasks([(f"test{i}", Priority.low) for i in range(200)])
+    claimed = []
+
+    def worker():
+        while (task := task_manager.claim_next_task()) is not None:
+            claimed.append(task.id)
+
+    # Act
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Assert
+    assert sorted(claimed) == list(range(1, 201))
+
+def test_task_manager_search_tasks(tmp_path):
+    # Arrange
+    file_path = tmp_path / "test.txt"
+    task_manager = TaskManager(FileStorage(file_path))
+    task_manager.add_tasks([("Deploy backend", Priority.high), ("Review backend PR", Priority.low),
+                            ("Deploy frontend", Priority.high), ("Write docs", Priority.low)])
+    task_manager.complete_task(1)
+    task_manager.save_tasks()
+    restored = TaskManager(FileStorage(file_path))
+    restored.restore_tasks()
+
+    # Act
+    deploy = restored.search_tasks("depl")
+    open_deploy = restored.search_tasks("depl", is_done=False)
+    low_backend = restored.search_tasks("back", priority=Priority.low)
+    first_page = restored.search_tasks("d", limit=2)
+    second_page = restored.search_tasks("d", limit=2, cursor=first_page[1])
+
+    # Assert
+    assert [task.id for task in deploy[0]] == [1, 3]
+    assert [task.id for task in open_deploy[0]] == [3]
+    assert [task.id for task in low_backend[0]] == [2]
+    assert [task.id for task in first_page[0]] == [1, 3]
+    assert first_page[1] == 3
+    assert [task.id for task in second_page[0]] == [4]
+    assert second_page[1] is None
@@ -0,0 +1,85 @@
+import heapq
+import re
+from bisect import bisect_left, bisect_right, insort
+
+# Слова названия: буквы и цифры любого алфавита
+TOKEN_RE = re.compile(r"\w+")
+# Сколько новых слов копим до слияния с отсортированным словарем
+PENDING_LIMIT = 1024
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+# Инвертированный индекс по словам названий: слово -> отсортированный список id задач.
+# Словарь слов хранится отсортированным, чтобы слова с нужным префиксом находились бинарным поиском.
+# Новые слова сначала попадают в небольшой несортированный список и сливаются со словарем пачкой,
+# иначе каждая вставка в середину словаря из миллиона слов сдвигала бы его целиком
+class TitleIndex:
+    def __init__(self):
+        self._postings = {}
+        self._tokens = []
+        self._pending = []
+
+    def add(self, task):
+        task_id = task.id
+        for token in set(tokenize(task.title)):
+            ids = self._postings.get(token)
+            if ids is None:
+                self._postings[token] = [task_id]
+                self._pending.append(token)
+                if len(self._pending) >= PENDING_LIMIT:
+                    self._merge_pending()
+            elif ids[-1] < task_id:
+                ids.append(task_id)
+            else:
+                insort(ids, task_id)
+
+    def _merge_pending(self):
+        # Два отсортированных куска timsort сливает за один проход
+        self._tokens = sorted(self._tokens + sorted(self._pending))
+        self._pending = []
+
+    def _expand(self, prefix):
+        # Все слова словаря, начинающиеся с prefix
+        start = bisect_left(self._tokens, prefix)
+        end = bisect_left(self._tokens, prefix + "\U0010ffff", start)
+        return self._tokens[start:end] + [token for token in self._pending if token.startswith(prefix)]
+
+    def search(self, text, title_of, cursor=None):
+        # id задач по возрастанию (после cursor), в названии которых на каждое слово запроса
+        # есть слово с таким началом. title_of(id) - название задачи. Пустой запрос ничего не находит
+        prefixes = set(tokenize(text))
+        if not prefixes:
+            return iter(())
+
+        expansions = {prefix: self._expand(prefix) for prefix in prefixes}
+        # Перебираем id по самому редкому префиксу, остальные префиксы проверяем по названию задачи
+        driver = min(prefixes, key=lambda prefix: sum(len(self._postings[t]) for t in expansions[prefix]))
+        others = prefixes - {driver}
+        sources = [_ids_after(self._postings[token], cursor) for token in expansions[driver]]
+
+        found = _unique(heapq.merge(*sources))
+        if not others:
+            return found
+        return (task_id for task_id in found if _matches(tokenize(title_of(task_id)), others))
+
+
+# id из отсортированного списка после cursor, без копирования списка
+def _ids_after(ids, cursor):
+    start = bisect_right(ids, cursor) if cursor is not None else 0
+    return (ids[i] for i in range(start, len(ids)))
+
+
+def _matches(tokens, prefixes):
+    return all(any(token.startswith(prefix) for token in tokens) for prefix in prefixes)
+
+
+def _unique(ids):
+    # Одна задача может найтись по нескольким словам с одним префиксом
+    last = None
+    for task_id in ids:
+        if task_id != last:
+            yield task_id
+            last = task_id
@@ -0,0 +1,54 @@
+from models.priority import Priority
+from models.task import Task
+from services import title_index
+from services.title_index import TitleIndex, tokenize
+
+
+def make_index(titles):
+    tasks = {i: Task(title, Priority.low, False, i) for i, title in enumerate(titles, 1)}
+    index = TitleIndex()
+    for task in tasks.values():
+        index.add(task)
+    return index, lambda task_id: tasks[task_id].title
+
+
+def test_tokenize():
+    # Assert
+    assert tokenize("Fix the BUG-42, please!") == ["fix", "the", "bug", "42", "please"]
+    assert tokenize("Купить молоко") == ["купить", "молоко"]
+    assert tokenize(" ,.! ") == []
+
+
+def test_title_index_prefix_search():
+    # Arrange
+    index, title_of = make_index(["Buy milk", "buy bread and milk", "Call mom", "milkshake", "build"])
+
+    # Act
+    milk = list(index.search("milk", title_of))
+    bu_milk = list(index.search("mil bu", title_of))
+    nothing = list(index.search("tea", title_of))
+    empty = list(index.search("!!", title_of))
+    after_cursor = list(index.search("bu", title_of, cursor=1))
+
+    # Assert
+    assert milk == [1, 2, 4]
+    assert bu_milk == [1, 2]
+    assert nothing == []
+    assert empty == []
+    assert after_cursor == [2, 5]
+
+
+def test_title_index_merges_pending_tokens(monkeypatch):
+    # Arrange
+    monkeypatch.setattr(title_index, "PENDING_LIMIT", 4)
+    index, title_of = make_index([f"word{i} common" for i in range(10)])
+
+    # Act
+    found = list(index.search("word1", title_of))
+    common = list(index.search("comm", title_of))
+
+    # Assert
+    assert index._tokens == sorted(index._tokens)
+    assert len(index._pending) < 4
+    assert found == [2]
+    assert common == list(range(1, 11))
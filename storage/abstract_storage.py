@@ -1,8 +1,14 @@
 from abc import ABC, abstractmethod
 
+from models.priority import Priority
+
 
 # Абстрактный класс хранилища, чтобы можно было легко заменить на БД или что-либо ещё
 class AbstractStorage(ABC):
+    # Есть ли у хранилища индексы для query. Тогда TaskManager выполняет выборки GET /tasks
+    # запросом к хранилищу, а не по своему индексу в памяти
+    indexed = False
+
     @abstractmethod
     def save_tasks(self, tasks):
         pass
@@ -10,3 +16,78 @@ class AbstractStorage(ABC):
     @abstractmethod
     def restore_tasks(self):
         pass
+
+    # Задачи по одной, хранилища могут читать их потоково
+    def iter_tasks(self):
+        return iter(self.restore_tasks())
+
+    # Сведения о сохраненном списке {"maxId": ..., "count": ...} без чтения задач, если хранилище их знает
+    def restore_meta(self):
+        return None
+
+    # Выборка как у TaskManager.query_tasks: (задачи, курсор следующей страницы).
+    # Сортировка по приоритету - это выборки по id в каждой группе приоритета подряд
+    def query(self, priority=None, is_done=None, sort="id", limit=None, cursor=None, cursor_priority=None):
+        descending = sort.startswith("-")
+        if cursor is not None and cursor_priority is None:
+            cursor_priority = self.priority_of(cursor)
+            if cursor_priority is None:
+                raise ValueError(f"unknown cursor {cursor}")
+
+        if sort.endswith("priority"):
+            groups = sorted(list(Priority) if priority is None else [priority], key=lambda p: p.value,
+                            reverse=descending)
+            if cursor is not None:
+                # Продолжаем с группы приоритета задачи-курсора
+                names = [p.name for p in groups]
+                if cursor_priority not in names:
+                    raise ValueError(f"cursor {cursor} does not match priority filter")
+                groups = groups[names.index(cursor_priority):]
+            id_descending = False
+        else:
+            groups = [priority]
+            id_descending = descending
+
+        tasks = []
+        for i, group in enumerate(groups):
+            # Курсор действует только в первой группе, следующие читаем с начала
+            remaining = None if limit is None else limit + 1 - len(tasks)
+            tasks.extend(self.select(group, is_done, cursor if i == 0 else None, id_descending, remaining))
+            if limit is not None and len(tasks) > limit:
+                break
+
+        next_cursor = None
+        if limit is not None and len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = tasks[-1].id
+        return tasks, next_cursor
+
+    # Задачи с фильтрами по id после cursor (перед ним при descending), не больше limit.
+    # По умолчанию перебор всех задач, хранилища с индексами выполняют ее запросом
+    def select(self, priority, is_done, cursor, descending, limit):
+        tasks = [task for task in self.iter_tasks()
+                 if (priority is None or task.priority == priority.name)
+                 and (is_done is None or task.is_done == is_done)
+                 and (cursor is None or (task.id < cursor if descending else task.id > cursor))]
+        tasks.sort(key=lambda task: task.id, reverse=descending)
+        return tasks[:limit] if limit is not None else tasks
+
+    # Название приоритета задачи по id или None, если такой задачи нет
+    def priority_of(self, task_id):
+        return next((task.priority for task in self.iter_tasks() if task.id == task_id), None)
+
+    # Хуки для хранилищ, которые умеют сохранять изменения по одной записи.
+    # По умолчанию ничего не делают, такие хранилища сохраняются целиком через save_tasks
+    def insert_task(self, task):
+        pass
+
+    def update_task(self, task):
+        pass
+
+    # Сохранение после изменений, по умолчанию полностью перезаписываем список
+    def checkpoint(self, tasks):
+        self.save_tasks(tasks)
+
+    # Освобождение ресурсов и сохранение всего отложенного перед остановкой
+    def close(self):
+        pass
@@ -0,0 +1,41 @@
+from contextlib import contextmanager
+from pathlib import Path
+import os
+
+
+def fsync_dir(path):
+    # Сохраняем на диск саму запись о переименовании файла в каталоге (на Windows так нельзя)
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# Атомарная запись файла: пишем во временный файл рядом, сбрасываем на диск и подменяем.
+# При падении на любом шаге на месте остается либо старый файл целиком, либо новый целиком.
+# durable=False - без fsync: подмена останется атомарной, но после падения системы файл может
+# оказаться старым или пустым. Подходит для вспомогательных файлов, которые проверяются при чтении
+# и сбрасываются на диск вместе со следующей надежной записью в тот же каталог
+@contextmanager
+def atomic_write(path, binary=False, durable=True):
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        if binary:
+            f_write = tmp_path.open('wb')
+        else:
+            f_write = tmp_path.open('w', encoding="utf-8")
+        with f_write:
+            yield f_write
+            f_write.flush()
+            if durable:
+                os.fsync(f_write.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    if durable:
+        fsync_dir(path.parent)
@@ -0,0 +1,119 @@
+from storage.abstract_storage import AbstractStorage
+from storage.atomic_file import atomic_write
+from storage.file_storage import FileStorage
+from models.priority import Priority
+from models.task import Task
+from pathlib import Path
+import argparse
+import mmap
+import struct
+
+# Формат снимка:
+#   заголовок - сигнатура, версия формата, число задач, максимальный id;
+#   записи фиксированной длины - id, приоритет, выполнена ли, смещение и длина названия в символах;
+#   таблица строк - названия задач подряд, в UTF-8 одним блоком.
+#   Одиночные суррогаты в названиях (их пропускает json) пишутся как есть, через surrogatepass
+MAGIC = b"TSKB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHxxQQ")
+RECORD = struct.Struct("<qBBxxQI")
+
+# Приоритет по его числовому значению, без поиска по имени
+PRIORITIES = {priority.value: priority for priority in Priority}
+
+
+# Бинарное хранилище: читается через mmap без разбора json для каждой записи
+class BinaryStorage(AbstractStorage):
+    def __init__(self, file_path):
+        self._file_path = Path(file_path)
+
+    def save_tasks(self, tasks):
+        tasks = list(tasks)
+
+        buffer = bytearray(HEADER.size + RECORD.size * len(tasks))
+        HEADER.pack_into(buffer, 0, MAGIC, FORMAT_VERSION, len(tasks),
+                         max((task.id for task in tasks), default=0))
+        offset = 0
+        position = HEADER.size
+        for task in tasks:
+            RECORD.pack_into(buffer, position, task.id, Priority[task.priority].value,
+                             task.is_done, offset, len(task.title))
+            position += RECORD.size
+            offset += len(task.title)
+
+        # Пишем во временный файл и подменяем, чтобы читатели не увидели половину снимка
+        with atomic_write(self._file_path, binary=True) as f_write:
+            f_write.write(buffer)
+            f_write.write("".join(task.title for task in tasks).encode("utf-8", "surrogatepass"))
+
+    def _read_header(self, data):
+        # (число задач, максимальный id) или ValueError, если это не снимок или он обрезан
+        if len(data) < HEADER.size:
+            raise ValueError(f"{self._file_path} is not a binary tasks snapshot")
+        magic, version, count, max_id = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self._file_path} is not a binary tasks snapshot")
+        return count, max_id
+
+    def restore_meta(self):
+        if not self._file_path.exists():
+            return None
+
+        with self._file_path.open('rb') as f_read:
+            header = f_read.read(HEADER.size)
+        try:
+            count, max_id = self._read_header(header)
+        except ValueError:
+            # Пустой или чужой файл: пусть загрузка прочитает задачи и сообщит об ошибке сама
+            return None
+        return {"maxId": max_id, "count": count}
+
+    def iter_tasks(self):
+        # Проверка существования файла
+        if not self._file_path.exists():
+            print(f"restore file not found {self._file_path}")
+            return
+
+        # Пустой файл не отобразить в память, а заголовка в нем все равно нет
+        if self._file_path.stat().st_size == 0:
+            self._read_header(b"")
+
+        with self._file_path.open('rb') as f_read, \
+                mmap.mmap(f_read.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                memoryview(mm) as view:
+            count, _ = self._read_header(view)
+            strings = HEADER.size + RECORD.size * count
+            # Срезы memoryview читают отображение без копий. Таблицу строк декодируем один раз,
+            # названия - срезы по смещениям в символах
+            with view[strings:] as table:
+                titles = str(table, "utf-8", "surrogatepass")
+            with view[HEADER.size:strings] as records:
+                for task_id, priority, is_done, offset, length in RECORD.iter_unpack(records):
+                    yield Task(titles[offset:offset + length], PRIORITIES[priority], bool(is_done), task_id)
+
+    def restore_tasks(self):
+        return list(self.iter_tasks())
+
+
+# Перевод между текстовым форматом FileStorage и бинарным снимком:
+#   python -m storage.binary_storage to-binary tasks.txt tasks.bin
+#   python -m storage.binary_storage to-text tasks.bin tasks.txt
+def main():
+    parser = argparse.ArgumentParser(description="Convert tasks between text and binary snapshot formats")
+    parser.add_argument("command", choices=["to-binary", "to-text"])
+    parser.add_argument("source")
+    parser.add_argument("target")
+    args = parser.parse_args()
+
+    if args.command == "to-binary":
+        source, target = FileStorage(args.source), BinaryStorage(args.target)
+    else:
+        source, target = BinaryStorage(args.source), FileStorage(args.target)
+
+    tasks = source.restore_tasks()
+    target.save_tasks(tasks)
+    print(f"converted {len(tasks)} tasks from {args.source} to {args.target}")
+
+
+if __name__ == "__main__":
+    main()
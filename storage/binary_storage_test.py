@@ -0,0 +1,122 @@
+import sys
+
+import pytest
+
+from storage.binary_storage import BinaryStorage, main
+from storage.file_storage import FileStorage
+from models.priority import Priority
+from models.task import Task
+
+
+def test_binary_storage_round_trip(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.bin'
+    storage = BinaryStorage(file_path)
+    tasks = [
+        Task("test1", Priority.low, True, 1),
+        Task("задача 2", Priority.high, False, 2),
+        Task("", Priority.medium, False, 10),
+    ]
+
+    # Act
+    storage.save_tasks(tasks)
+    restored = BinaryStorage(file_path).restore_tasks()
+
+    # Assert
+    assert [(t.id, t.title, t.priority, t.is_done) for t in restored] == [
+        (1, "test1", "low", True),
+        (2, "задача 2", "high", False),
+        (10, "", "medium", False),
+    ]
+
+
+def test_binary_storage_restore_meta(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.bin'
+    storage = BinaryStorage(file_path)
+    missing_meta = storage.restore_meta()
+
+    # Act
+    storage.save_tasks([Task("test1", Priority.low, False, 4), Task("test2", Priority.low, False, 2)])
+
+    # Assert
+    assert missing_meta is None
+    assert storage.restore_meta() == {"maxId": 4, "count": 2}
+
+
+def test_binary_storage_restore_meta_of_broken_file(tmp_path):
+    # Arrange
+    empty_path = tmp_path / 'empty.bin'
+    empty_path.write_bytes(b"")
+    truncated_path = tmp_path / 'truncated.bin'
+    BinaryStorage(truncated_path).save_tasks([Task("test1", Priority.low, False, 1)])
+    truncated_path.write_bytes(truncated_path.read_bytes()[:10])
+
+    # Act
+    empty_meta = BinaryStorage(empty_path).restore_meta()
+    truncated_meta = BinaryStorage(truncated_path).restore_meta()
+
+    # Assert
+    assert empty_meta is None
+    assert truncated_meta is None
+    with pytest.raises(ValueError):
+        BinaryStorage(empty_path).restore_tasks()
+    with pytest.raises(ValueError):
+        BinaryStorage(truncated_path).restore_tasks()
+
+
+def test_binary_storage_keeps_lone_surrogates(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.bin'
+    tasks = [Task("a\ud800b", Priority.low, False, 1), Task("c", Priority.high, False, 2)]
+
+    # Act
+    BinaryStorage(file_path).save_tasks(tasks)
+    restored = BinaryStorage(file_path).restore_tasks()
+
+    # Assert
+    assert [task.title for task in restored] == ["a\ud800b", "c"]
+
+
+def test_binary_storage_iter_tasks_can_stop_early(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.bin'
+    BinaryStorage(file_path).save_tasks([Task(f"test{i}", Priority.low, False, i) for i in range(1, 4)])
+    tasks = BinaryStorage(file_path).iter_tasks()
+
+    # Act
+    first = next(tasks)
+    tasks.close()
+
+    # Assert
+    assert first.title == "test1"
+
+
+def test_binary_storage_rejects_other_format(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.bin'
+    FileStorage(file_path).save_tasks([Task("test1", Priority.low, False, 1)])
+
+    # Act
+    storage = BinaryStorage(file_path)
+
+    # Assert
+    with pytest.raises(ValueError):
+        storage.restore_tasks()
+
+
+def test_binary_storage_convert_tool(tmp_path, monkeypatch):
+    # Arrange
+    text_path = tmp_path / 'test.txt'
+    binary_path = tmp_path / 'test.bin'
+    back_path = tmp_path / 'back.txt'
+    FileStorage(text_path).save_tasks([Task("test1", Priority.high, True, 1), Task("test2", Priority.low, False, 2)])
+
+    # Act
+    monkeypatch.setattr(sys, "argv", ["binary_storage", "to-binary", str(text_path), str(binary_path)])
+    main()
+    monkeypatch.setattr(sys, "argv", ["binary_storage", "to-text", str(binary_path), str(back_path)])
+    main()
+
+    # Assert
+    assert back_path.read_text(encoding="utf-8") == text_path.read_text(encoding="utf-8")
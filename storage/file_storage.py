@@ -1,45 +1,117 @@
 from storage.abstract_storage import AbstractStorage
+from storage.atomic_file import atomic_write
+from models import codec
 from models.task import Task
 from pathlib import Path
 import json
 import os
+import zlib
+
+
+# Запись с контрольной суммой: json задачи, в конец которого добавлено поле crc от этого json.
+# Поле crc всегда последнее и фиксированной длины, поэтому проверка не требует повторного json.dumps
+CRC_PREFIX = ', "crc": "'
+CRC_SUFFIX_LENGTH = len(CRC_PREFIX) + 8 + 2
+
+
+def with_crc(body):
+    return f'{body[:-1]}{CRC_PREFIX}{zlib.crc32(body.encode("utf-8")):08x}"}}'
+
+
+# Разбор json-объекта с контрольной суммой, ValueError при несовпадении.
+# Строки без crc (из старых версий файла) принимаем как есть
+def parse_with_crc(line):
+    has_crc = line[-CRC_SUFFIX_LENGTH:-10] == CRC_PREFIX and line.endswith('"}')
+    if has_crc:
+        body = line[:-CRC_SUFFIX_LENGTH] + "}"
+        if f"{zlib.crc32(body.encode('utf-8')):08x}" != line[-10:-2]:
+            raise ValueError("checksum mismatch")
+
+    data = codec.loads(line)
+    if data.pop("crc", None) is not None and not has_crc:
+        raise ValueError("malformed checksum")
+    return data
+
+
+def encode_record(task):
+    return with_crc(codec.encode_task(task))
+
+
+def decode_record(line):
+    return Task.from_dict(parse_with_crc(line))
 
 
 # Класс файлового хранилища
 class FileStorage(AbstractStorage):
-    def __init__(self, file_path):
+    def __init__(self, file_path, quarantine=True):
         self._file_path = Path(file_path)
+        # Рядом с файлом храним максимальный id и число записей, чтобы не читать файл ради них
+        self._meta_path = Path(str(file_path) + ".meta")
+        # Поврежденные записи при восстановлении откладываем в отдельный файл
+        self._quarantine = quarantine
+        self._corrupt_path = Path(str(file_path) + ".corrupt")
+        # Номера строк и причины для поврежденных записей последнего восстановления
+        self.corrupt_records = []
 
     def save_tasks(self, tasks):
-        # Записываем записи формата json в файла
-        with self._file_path.open('w', encoding="utf-8") as f_write:
+        tasks = list(tasks)
+
+        # Сведения пишем до задач: если запись задач прервется, id из них все равно не выдадим повторно.
+        # Свой fsync им не нужен: подмену в каталоге сбросит на диск fsync каталога после записи задач,
+        # а оборванный после падения системы файл не разберется, и restore_meta вернет None.
+        # Так на сохранение приходится два fsync (файл задач и каталог), как у одной атомарной записи
+        meta = {"maxId": max((task.id for task in tasks), default=0), "count": len(tasks)}
+        with atomic_write(self._meta_path, durable=False) as f_write:
+            f_write.write(json.dumps(meta))
+
+        # Записываем записи формата json в файл, целиком подменяя старый
+        with atomic_write(self._file_path) as f_write:
             for task in tasks:
                 try:
-                    json_task = json.dumps(task.to_dict())
-                    f_write.write(json_task + '\n')
+                    f_write.write(encode_record(task) + '\n')
                 except Exception as e:
                     print(f"save parse error: {e} {task}")
 
-    def restore_tasks(self):
+    def restore_meta(self):
+        if not self._meta_path.exists() or not self._file_path.exists():
+            return None
+
+        try:
+            with self._meta_path.open('r', encoding="utf-8") as f_read:
+                meta = json.load(f_read)
+            return {"maxId": int(meta["maxId"]), "count": int(meta["count"])}
+        except Exception as e:
+            print(f"restore meta error: {e} {self._meta_path}")
+            return None
+
+    def _quarantine_record(self, line_number, line, reason):
+        self.corrupt_records.append((line_number, reason))
+        print(f"restore parse error: line {line_number}: {reason} {line}")
+        if self._quarantine:
+            with self._corrupt_path.open('a', encoding="utf-8") as f_corrupt:
+                f_corrupt.write(json.dumps({"line": line_number, "reason": reason, "record": line}) + '\n')
+
+    def iter_tasks(self):
+        self.corrupt_records = []
+
         # Проверка существования файла
         if not self._file_path.exists():
             print(f"restore file not found {self._file_path}")
-            return []
-
-        tasks = []
+            return
 
-        # Считываем записи формата json из файла
-        with self._file_path.open('r', encoding="utf-8") as f_read:
-            for line in f_read:
+        # Считываем записи формата json из файла по одной, не собирая весь список
+        with self._file_path.open('r', encoding="utf-8", errors="replace") as f_read:
+            for line_number, line in enumerate(f_read, start=1):
                 line = line.strip()
                 if not line:
                     continue
 
                 try:
-                    data_task = json.loads(line)
-                    task = Task.from_dict(data_task)
-                    tasks.append(task)
+                    task = decode_record(line)
                 except Exception as e:
-                    print(f"restore parse error: {e} {line}")
+                    self._quarantine_record(line_number, line, str(e))
+                    continue
+                yield task
 
-        return tasks
+    def restore_tasks(self):
+        return list(self.iter_tasks())
@@ -0,0 +1,211 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from storage.file_storage import FileStorage
+from storage.log_storage import LogStorage
+from models.priority import Priority
+from models.task import Task
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+# Имитация падения процесса: BaseException, чтобы ее не перехватили обработчики ошибок
+class Crash(BaseException):
+    pass
+
+
+def make_tasks(count, is_done):
+    return [Task(f"test{i}", Priority.high, is_done, i) for i in range(1, count + 1)]
+
+
+def state(tasks):
+    return [(task.id, task.title, task.is_done) for task in tasks]
+
+
+@pytest.mark.parametrize("kill_point", ["write", "fsync", "replace", "fsync_dir"])
+def test_save_crash_keeps_old_or_new_file(tmp_path, monkeypatch, kill_point):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    old_tasks = make_tasks(50, False)
+    new_tasks = make_tasks(60, True)
+    FileStorage(file_path).save_tasks(old_tasks)
+
+    def crash(*args, **kwargs):
+        raise Crash()
+
+    if kill_point == "write":
+        # Падение посреди записи задач
+        to_json = Task.to_json
+        monkeypatch.setattr(Task, "to_json", lambda task: crash() if task.id == 30 else to_json(task))
+    elif kill_point == "fsync":
+        monkeypatch.setattr(os, "fsync", crash)
+    elif kill_point == "replace":
+        # Первая подмена - файл сведений, падаем на подмене файла задач
+        replace = os.replace
+        calls = []
+
+        def crash_second(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise Crash()
+            replace(*args)
+
+        monkeypatch.setattr(os, "replace", crash_second)
+    else:
+        fsync = os.fsync
+        monkeypatch.setattr(os, "fsync", lambda fd: crash() if os.path.isdir(f"/proc/self/fd/{fd}") else fsync(fd))
+
+    # Act
+    with pytest.raises(Crash):
+        FileStorage(file_path).save_tasks(new_tasks)
+    monkeypatch.undo()
+    storage = FileStorage(file_path)
+    restored = storage.restore_tasks()
+
+    # Assert
+    # На диске всегда целый список: старый или новый
+    assert state(restored) in (state(old_tasks), state(new_tasks))
+    assert storage.corrupt_records == []
+    assert storage.restore_meta()["maxId"] >= max(task.id for task in restored)
+    assert not (tmp_path / 'test.txt.tmp').exists()
+
+
+def test_save_costs_two_fsyncs(tmp_path, monkeypatch):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    storage = FileStorage(file_path)
+    fsync = os.fsync
+    calls = []
+    monkeypatch.setattr(os, "fsync", lambda fd: calls.append(fd) or fsync(fd))
+
+    # Act
+    storage.save_tasks(make_tasks(10, False))
+
+    # Assert
+    # Файл задач и каталог; сведения сбрасываются на диск вместе с каталогом
+    assert len(calls) == 2
+    assert storage.restore_meta() == {"maxId": 10, "count": 10}
+
+
+def test_unreadable_meta_falls_back_to_reading_tasks(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    FileStorage(file_path).save_tasks(make_tasks(3, False))
+    # Сведения без fsync после падения системы могут оказаться пустыми
+    (tmp_path / 'test.txt.meta').write_text("", encoding="utf-8")
+
+    # Act
+    meta = FileStorage(file_path).restore_meta()
+
+    # Assert
+    assert meta is None
+
+
+SAVE_LOOP = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from storage.file_storage import FileStorage
+from models.priority import Priority
+from models.task import Task
+
+storage = FileStorage(sys.argv[2])
+count = int(sys.argv[3])
+print("ready", flush=True)
+round = 0
+while True:
+    round += 1
+    storage.save_tasks([Task(f"round {round} task {i}", Priority.low, round % 2 == 0, i) for i in range(1, count + 1)])
+"""
+
+
+def test_save_survives_kill(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    count = 2000
+
+    for attempt in range(5):
+        process = subprocess.Popen([sys.executable, "-c", SAVE_LOOP, str(ROOT), str(file_path), str(count)],
+                                   stdout=subprocess.PIPE)
+        process.stdout.readline()
+
+        # Act
+        # Убиваем процесс в произвольный момент записи
+        time.sleep(0.05 + attempt * 0.07)
+        process.send_signal(signal.SIGKILL)
+        process.wait()
+        process.stdout.close()
+        storage = FileStorage(file_path)
+        restored = storage.restore_tasks()
+
+        # Assert
+        if file_path.exists():
+            assert len(restored) == count
+            assert storage.corrupt_records == []
+            # Все задачи из одного и того же сохранения
+            assert len({task.title.split(" task ")[0] for task in restored}) == 1
+
+
+def test_restore_quarantines_corrupt_records(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    FileStorage(file_path).save_tasks(make_tasks(3, False))
+    lines = file_path.read_text(encoding="utf-8").splitlines()
+    # Испорченный символ во второй записи и оборванная третья
+    lines[1] = lines[1].replace("test2", "tost2")
+    lines[2] = lines[2][:25]
+    file_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    storage = FileStorage(file_path)
+
+    # Act
+    restored = storage.restore_tasks()
+
+    # Assert
+    assert [task.id for task in restored] == [1]
+    assert [line for line, reason in storage.corrupt_records] == [2, 3]
+    assert storage.corrupt_records[0][1] == "checksum mismatch"
+    quarantined = [json.loads(line) for line in (tmp_path / 'test.txt.corrupt').read_text(encoding="utf-8").splitlines()]
+    assert [record["line"] for record in quarantined] == [2, 3]
+    assert "tost2" in quarantined[0]["record"]
+
+
+def test_restore_accepts_records_without_checksum(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    file_path.write_text('{"title": "test1", "priority": "low", "isDone": false, "id": 1}\n', encoding="utf-8")
+    storage = FileStorage(file_path)
+
+    # Act
+    restored = storage.restore_tasks()
+
+    # Assert
+    assert [task.id for task in restored] == [1]
+    assert storage.corrupt_records == []
+
+
+def test_log_append_after_torn_record(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    storage = LogStorage(file_path)
+    storage.insert_task(Task("test1", Priority.low, False, 1))
+    storage.insert_task(Task("test2", Priority.low, False, 2))
+    storage.close()
+    # Процесс упал посреди записи второй строки журнала
+    log_path = tmp_path / 'test.txt.log'
+    log_path.write_bytes(log_path.read_bytes()[:-20])
+
+    # Act
+    storage = LogStorage(file_path)
+    storage.restore_tasks()
+    storage.insert_task(Task("test3", Priority.low, False, 3))
+    storage.close()
+    restored = LogStorage(file_path).restore_tasks()
+
+    # Assert
+    assert [task.id for task in restored] == [1, 3]
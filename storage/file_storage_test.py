@@ -80,3 +80,52 @@ def test_file_storage_restore_task_is_valid(tmp_path):
     assert tasks[0].priority == 'low'
     assert tasks[0].is_done == False
     assert tasks[0].id == 1
+
+def test_file_storage_iter_tasks_is_lazy(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    storage = FileStorage(file_path)
+    storage.save_tasks([models.task.Task(f"test{i}", models.priority.Priority.low, False, i) for i in range(1, 4)])
+
+    # Act
+    tasks = storage.iter_tasks()
+    first = next(tasks)
+
+    # Assert
+    assert first.id == 1
+    assert [task.id for task in tasks] == [2, 3]
+
+def test_file_storage_restore_meta(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    storage = FileStorage(file_path)
+    missing_meta = storage.restore_meta()
+    task1 = models.task.Task("test1", models.priority.Priority.low, True, 7)
+    task2 = models.task.Task("test2", models.priority.Priority.high, False, 3)
+
+    # Act
+    storage.save_tasks([task1, task2])
+    meta = storage.restore_meta()
+
+    # Assert
+    assert missing_meta is None
+    assert meta == {"maxId": 7, "count": 2}
+
+def test_file_storage_query_filters(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    storage = FileStorage(file_path)
+    storage.save_tasks([
+        models.task.Task("test1", models.priority.Priority.low, False, 1),
+        models.task.Task("test2", models.priority.Priority.high, True, 2),
+        models.task.Task("test3", models.priority.Priority.high, False, 3),
+    ])
+
+    # Act
+    tasks, _ = storage.query(priority=models.priority.Priority.high, is_done=False)
+    by_priority, cursor = storage.query(sort="priority", limit=1, cursor=1)
+
+    # Assert
+    assert [task.id for task in tasks] == [3]
+    assert [task.id for task in by_priority] == [2]
+    assert cursor == 2
@@ -0,0 +1,115 @@
+from storage.abstract_storage import AbstractStorage
+from storage.atomic_file import atomic_write
+from storage.file_storage import FileStorage, parse_with_crc, with_crc
+from models import codec
+from models.task import Task
+from pathlib import Path
+import os
+import threading
+
+
+# Хранилище с журналом: каждое изменение дописывается одной строкой в конец лога,
+# а полный список задач периодически сворачивается в снимок (формат как у FileStorage)
+class LogStorage(AbstractStorage):
+    def __init__(self, file_path, compact_every=1000):
+        self._snapshot = FileStorage(file_path)
+        self._log_path = Path(str(file_path) + ".log")
+        self._compact_every = compact_every
+        self._log_records = 0
+        self._log_file = None
+        # Запись в журнал и его обрезка после снимка не должны пересекаться
+        self._lock = threading.Lock()
+
+    def _append(self, op, task):
+        # То же, что json.dumps({"op": op, "task": task.to_dict()}), но без словарей
+        line = (with_crc(f'{{"op": "{op}", "task": {codec.encode_task(task)}}}') + '\n').encode("utf-8")
+
+        with self._lock:
+            if self._log_file is None:
+                self._open_log()
+            self._log_file.write(line)
+            self._log_file.flush()
+            self._log_records += 1
+
+    def _open_log(self):
+        self._log_file = self._log_path.open('ab')
+        # После падения последняя строка журнала может быть оборвана,
+        # новую запись начинаем с новой строки, чтобы она не склеилась с обрывком
+        if self._log_file.tell() > 0:
+            with self._log_path.open('rb') as f_read:
+                f_read.seek(-1, os.SEEK_END)
+                if f_read.read(1) != b'\n':
+                    self._log_file.write(b'\n')
+
+    def _log_size(self):
+        if self._log_file is not None:
+            return self._log_file.tell()
+        if self._log_path.exists():
+            return self._log_path.stat().st_size
+        return 0
+
+    def insert_task(self, task):
+        self._append("insert", task)
+
+    def update_task(self, task):
+        self._append("update", task)
+
+    def save_tasks(self, tasks):
+        # Запоминаем конец журнала до того, как копировать список: все записи до этой
+        # точки уже попали в копию, а дописанные во время снимка нужно сохранить
+        with self._lock:
+            offset = self._log_size()
+            records = self._log_records
+
+        self._snapshot.save_tasks(list(tasks))
+
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+            tail = b""
+            if self._log_path.exists():
+                with self._log_path.open('rb') as f_read:
+                    f_read.seek(offset)
+                    tail = f_read.read()
+
+            # Повтор записи из хвоста безопасен: последняя запись по id побеждает
+            with atomic_write(self._log_path, binary=True) as f_write:
+                f_write.write(tail)
+            self._log_records -= records
+
+    def checkpoint(self, tasks):
+        # Изменения уже в журнале, снимок пересобираем только когда журнал разросся
+        if self._log_records >= self._compact_every:
+            self.save_tasks(tasks)
+
+    def close(self):
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+    def restore_tasks(self):
+        tasks = {task.id: task for task in self._snapshot.restore_tasks()}
+        self._log_records = 0
+
+        if not self._log_path.exists():
+            return list(tasks.values())
+
+        # Проигрываем журнал поверх снимка, последняя запись по id побеждает
+        with self._log_path.open('r', encoding="utf-8") as f_read:
+            for line in f_read:
+                line = line.strip()
+                if not line:
+                    continue
+
+                try:
+                    record = parse_with_crc(line)
+                    task = Task.from_dict(record["task"])
+                    tasks[task.id] = task
+                    self._log_records += 1
+                except Exception as e:
+                    print(f"restore log parse error: {e} {line}")
+
+        return list(tasks.values())
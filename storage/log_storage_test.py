@@ -0,0 +1,76 @@
+from storage.log_storage import LogStorage
+from models.priority import Priority
+from models.task import Task
+
+
+def test_log_storage_insert_appends_one_line(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    storage = LogStorage(file_path)
+    storage.save_tasks([Task("test1", Priority.low, False, 1)])
+
+    # Act
+    storage.insert_task(Task("test2", Priority.high, False, 2))
+
+    # Assert
+    # Снимок не перезаписывается, в журнале одна запись
+    with open(file_path, 'r', encoding='utf-8') as f_read:
+        assert len(f_read.readlines()) == 1
+    with open(str(file_path) + '.log', 'r', encoding='utf-8') as f_read:
+        assert len(f_read.readlines()) == 1
+
+
+def test_log_storage_restore_replays_log(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    storage = LogStorage(file_path)
+    task1 = Task("test1", Priority.low, False, 1)
+    task2 = Task("test2", Priority.high, False, 2)
+    storage.save_tasks([task1])
+    storage.insert_task(task2)
+    task1.complete()
+    storage.update_task(task1)
+
+    # Act
+    tasks = LogStorage(file_path).restore_tasks()
+
+    # Assert
+    assert len(tasks) == 2
+    assert tasks[0].id == 1
+    assert tasks[0].is_done == True
+    assert tasks[1].id == 2
+    assert tasks[1].title == "test2"
+    assert tasks[1].is_done == False
+
+
+def test_log_storage_checkpoint_compacts_log(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    storage = LogStorage(file_path, compact_every=2)
+    tasks = [Task("test1", Priority.low, False, 1), Task("test2", Priority.medium, False, 2)]
+
+    # Act
+    storage.insert_task(tasks[0])
+    storage.checkpoint(tasks[:1])
+    snapshot_exists = file_path.exists()
+    storage.insert_task(tasks[1])
+    storage.checkpoint(tasks)
+
+    # Assert
+    assert snapshot_exists == False
+    with open(str(file_path) + '.log', 'r', encoding='utf-8') as f_read:
+        assert f_read.read() == ''
+    restored = LogStorage(file_path).restore_tasks()
+    assert [task.id for task in restored] == [1, 2]
+
+
+def test_log_storage_restore_nothing_saved(tmp_path):
+    # Arrange
+    file_path = tmp_path / 'test.txt'
+    storage = LogStorage(file_path)
+
+    # Act
+    tasks = storage.restore_tasks()
+
+    # Assert
+    assert tasks == []
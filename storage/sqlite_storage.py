@@ -0,0 +1,130 @@
+from storage.abstract_storage import AbstractStorage
+from models.priority import Priority
+from models.task import Task
+from pathlib import Path
+import sqlite3
+import threading
+
+# Сколько строк читаем за раз при потоковом чтении
+FETCH_BATCH = 1000
+
+
+# Хранилище в SQLite: каждая задача - строка таблицы, изменения пишутся по одной строке,
+# а выборки по приоритету и выполнению идут по индексу, без загрузки всех задач в память
+class SQLiteStorage(AbstractStorage):
+    indexed = True
+
+    def __init__(self, db_path):
+        self._db_path = Path(db_path)
+        # Один connection на запись, доступ к нему из разных потоков через блокировку
+        self._conn = self._connect()
+        self._lock = threading.Lock()
+
+        with self._lock:
+            # WAL: читатели не блокируют запись, а коммит не переписывает основной файл
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS tasks ("
+                               "id INTEGER PRIMARY KEY, "
+                               "title TEXT NOT NULL, "
+                               "priority TEXT NOT NULL, "
+                               "is_done INTEGER NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_priority_done "
+                               "ON tasks (priority, is_done, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_done ON tasks (is_done, id)")
+
+    def _connect(self):
+        # isolation_level=None - каждая команда коммитится сама, транзакции открываем явно
+        return sqlite3.connect(self._db_path, isolation_level=None, check_same_thread=False)
+
+    @staticmethod
+    def _row(task):
+        return task.id, task.title, task.priority, int(task.is_done)
+
+    @staticmethod
+    def _task(row):
+        task_id, title, priority, is_done = row
+        return Task(title, Priority[priority], bool(is_done), task_id)
+
+    def insert_task(self, task):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO tasks (id, title, priority, is_done) VALUES (?, ?, ?, ?)",
+                               self._row(task))
+
+    def update_task(self, task):
+        with self._lock:
+            self._conn.execute("UPDATE tasks SET title = ?, priority = ?, is_done = ? WHERE id = ?",
+                               self._row(task)[1:] + (task.id,))
+
+    def save_tasks(self, tasks):
+        # Полная замена содержимого одной транзакцией
+        rows = [self._row(task) for task in list(tasks)]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM tasks")
+                self._conn.executemany("INSERT INTO tasks (id, title, priority, is_done) VALUES (?, ?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def checkpoint(self, tasks):
+        # Каждое изменение уже записано через insert_task/update_task
+        pass
+
+    def restore_meta(self):
+        with self._lock:
+            max_id, count = self._conn.execute("SELECT MAX(id), COUNT(*) FROM tasks").fetchone()
+        return {"maxId": max_id or 0, "count": count}
+
+    def _select(self, sql, params):
+        # Отдельное соединение на чтение: в режиме WAL оно не мешает записи
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(FETCH_BATCH)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._task(row)
+        finally:
+            conn.close()
+
+    def iter_tasks(self):
+        return self._select("SELECT id, title, priority, is_done FROM tasks ORDER BY id", ())
+
+    def restore_tasks(self):
+        return list(self.iter_tasks())
+
+    def select(self, priority, is_done, cursor, descending, limit):
+        conditions = []
+        params = []
+        if priority is not None:
+            conditions.append("priority = ?")
+            params.append(priority.name)
+        if is_done is not None:
+            conditions.append("is_done = ?")
+            params.append(int(is_done))
+        if cursor is not None:
+            conditions.append("id < ?" if descending else "id > ?")
+            params.append(cursor)
+
+        sql = "SELECT id, title, priority, is_done FROM tasks"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id DESC" if descending else " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return list(self._select(sql, params))
+
+    def priority_of(self, task_id):
+        with self._lock:
+            row = self._conn.execute("SELECT priority FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,157 @@
+import random
+import sqlite3
+import threading
+
+import pytest
+
+from services.task_manager import TaskManager
+from storage.file_storage import FileStorage
+from storage.sqlite_storage import SQLiteStorage
+from models.priority import Priority
+from models.task import Task
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(tmp_path / 'test.db')
+    yield storage
+    storage.close()
+
+
+def test_sqlite_storage_uses_wal(tmp_path, storage):
+    # Arrange
+    conn = sqlite3.connect(tmp_path / 'test.db')
+
+    # Act
+    mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.close()
+
+    # Assert
+    assert mode == "wal"
+
+
+def test_sqlite_storage_insert_and_update(tmp_path, storage):
+    # Arrange
+    task = Task("test1", Priority.low, False, 1)
+
+    # Act
+    storage.insert_task(task)
+    storage.insert_task(Task("test2", Priority.high, False, 2))
+    task.complete()
+    storage.update_task(task)
+    tasks = SQLiteStorage(tmp_path / 'test.db').restore_tasks()
+
+    # Assert
+    assert [(t.id, t.title, t.priority, t.is_done) for t in tasks] == [
+        (1, "test1", "low", True),
+        (2, "test2", "high", False),
+    ]
+
+
+def test_sqlite_storage_save_replaces_rows(storage):
+    # Arrange
+    storage.insert_task(Task("old", Priority.low, False, 5))
+
+    # Act
+    storage.save_tasks([Task("test1", Priority.medium, True, 1)])
+
+    # Assert
+    tasks = storage.restore_tasks()
+    assert len(tasks) == 1
+    assert tasks[0].title == "test1"
+    assert storage.restore_meta() == {"maxId": 1, "count": 1}
+
+
+def test_sqlite_storage_query(storage):
+    # Arrange
+    for i, priority in enumerate([Priority.low, Priority.high, Priority.high, Priority.high], start=1):
+        storage.insert_task(Task(f"test{i}", priority, i == 2, i))
+
+    # Act
+    high_open, _ = storage.query(priority=Priority.high, is_done=False)
+    page, cursor = storage.query(limit=2, cursor=1)
+    by_priority, _ = storage.query(sort="-priority", limit=2, cursor=3)
+
+    # Assert
+    assert [task.id for task in high_open] == [3, 4]
+    assert [task.id for task in page] == [2, 3]
+    assert cursor == 3
+    assert [task.id for task in by_priority] == [4, 1]
+    with pytest.raises(ValueError):
+        storage.query(cursor=99)
+
+
+@pytest.mark.parametrize("sort", ["id", "-id", "priority", "-priority"])
+def test_sqlite_task_manager_query_matches_memory_index(tmp_path, sort):
+    # Arrange
+    indexed = TaskManager(SQLiteStorage(tmp_path / "test.db"))
+    in_memory = TaskManager(FileStorage(tmp_path / "test.txt"))
+    rng = random.Random(0)
+    for i in range(30):
+        priority = rng.choice(list(Priority))
+        for task_manager in (indexed, in_memory):
+            task = task_manager.add_task(f"test{i}", priority)
+            if i % 3 == 0:
+                task_manager.complete_task(task.id)
+
+    def pages(task_manager, priority, is_done):
+        ids, cursor = [], None
+        while True:
+            tasks, cursor = task_manager.query_tasks(priority, is_done, sort, limit=4, cursor=cursor)
+            ids.append([task.id for task in tasks])
+            if cursor is None:
+                return ids
+
+    # Act
+    filters = [(None, None), (Priority.high, None), (None, False), (Priority.low, True)]
+    indexed_pages = [pages(indexed, priority, is_done) for priority, is_done in filters]
+    memory_pages = [pages(in_memory, priority, is_done) for priority, is_done in filters]
+    indexed.close()
+
+    # Assert
+    assert indexed_pages == memory_pages
+
+
+# Фоновая загрузка задач из базы, которая ждет разрешения теста
+class SlowRestoreStorage(SQLiteStorage):
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.release = threading.Event()
+
+    def iter_tasks(self):
+        self.release.wait()
+        return super().iter_tasks()
+
+
+def test_sqlite_query_during_background_restore(tmp_path):
+    # Arrange
+    storage = SQLiteStorage(tmp_path / "test.db")
+    storage.save_tasks([Task(f"test{i}", Priority.low, i % 2 == 0, i) for i in range(1, 7)])
+    storage.close()
+    slow_storage = SlowRestoreStorage(tmp_path / "test.db")
+    task_manager = TaskManager(slow_storage)
+    task_manager.restore_tasks(background=True)
+
+    # Act
+    try:
+        loading = not task_manager.wait_restored(0)
+        tasks, cursor = task_manager.query_tasks(is_done=False, limit=2)
+    finally:
+        slow_storage.release.set()
+        task_manager.close()
+
+    # Assert
+    assert loading
+    assert [task.id for task in tasks] == [1, 3]
+    assert cursor == 3
+
+
+def test_sqlite_storage_empty(storage):
+    # Arrange
+
+    # Act
+    tasks = storage.restore_tasks()
+
+    # Assert
+    assert tasks == []
+    assert storage.restore_meta() == {"maxId": 0, "count": 0}
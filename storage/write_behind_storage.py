@@ -0,0 +1,129 @@
+from storage.abstract_storage import AbstractStorage
+import threading
+import time
+
+# Режимы долговечности: sync - сохраняем на каждое изменение, batched - копим изменения
+# и сохраняем одним разом по времени или количеству, on-shutdown - только при закрытии
+DURABILITY_MODES = ("sync", "batched", "on-shutdown")
+
+
+# Отложенная запись поверх любого хранилища (group commit): много изменений - одна запись на диск.
+# Платим окном, в котором последние изменения еще не на диске, за меньшее число перезаписей
+class WriteBehindStorage(AbstractStorage):
+    def __init__(self, storage, mode="batched", interval=0.05, max_pending=1000):
+        if not isinstance(storage, AbstractStorage):
+            raise TypeError("storage must be an instance of AbstractStorage")
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"mode must be one of {DURABILITY_MODES}, but got {mode}")
+
+        self._storage = storage
+        self._mode = mode
+        self._interval = interval
+        self._max_pending = max_pending
+
+        # Последний список задач, который нужно сохранить, и число изменений с прошлой записи
+        self._tasks = None
+        self._pending = 0
+        self._first_pending_at = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+
+    @staticmethod
+    def from_spec(storage, spec):
+        # Разбор строки вида sync, on-shutdown, batched или batched:<мс>
+        mode, _, interval_ms = spec.partition(":")
+        if mode == "sync":
+            return storage
+        if interval_ms:
+            return WriteBehindStorage(storage, mode, interval=int(interval_ms) / 1000)
+        return WriteBehindStorage(storage, mode)
+
+    def insert_task(self, task):
+        self._storage.insert_task(task)
+
+    def update_task(self, task):
+        self._storage.update_task(task)
+
+    def save_tasks(self, tasks):
+        # Явное полное сохранение выполняем сразу
+        with self._flush_lock:
+            with self._cond:
+                self._tasks = None
+                self._pending = 0
+            self._storage.save_tasks(tasks)
+
+    def restore_tasks(self):
+        return self._storage.restore_tasks()
+
+    def iter_tasks(self):
+        return self._storage.iter_tasks()
+
+    def restore_meta(self):
+        return self._storage.restore_meta()
+
+    # insert_task и update_task идут в хранилище сразу, поэтому его выборки не отстают от памяти
+    @property
+    def indexed(self):
+        return self._storage.indexed
+
+    def query(self, priority=None, is_done=None, sort="id", limit=None, cursor=None, cursor_priority=None):
+        return self._storage.query(priority, is_done, sort, limit, cursor, cursor_priority)
+
+    def checkpoint(self, tasks):
+        if self._mode == "sync":
+            self._storage.checkpoint(tasks)
+            return
+
+        with self._cond:
+            if self._pending == 0:
+                self._first_pending_at = time.monotonic()
+            self._tasks = tasks
+            self._pending += 1
+            if self._mode == "batched":
+                self._start_flusher()
+                self._cond.notify()
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._pending >= self._max_pending:
+                        break
+                    if self._pending:
+                        # Ждем интервал от первого несохраненного изменения
+                        remaining = self._first_pending_at + self._interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        # Запись на диск вне self._cond, чтобы новые изменения не ждали диск
+        with self._flush_lock:
+            with self._cond:
+                tasks = self._tasks
+                self._tasks = None
+                self._pending = 0
+            if tasks is not None:
+                self._storage.checkpoint(tasks)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+        # Гарантированно сохраняем все накопленное
+        self.flush()
+        self._storage.close()
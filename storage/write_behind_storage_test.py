@@ -0,0 +1,106 @@
+import time
+
+import pytest
+
+from storage.file_storage import FileStorage
+from storage.write_behind_storage import WriteBehindStorage
+from models.priority import Priority
+from models.task import Task
+
+
+# Файловое хранилище, которое считает полные перезаписи
+class CountingStorage(FileStorage):
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self.saves = 0
+
+    def save_tasks(self, tasks):
+        self.saves += 1
+        super().save_tasks(tasks)
+
+
+def make_tasks(count):
+    return [Task(f"test{i}", Priority.low, False, i) for i in range(1, count + 1)]
+
+
+def test_write_behind_sync_saves_every_change(tmp_path):
+    # Arrange
+    inner = CountingStorage(tmp_path / 'test.txt')
+    storage = WriteBehindStorage(inner, "sync")
+    tasks = make_tasks(3)
+
+    # Act
+    for i in range(3):
+        storage.checkpoint(tasks[:i + 1])
+
+    # Assert
+    assert inner.saves == 3
+
+
+def test_write_behind_batched_coalesces_changes(tmp_path):
+    # Arrange
+    inner = CountingStorage(tmp_path / 'test.txt')
+    storage = WriteBehindStorage(inner, "batched", interval=0.1)
+    tasks = []
+
+    # Act
+    for task in make_tasks(100):
+        tasks.append(task)
+        storage.checkpoint(tasks)
+    time.sleep(0.3)
+
+    # Assert
+    # Все изменения попали на диск одной записью, без закрытия хранилища
+    assert inner.saves == 1
+    assert len(FileStorage(tmp_path / 'test.txt').restore_tasks()) == 100
+    storage.close()
+
+
+def test_write_behind_batched_flushes_on_count(tmp_path):
+    # Arrange
+    inner = CountingStorage(tmp_path / 'test.txt')
+    storage = WriteBehindStorage(inner, "batched", interval=60, max_pending=10)
+    tasks = make_tasks(10)
+
+    # Act
+    for i in range(10):
+        storage.checkpoint(tasks[:i + 1])
+    time.sleep(0.1)
+
+    # Assert
+    assert inner.saves == 1
+    storage.close()
+
+
+def test_write_behind_on_shutdown_saves_on_close(tmp_path):
+    # Arrange
+    inner = CountingStorage(tmp_path / 'test.txt')
+    storage = WriteBehindStorage(inner, "on-shutdown")
+    tasks = make_tasks(5)
+
+    # Act
+    for i in range(5):
+        storage.checkpoint(tasks[:i + 1])
+    saves_before_close = inner.saves
+    storage.close()
+
+    # Assert
+    assert saves_before_close == 0
+    assert inner.saves == 1
+    assert len(FileStorage(tmp_path / 'test.txt').restore_tasks()) == 5
+
+
+def test_write_behind_from_spec(tmp_path):
+    # Arrange
+    inner = FileStorage(tmp_path / 'test.txt')
+
+    # Act
+    sync = WriteBehindStorage.from_spec(inner, "sync")
+    batched = WriteBehindStorage.from_spec(inner, "batched:20")
+
+    # Assert
+    assert sync is inner
+    assert isinstance(batched, WriteBehindStorage)
+    assert batched._interval == 0.02
+    with pytest.raises(ValueError):
+        WriteBehindStorage.from_spec(inner, "sometimes")